@@ -8,8 +8,8 @@ import sys
 # Add the current directory to the path to ensure local imports work
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from main import app, HOST, PORT
-import uvicorn
+# Solo il launcher: l'app viene importata da uvicorn nei processi che servono le richieste
+from modules.launcher import serve, HOST, PORT
 
 if __name__ == "__main__":
     print(f"🚀 Starting MCP HTTP Server on {HOST}:{PORT}")
@@ -18,10 +18,5 @@ if __name__ == "__main__":
     # Use reload only in development
     reload = os.environ.get("DEBUG", "false").lower() == "true"
     
-    uvicorn.run(
-        "main:app",
-        host=HOST,
-        port=PORT,
-        reload=reload,
-        log_level="info"
-    )
+    # MCP_WORKERS=auto starts one worker per CPU of the cgroup quota
+    serve(HOST, PORT, log_level="info", reload=reload)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark del codec di /mcp: fast path (orjson, solo busta JSON-RPC, risposta in bytes)
+contro l'handler originale (modello Pydantic, copia del dict, jsonable_encoder + json
+standard di FastAPI), entrambi eseguiti in-process via ASGI sugli stessi tool.
+
+Uso:
+    python benchmarks/bench_mcp_codec.py [--requests 2000] [--concurrency 16]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Il rate limit per client fermerebbe il benchmark (tutte le richieste arrivano dallo stesso client)
+os.environ.setdefault("ADMISSION_RATE", "0")
+os.environ.setdefault("ADMISSION_IP_RATE", "0")
+os.environ["MCP_FAST_PATH"] = "true"
+
+import httpx
+
+PAYLOADS = {
+    "initialize": {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+    "tools/list": {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    "calculate_operation": {
+        "jsonrpc": "2.0", "id": 3, "method": "tools/call",
+        "params": {"name": "calculate_operation", "arguments": {"operation": "(3+4)*2/7"}}
+    },
+    "format_text": {
+        "jsonrpc": "2.0", "id": 4, "method": "tools/call",
+        "params": {"name": "format_text", "arguments": {"text": "hello world " * 50, "style": "title"}}
+    },
+}
+
+
+def load_baseline_app():
+    """
+    App con l'handler /mcp del commit iniziale: MCPRequest Pydantic, copia in dict
+    e risposta serializzata da FastAPI. Nessuna sessione, batch o middleware di ammissione
+    """
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from main import MCPRequest
+    from routes.mcp_routes import MCPRoutes
+    from modules.codec import ChunkedResponse
+
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
+    )
+
+    @app.post("/mcp")
+    async def handle_mcp_request(request: MCPRequest):
+        # model_dump è il nome Pydantic v2 di request.dict()
+        response = await MCPRoutes.handle_mcp_request(request.model_dump())
+        if isinstance(response, ChunkedResponse):
+            # Prima dello streaming il tool restituiva il testo completo
+            response["result"]["content"][0]["text"] = "".join([chunk async for chunk in response.chunks])
+        return response
+
+    return app
+
+
+def load_fast_app():
+    import main
+    return main.app
+
+
+async def open_session(client) -> dict:
+    """Una sola sessione per tutto il benchmark: initialize non deve misurare lo store delle sessioni"""
+    response = await client.post("/mcp", json=PAYLOADS["initialize"])
+    session_id = response.headers.get("mcp-session-id")
+    return {"mcp-session-id": session_id} if session_id else {}
+
+
+async def run(app, payload: dict, requests: int, concurrency: int) -> float:
+    """Esegue le richieste e restituisce le richieste al secondo"""
+    body = json.dumps(payload).encode()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"content-type": "application/json", **await open_session(client)}
+        # Warm-up (cache del codice, risposte precalcolate)
+        for _ in range(20):
+            await client.post("/mcp", content=body, headers=headers)
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.post("/mcp", content=body, headers=headers)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    apps = {"baseline": load_baseline_app(), "fast_path": load_fast_app()}
+    report = {}
+    for name, payload in PAYLOADS.items():
+        rates = {mode: await run(app, payload, args.requests, args.concurrency) for mode, app in apps.items()}
+        report[name] = {
+            "baseline_rps": round(rates["baseline"], 1),
+            "fast_path_rps": round(rates["fast_path"], 1),
+            "speedup": round(rates["fast_path"] / rates["baseline"], 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
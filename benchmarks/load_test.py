@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Load test end-to-end di /mcp.
+
+Genera traffico con un mix configurabile di initialize, tools/list e tools/call
+(un'operazione per tool), in-process via ASGI oppure su socket reale con uvicorn.
+check_remote_health punta a un server stub locale, quindi non serve la rete.
+Il report JSON contiene throughput e percentili di latenza per metodo e, se
+indicata una baseline, il confronto con le regressioni oltre la tolleranza.
+
+Uso:
+    python benchmarks/load_test.py --transport asgi --duration 10 --concurrency 16
+    python benchmarks/load_test.py --transport socket --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --transport socket --baseline benchmarks/baseline.json
+
+Exit code 1 se il confronto con la baseline rileva regressioni.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Il server sotto test riceve tutto il traffico da un solo client: niente rate limit.
+# In modalità asgi i log del server finirebbero su stdout insieme al report
+SERVER_ENV = {"LOG_LEVEL": "ERROR", "ADMISSION_RATE": "0"}
+os.environ.update(SERVER_ENV)
+
+import httpx
+
+from modules.health_probe import percentile
+
+DEFAULT_MIX = (
+    "initialize=1,tools/list=2,get_server_info=2,calculate_operation=3,"
+    "format_text=2,check_remote_health=2,check_remote_health_bulk=1"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Risponde a /status/<codice>; il ritardo è impostato da --stub-delay"""
+
+    delay = 0.0
+
+    def do_GET(self):
+        code = 200
+        if self.path.startswith("/status/"):
+            try:
+                code = int(self.path.split("/")[2])
+            except ValueError:
+                code = 400
+        if self.delay:
+            time.sleep(self.delay)
+        body = b"ok"
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(delay: float) -> Tuple[ThreadingHTTPServer, str]:
+    StubHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def build_message(operation: str, stub_url: str, fresh: bool) -> Dict[str, Any]:
+    """Messaggio JSON-RPC per un'operazione del mix (metodo MCP o nome di un tool)"""
+    if operation in ("initialize", "tools/list"):
+        params = {"protocolVersion": "2024-11-05", "capabilities": {}} if operation == "initialize" else {}
+        return {"jsonrpc": "2.0", "id": 1, "method": operation, "params": params}
+
+    arguments = {
+        "get_server_info": {},
+        "calculate_operation": {"operation": "(3+4)*2/7 + 2**10 - 15 % 4"},
+        "format_text": {"text": "the quick brown fox jumps over the lazy dog " * 20, "style": "title"},
+        "check_remote_health": {"url": f"{stub_url}/status/200", "fresh": fresh},
+        "check_remote_health_bulk": {
+            "urls": [f"{stub_url}/status/{code}" for code in (200, 201, 202, 404, 503)],
+            "fresh": fresh,
+            "include_results": False,
+        },
+    }.get(operation)
+    if arguments is None:
+        raise SystemExit(f"Unknown operation in mix: {operation}")
+    return {
+        "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+        "params": {"name": operation, "arguments": arguments},
+    }
+
+
+def is_error(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return True
+    body = response.json()
+    if "error" in body:
+        return True
+    content = body.get("result", {}).get("content")
+    return bool(content) and content[0].get("text", "").startswith("Error")
+
+
+async def run_load(client: httpx.AsyncClient, args, mix: Dict[str, float], stub_url: str) -> Dict[str, Any]:
+    """Esegue il carico con args.concurrency client virtuali per args.duration secondi"""
+    rng = random.Random(args.seed)
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    bodies = {name: json.dumps(build_message(name, stub_url, args.fresh)).encode() for name in operations}
+    latencies: Dict[str, List[float]] = {name: [] for name in operations}
+    errors: Dict[str, int] = {name: 0 for name in operations}
+    headers = {"content-type": "application/json"}
+    initialize = json.dumps(build_message("initialize", stub_url, False)).encode()
+
+    # Ogni client virtuale apre una sessione MCP, come farebbe un client reale
+    async def open_session() -> Dict[str, str]:
+        response = await client.post("/mcp", content=initialize, headers=headers)
+        session_id = response.headers.get("mcp-session-id")
+        return {**headers, "mcp-session-id": session_id} if session_id else headers
+
+    for _ in range(args.warmup):
+        for name in operations:
+            await client.post("/mcp", content=bodies[name], headers=headers)
+
+    deadline = time.perf_counter() + args.duration
+
+    async def virtual_client(seed: int) -> None:
+        local = random.Random(seed)
+        session_headers = await open_session()
+        while time.perf_counter() < deadline:
+            name = local.choices(operations, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await client.post("/mcp", content=bodies[name], headers=session_headers)
+                failed = is_error(response)
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append(time.perf_counter() - started)
+            errors[name] += failed
+            # In-process una risposta immediata (es. un rifiuto) non sospende mai il task:
+            # senza questo yield un client virtuale monopolizzerebbe l'event loop
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_client(rng.random()) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    methods = {}
+    for name in operations:
+        values = latencies[name]
+        key = name if name in ("initialize", "tools/list") else f"tools/call:{name}"
+        methods[key] = {
+            "count": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "latency_ms": {
+                "mean": round(sum(values) / len(values) * 1000, 3) if values else None,
+                **{
+                    f"p{p}": round(percentile(values, p) * 1000, 3) if values else None
+                    for p in (50, 90, 99)
+                },
+                "max": round(max(values) * 1000, 3) if values else None,
+            },
+        }
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "methods": methods,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_socket(args, mix, stub_url) -> Dict[str, Any]:
+    """Avvia uvicorn in un sottoprocesso e genera il carico su socket TCP reale"""
+    port = free_port()
+    env = {**os.environ, **SERVER_ENV, "PYTHONPATH": ROOT}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            for _ in range(200):
+                try:
+                    await client.get("/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+            else:
+                raise SystemExit("Server did not start")
+            return await run_load(client, args, mix, stub_url)
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+async def run_asgi(args, mix, stub_url) -> Dict[str, Any]:
+    """Esegue l'app nello stesso processo (lifespan compreso), senza rete"""
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as client:
+            return await run_load(client, args, mix, stub_url)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Confronta throughput e p99 per metodo; oltre la tolleranza (frazione) è una regressione"""
+    changes = {}
+    regressions = []
+    for key, current in report["methods"].items():
+        previous = baseline.get("methods", {}).get(key)
+        if not previous or not previous["count"] or not current["count"]:
+            continue
+        rps_change = current["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0.0
+        p99_change = current["latency_ms"]["p99"] / previous["latency_ms"]["p99"] - 1 if previous["latency_ms"]["p99"] else 0.0
+        changes[key] = {"throughput_change": round(rps_change, 3), "p99_change": round(p99_change, 3)}
+        if rps_change < -tolerance:
+            regressions.append(f"{key}: throughput {rps_change:+.1%}")
+        if p99_change > tolerance:
+            regressions.append(f"{key}: p99 latency {p99_change:+.1%}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{key}: errors {previous['errors']} -> {current['errors']}")
+    return {"tolerance": tolerance, "methods": changes, "regressions": regressions}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=("asgi", "socket"), default="asgi")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weights per operation, e.g. 'tools/list=2,format_text=1'")
+    parser.add_argument("--warmup", type=int, default=3, help="Warm-up rounds over every operation")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the health-check cache")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="Latency of the stub server (seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against this report")
+    parser.add_argument("--save-baseline", help="Store the report as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression (fraction)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    stub, stub_url = start_stub(args.stub_delay)
+    try:
+        runner = run_socket if args.transport == "socket" else run_asgi
+        results = asyncio.run(runner(args, mix, stub_url))
+    finally:
+        stub.shutdown()
+
+    report = {
+        "transport": args.transport,
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        **results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output + "\n")
+
+    regressions = report.get("comparison", {}).get("regressions", [])
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,31 +3,114 @@
 MCP HTTP Server Standalone - Compatibile con Claude Desktop Remoto
 """
 import os
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.startup import StartupProfile, FirstResponseMiddleware, MCP_LAZY_STARTUP
+except ImportError:
+    # Fall back to relative import (for development)
+    from .modules.startup import StartupProfile, FirstResponseMiddleware, MCP_LAZY_STARTUP
+
+# Misura il tempo di import dei moduli caricati da main (report su /startup)
+StartupProfile.track_imports()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-import uvicorn
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 
 try:
     # Try absolute import first (for when running as a module)
     from routes.mcp_routes import MCPRoutes
     from modules.mcp_methods import MCPMethods
+    from modules.http_pool import HTTPPool
+    from modules.streaming import MCPStreaming, SSE_HEADERS
+    from modules.codec import MCPCodec, PARSE_ERROR, INVALID_REQUEST
+    from modules.precomputed import PrecomputedResponses
+    from modules.tool_registry import ToolRegistry
+    from modules.structured_logging import StructuredLogging, StructuredLogger
+    from modules.metrics import Metrics
+    from modules.cpu_pool import CPUPool
+    from modules.system_status import SystemStatus
+    from modules.health_monitor import HealthMonitor
+    from modules.state_store import StateStore
+    from modules.launcher import HOST, PORT
+    from modules.idempotency import Idempotency, IDEMPOTENCY_HEADER
+    from modules.admission import AdmissionMiddleware
+    from modules.sessions import SessionStore, Session, SESSION_HEADER, MCP_SESSIONS, MCP_SESSION_REQUIRED
 except ImportError:
     # Fall back to relative import (for development)
     from .routes.mcp_routes import MCPRoutes
     from .modules.mcp_methods import MCPMethods
+    from .modules.http_pool import HTTPPool
+    from .modules.streaming import MCPStreaming, SSE_HEADERS
+    from .modules.codec import MCPCodec, PARSE_ERROR, INVALID_REQUEST
+    from .modules.precomputed import PrecomputedResponses
+    from .modules.tool_registry import ToolRegistry
+    from .modules.structured_logging import StructuredLogging, StructuredLogger
+    from .modules.metrics import Metrics
+    from .modules.cpu_pool import CPUPool
+    from .modules.system_status import SystemStatus
+    from .modules.health_monitor import HealthMonitor
+    from .modules.state_store import StateStore
+    from .modules.launcher import HOST, PORT
+    from .modules.idempotency import Idempotency, IDEMPOTENCY_HEADER
+    from .modules.admission import AdmissionMiddleware
+    from .modules.sessions import SessionStore, Session, SESSION_HEADER, MCP_SESSIONS, MCP_SESSION_REQUIRED
+
+StartupProfile.stop_tracking()
+StartupProfile.mark("imports")
 
-# Configurazione
-HOST = os.getenv("HOST", "0.0.0.0")
-PORT = int(os.getenv("PORT", 8080))
+logger = StructuredLogger("mcp.server")
+
+# Configurazione (HOST e PORT arrivano dal launcher)
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Fast path: /mcp decodifica il body con orjson e salta la validazione Pydantic
+MCP_FAST_PATH = os.getenv("MCP_FAST_PATH", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Crea le risorse condivise all'avvio e le rilascia allo shutdown
+    Con MCP_LAZY_STARTUP il pool HTTP viene creato alla prima richiesta in uscita
+    e i worker CPU partono in background, senza ritardare la prima risposta
+    """
+    StructuredLogging.start()
+    MCPMethods.refresh_precomputed()
+    await StateStore.start()
+    await Metrics.start()
+    await SystemStatus.start()
+    await HealthMonitor.start()
+    warmup = None
+    if MCP_LAZY_STARTUP:
+        warmup = asyncio.create_task(CPUPool.startup(MCPMethods.cpu_bound_modules()))
+    else:
+        await HTTPPool.startup()
+        await CPUPool.startup(MCPMethods.cpu_bound_modules())
+    StartupProfile.mark("lifespan")
+    logger.info("startup", **StartupProfile.summary())
+    yield
+    if warmup is not None:
+        await warmup
+    await CPUPool.shutdown()
+    await HealthMonitor.stop()
+    await SystemStatus.stop()
+    await Metrics.stop()
+    await HTTPPool.shutdown()
+    await StateStore.stop()
+    StructuredLogging.stop()
 
 app = FastAPI(
     title="MCP HTTP Server",
     description="Model Context Protocol Server over HTTP",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Rate limit e load shedding su /mcp (aggiunto prima di CORS, così anche i rifiuti hanno gli header CORS)
+app.add_middleware(AdmissionMiddleware)
+
 # CORS per client remoti
 app.add_middleware(
     CORSMiddleware,
@@ -35,10 +118,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SESSION_HEADER],
 )
 
+# Registra l'istante della prima risposta (report su /startup)
+app.add_middleware(FirstResponseMiddleware)
+
 # Import dei modelli Pydantic
 from pydantic import BaseModel
+from typing import Any, Dict, List
 
 class MCPRequest(BaseModel):
     jsonrpc: str = "2.0"
@@ -46,11 +134,164 @@ class MCPRequest(BaseModel):
     method: str
     params: dict = {}
 
+def session_error(status_code: int, message: str) -> Response:
+    """Risposta di errore per Mcp-Session-Id mancante o sconosciuto"""
+    error = MCPCodec.error(None, INVALID_REQUEST, message)
+    return Response(MCPCodec.encode(error), status_code=status_code, media_type="application/json")
+
+async def resolve_session(batch: List[Dict[str, Any]], http_request: Request) -> tuple[Session | None, Response | None]:
+    """
+    Sessione della richiesta: quella indicata da Mcp-Session-Id, oppure una nuova se
+    il messaggio è initialize. Restituisce (sessione, risposta di errore)
+    """
+    if not MCP_SESSIONS:
+        return None, None
+
+    session_id = http_request.headers.get(SESSION_HEADER)
+    if session_id:
+        session = await SessionStore.get(session_id)
+        if session is None:
+            # Sessione terminata o scaduta: il client deve rifare initialize
+            return None, session_error(404, "Session not found, send a new initialize request")
+        return session, None
+
+    # Solo una initialize valida (busta corretta, con id) apre una sessione: un messaggio
+    # che riceverà un errore non deve lasciare sessioni orfane nello store
+    initialize = next((
+        m for m in batch
+        if isinstance(m, dict) and m.get("method") == "initialize"
+        and MCPCodec.validate_envelope(m) is None and m["id"] is not None
+    ), None)
+    if initialize is not None:
+        return await SessionStore.create(initialize.get("params")), None
+    if MCP_SESSION_REQUIRED:
+        return None, session_error(400, f"Missing {SESSION_HEADER} header")
+    return None, None
+
+def encode_response(response: Any, headers: Dict[str, str]) -> Response:
+    """Risposta JSON; con output dei tool in streaming il body viene inviato in chunked encoding"""
+    if MCPCodec.is_chunked(response):
+        return StreamingResponse(MCPCodec.iter_encode(response), media_type="application/json", headers=headers)
+    return Response(MCPCodec.encode(response), media_type="application/json", headers=headers)
+
+async def dispatch_mcp(batch: List[Dict[str, Any]], is_batch: bool, http_request: Request) -> Response:
+    """
+    Esegue una richiesta singola o un batch JSON-RPC già decodificato e costruisce la risposta HTTP
+    Con "Accept: text/event-stream" i tools/call rispondono in streaming SSE
+    """
+    session, error_response = await resolve_session(batch, http_request)
+    if error_response is not None:
+        return error_response
+    headers = {SESSION_HEADER: session.session_id} if session is not None else {}
+    # L'header Idempotency-Key vale per una sola chiamata: nei batch si usa params._meta.idempotencyKey
+    Idempotency.bind(
+        session.session_id if session is not None else None,
+        http_request.headers.get(IDEMPOTENCY_HEADER) if not is_batch else None
+    )
+
+    if MCPStreaming.wants_stream(http_request.headers.get("accept"), batch):
+        if session is not None:
+            await SessionStore.record(session, batch, None)
+        handler = (
+            MCPRoutes.handle_batch_request(batch)
+            if is_batch
+            else MCPRoutes.handle_mcp_request(batch[0])
+        )
+        return StreamingResponse(
+            MCPStreaming.stream_response(handler),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, **headers}
+        )
+
+    if is_batch:
+        responses = await MCPRoutes.handle_batch_request(batch)
+        if session is not None:
+            await SessionStore.record(session, batch, PrecomputedResponses.tools_etag())
+        if responses == []:
+            # Batch composto solo da notifiche: nessun contenuto da restituire
+            return Response(status_code=202, headers=headers)
+        return encode_response(responses, headers)
+
+    response = await MCPRoutes.handle_mcp_request(batch[0])
+    if session is not None:
+        await SessionStore.record(session, batch, PrecomputedResponses.tools_etag())
+
+    if batch[0].get("method") == "tools/list" and "result" in response:
+        etag = PrecomputedResponses.tools_etag()
+        headers["ETag"] = etag
+        if_none_match = http_request.headers.get("if-none-match") or ""
+        if if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]:
+            # Il client ha già questa versione della lista tools
+            return Response(status_code=304, headers=headers)
+
+    return encode_response(response, headers)
+
 # Endpoint MCP Principale
-@app.post("/mcp")
-async def handle_mcp_request(request: MCPRequest):
-    """Endpoint principale MCP over HTTP"""
-    return await MCPRoutes.handle_mcp_request(request.dict())
+if MCP_FAST_PATH:
+    @app.post(
+        "/mcp",
+        openapi_extra={"requestBody": {"required": True, "content": {"application/json": {
+            "schema": {"oneOf": [{"type": "object"}, {"type": "array", "items": {"type": "object"}}]}
+        }}}}
+    )
+    async def handle_mcp_request(http_request: Request):
+        """
+        Endpoint principale MCP over HTTP (richiesta singola o batch JSON-RPC)
+        Fast path: legge il body grezzo e controlla solo la busta JSON-RPC, senza Pydantic
+        """
+        try:
+            payload = MCPCodec.loads(await http_request.body())
+        except ValueError as e:
+            error = MCPCodec.error(None, PARSE_ERROR, f"Parse error: {e}")
+            return Response(MCPCodec.encode(error), status_code=400, media_type="application/json")
+
+        if isinstance(payload, list):
+            # Le voci non valide ricevono il proprio errore dentro il batch
+            return await dispatch_mcp(payload, True, http_request)
+
+        invalid = MCPCodec.validate_envelope(payload)
+        if invalid is not None:
+            msg_id = MCPCodec.request_id(payload)
+            error = MCPCodec.error(msg_id, INVALID_REQUEST, f"Invalid Request: {invalid}")
+            return Response(MCPCodec.encode(error), status_code=400, media_type="application/json")
+
+        return await dispatch_mcp([payload], False, http_request)
+else:
+    @app.post("/mcp")
+    async def handle_mcp_request(request: MCPRequest | List[MCPRequest], http_request: Request):
+        """Endpoint principale MCP over HTTP (richiesta singola o batch JSON-RPC) validato con Pydantic"""
+        if isinstance(request, list):
+            return await dispatch_mcp([r.model_dump() for r in request], True, http_request)
+        return await dispatch_mcp([request.model_dump()], False, http_request)
+
+@app.get("/mcp")
+async def mcp_event_stream(http_request: Request):
+    """Stream SSE per i messaggi inviati dal server di propria iniziativa"""
+    accept = http_request.headers.get("accept") or ""
+    if "text/event-stream" not in accept:
+        return Response(status_code=405, headers={"Allow": "POST, DELETE"})
+
+    session_id = http_request.headers.get(SESSION_HEADER)
+    if MCP_SESSIONS and session_id and await SessionStore.get(session_id) is None:
+        return session_error(404, "Session not found, send a new initialize request")
+
+    return StreamingResponse(
+        MCPStreaming.subscribe(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.delete("/mcp")
+async def mcp_end_session(http_request: Request):
+    """Termina la sessione indicata da Mcp-Session-Id"""
+    if not MCP_SESSIONS:
+        return Response(status_code=405, headers={"Allow": "GET, POST"})
+    session_id = http_request.headers.get(SESSION_HEADER)
+    if not session_id:
+        return session_error(400, f"Missing {SESSION_HEADER} header")
+    if not await SessionStore.end(session_id):
+        return session_error(404, "Session not found")
+    return Response(status_code=204)
 
 # Endpoint aggiuntivi per monitoring
 @app.get("/")
@@ -62,6 +303,8 @@ async def root():
         "status": "running",
         "mcp_endpoint": "/mcp",
         "health_endpoint": "/health",
+        "metrics_endpoint": "/metrics",
+        "startup_endpoint": "/startup",
         "docs": "/docs"
     }
 
@@ -74,14 +317,22 @@ async def health_check():
         "protocol": "MCP over HTTP"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Metriche in formato testo Prometheus"""
+    return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup")
+async def startup_report():
+    """Tempi di avvio: import per pacchetto, fasi del lifespan e prima risposta"""
+    return StartupProfile.report()
+
 @app.get("/tools")
 async def list_tools_html():
     """Pagina HTML semplice con lista tools (opzionale)"""
     tools_info = [
-        {"name": "get_server_info", "description": "Get server information and status"},
-        {"name": "calculate_operation", "description": "Perform mathematical calculations"},
-        {"name": "format_text", "description": "Format text in different styles"},
-        {"name": "check_remote_health", "description": "Check health of remote URLs"}
+        {"name": spec.name, "description": spec.description}
+        for spec in ToolRegistry.specs()
     ]
     
     html_content = f"""
@@ -106,8 +357,12 @@ async def list_tools_html():
     """
     return HTMLResponse(html_content)
 
+StartupProfile.mark("app")
+
 # Avvio del server
 if __name__ == "__main__":
+    import uvicorn
+
     print(f"🚀 Starting MCP HTTP Server on {HOST}:{PORT}")
     print(f"📚 API Docs: http://{HOST}:{PORT}/docs")
     print(f"🔧 MCP Endpoint: http://{HOST}:{PORT}/mcp")
@@ -0,0 +1,209 @@
+"""
+Admission Module
+Middleware ASGI davanti a /mcp: rate limit per client e load shedding in base al carico
+"""
+import os
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Any
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.codec import MCPCodec, SERVER_OVERLOADED, RATE_LIMITED
+    from modules.metrics import Metrics, Counter, Gauge
+    from modules.sessions import SessionStore
+except ImportError:
+    # Fall back to relative import (for development)
+    from .codec import MCPCodec, SERVER_OVERLOADED, RATE_LIMITED
+    from .metrics import Metrics, Counter, Gauge
+    from .sessions import SessionStore
+
+# Percorsi soggetti al controllo di ammissione (separati da virgola)
+ADMISSION_PATHS = tuple(p.strip() for p in os.getenv("ADMISSION_PATHS", "/mcp").split(",") if p.strip())
+# Richieste POST in corso oltre le quali le nuove vengono rifiutate con 503
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 64))
+# Ritardo dell'event loop (secondi) oltre il quale si ammettono solo ADMISSION_MIN_IN_FLIGHT richieste
+ADMISSION_MAX_LOOP_LAG = float(os.getenv("ADMISSION_MAX_LOOP_LAG", 0.25))
+ADMISSION_MIN_IN_FLIGHT = int(os.getenv("ADMISSION_MIN_IN_FLIGHT", 4))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+# Token bucket per client: richieste al secondo e burst (ADMISSION_RATE=0 disattiva il limite)
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 50))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 100))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))
+# Bucket per indirizzo, consumato anche dalle richieste con sessione (default: stessi valori del client)
+ADMISSION_IP_RATE = float(os.getenv("ADMISSION_IP_RATE", ADMISSION_RATE))
+ADMISSION_IP_BURST = float(os.getenv("ADMISSION_IP_BURST", ADMISSION_BURST))
+# Proxy fidato davanti al server: "" (nessuno, si usa l'indirizzo del peer), "fly" (header Fly-Client-IP)
+# o "xff" (ultimo indirizzo di X-Forwarded-For, quello aggiunto dal proxy)
+ADMISSION_TRUSTED_PROXY = os.getenv("ADMISSION_TRUSTED_PROXY", "").lower()
+
+
+class TokenBucket:
+    """Bucket con ricarica continua a rate token/s fino a burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consuma un token; restituisce 0 se concesso, altrimenti i secondi da attendere"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Restituisce un token preso per una richiesta poi rifiutata da un altro bucket"""
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+
+class ClientBuckets:
+    """
+    Token bucket per client con eviction LRU, così la memoria resta limitata.
+    Ogni richiesta consuma il bucket dell'indirizzo del client; quelle con un
+    Mcp-Session-Id valido consumano anche il bucket della sessione, così un client
+    non ottiene un nuovo burst aprendo altre sessioni. Una richiesta rifiutata
+    dal bucket della sessione restituisce il token preso dall'indirizzo.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int,
+                 ip_rate: float | None = None, ip_burst: float | None = None):
+        self.rate = rate
+        self.burst = burst
+        self.ip_rate = ip_rate if ip_rate is not None else rate
+        self.ip_burst = ip_burst if ip_burst is not None else burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take_for(self, scope: Dict[str, Any]) -> float:
+        """Consuma un token per il client della richiesta ASGI"""
+        headers = dict(scope.get("headers") or ())
+        session_id = headers.get(b"mcp-session-id")
+        session = SessionStore.peek(session_id.decode("latin-1")) if session_id else None
+        now = time.monotonic()
+        address = self._bucket(client_key(scope, headers), now)
+        wait = address.take(now)
+        if wait > 0 or session is None:
+            return wait
+        if session.bucket is None:
+            session.bucket = TokenBucket(self.rate, self.burst, now)
+        wait = session.bucket.take(now)
+        if wait > 0:
+            address.refund()
+        return wait
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.ip_rate, self.ip_burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+
+def client_key(scope: Dict[str, Any], headers: Dict[bytes, bytes], trusted_proxy: str = ADMISSION_TRUSTED_PROXY) -> str:
+    """
+    Identità del client: l'indirizzo del peer, oppure quello riportato dal proxy fidato.
+    Senza proxy fidato gli header di forwarding sono ignorati: li sceglie il client.
+    """
+    forwarded = None
+    if trusted_proxy == "fly":
+        forwarded = headers.get(b"fly-client-ip")
+    elif trusted_proxy == "xff":
+        # Solo l'ultimo elemento è scritto dal proxy, i precedenti arrivano dal client
+        forwarded = (headers.get(b"x-forwarded-for") or b"").split(b",")[-1]
+    if forwarded and forwarded.strip():
+        return forwarded.strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def admitted_path(path: str, paths: tuple = ADMISSION_PATHS) -> bool:
+    """Il percorso è uno di quelli controllati o vi è annidato (/mcp e /mcp/..., non /mcpX)"""
+    return any(path == p or path.startswith(p.rstrip("/") + "/") for p in paths)
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI puro (niente BaseHTTPMiddleware, per non aggiungere task per richiesta).
+    Nell'ordine:
+    - 429 + Retry-After se il client ha esaurito il suo token bucket
+    - 503 + Retry-After se le POST in corso superano ADMISSION_MAX_IN_FLIGHT, o se il
+      ritardo dell'event loop supera ADMISSION_MAX_LOOP_LAG e sono già in corso
+      ADMISSION_MIN_IN_FLIGHT richieste (il server continua a smaltire, ma non accumula)
+    Gli stream SSE (GET) sono soggetti al rate limit ma non contano tra le richieste in corso.
+    """
+
+    in_flight = Gauge("mcp_http_in_flight", "POST requests to admission-controlled paths currently in progress")
+    rejections_total = Counter("mcp_admission_rejections_total", "Requests rejected by admission control", ("reason",))
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.buckets = ClientBuckets(
+            ADMISSION_RATE, ADMISSION_BURST, ADMISSION_MAX_CLIENTS, ADMISSION_IP_RATE, ADMISSION_IP_BURST
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not admitted_path(scope["path"]) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        if ADMISSION_RATE > 0:
+            wait = self.buckets.take_for(scope)
+            if wait > 0:
+                self.rejections_total.inc("rate_limited")
+                await self._reject(send, 429, math.ceil(wait), RATE_LIMITED, "Rate limit exceeded, retry later")
+                return
+
+        if scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._overload_reason()
+        if reason is not None:
+            self.rejections_total.inc(reason)
+            await self._reject(send, 503, ADMISSION_RETRY_AFTER, SERVER_OVERLOADED, "Server overloaded, retry later")
+            return
+
+        self.active += 1
+        self.in_flight.set(value=self.active)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active -= 1
+            self.in_flight.set(value=self.active)
+
+    def _overload_reason(self) -> str | None:
+        if self.active >= ADMISSION_MAX_IN_FLIGHT:
+            return "in_flight"
+        if self.active >= ADMISSION_MIN_IN_FLIGHT and Metrics.event_loop_lag.value() > ADMISSION_MAX_LOOP_LAG:
+            return "loop_lag"
+        return None
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: int, code: int, message: str) -> None:
+        body = MCPCodec.encode(MCPCodec.error(None, code, message))
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, retry_after)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+Metrics.register(AdmissionMiddleware.in_flight)
+Metrics.register(AdmissionMiddleware.rejections_total)
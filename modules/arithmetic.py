@@ -0,0 +1,447 @@
+"""
+Arithmetic Engine Module
+Valutazione sicura di espressioni aritmetiche tramite AST, con budget di costo e di tempo
+"""
+import os
+import ast
+import math
+import time
+import operator
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+# Limiti dell'engine
+ARITH_MAX_LENGTH = int(os.getenv("ARITH_MAX_LENGTH", 1000))
+ARITH_MAX_NODES = int(os.getenv("ARITH_MAX_NODES", 200))
+ARITH_MAX_BITS = int(os.getenv("ARITH_MAX_BITS", 4096))
+ARITH_TIME_BUDGET = float(os.getenv("ARITH_TIME_BUDGET", 0.05))
+ARITH_CACHE_SIZE = int(os.getenv("ARITH_CACHE_SIZE", 1024))
+# Modalità bulk: righe massime per chiamata e soglia minima per vettorizzare
+ARITH_MAX_BATCH = int(os.getenv("ARITH_MAX_BATCH", 10000))
+ARITH_VECTOR_MIN_ROWS = int(os.getenv("ARITH_VECTOR_MIN_ROWS", 8))
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+_NO_VALUE = object()
+
+
+class ExpressionError(ValueError):
+    """Espressione non valida o oltre i limiti di costo consentiti"""
+
+
+class CompiledExpression:
+    """
+    Espressione già analizzata e validata, pronta per essere valutata.
+    Il nodo radice è una tupla annidata: ("const", v), ("var", nome),
+    ("unary", op, nodo) oppure ("binary", op, sinistro, destro).
+    """
+
+    __slots__ = ("source", "root", "variables", "node_count", "_value")
+
+    def __init__(self, source: str, root: Tuple, variables: frozenset, node_count: int):
+        self.source = source
+        self.root = root
+        self.variables = variables
+        self.node_count = node_count
+        self._value = _NO_VALUE
+
+    def evaluate(self, variables: Dict[str, Any] | None = None) -> int | float:
+        """Valuta l'espressione rispettando i limiti su bit degli operandi e tempo"""
+        if not self.variables:
+            # Espressione costante: il risultato viene memorizzato insieme alla compilazione
+            if self._value is _NO_VALUE:
+                self._value = ArithmeticEngine._eval(self.root, {}, time.perf_counter() + ARITH_TIME_BUDGET)
+            return self._value
+
+        bindings = variables or {}
+        missing = self.variables.difference(bindings)
+        if missing:
+            raise ExpressionError(f"Missing value for variable(s): {', '.join(sorted(missing))}")
+        for name in self.variables:
+            ArithmeticEngine._check_operand(bindings[name])
+        return ArithmeticEngine._eval(self.root, bindings, time.perf_counter() + ARITH_TIME_BUDGET)
+
+
+class ArithmeticEngine:
+    """Parser e valutatore di espressioni aritmetiche (+, -, *, /, //, %, **)"""
+
+    @staticmethod
+    def evaluate(expression: str, variables: Dict[str, Any] | None = None) -> int | float:
+        """Compila (con cache LRU) e valuta un'espressione"""
+        return ArithmeticEngine.compile(expression).evaluate(variables)
+
+    @staticmethod
+    def compile(expression: str) -> CompiledExpression:
+        """Restituisce l'espressione compilata, riusando la cache LRU"""
+        return ArithmeticEngine._compile_cached(expression.strip())
+
+    @staticmethod
+    @lru_cache(maxsize=ARITH_CACHE_SIZE)
+    def _compile_cached(source: str) -> CompiledExpression:
+        if not source:
+            raise ExpressionError("Empty expression")
+        if len(source) > ARITH_MAX_LENGTH:
+            raise ExpressionError(f"Expression too long (max {ARITH_MAX_LENGTH} characters)")
+
+        try:
+            tree = ast.parse(source, mode="eval")
+        except (SyntaxError, ValueError) as e:
+            raise ExpressionError(f"Invalid expression: {e.msg if isinstance(e, SyntaxError) else e}")
+
+        variables = set()
+        counter = [0]
+        root = ArithmeticEngine._build(tree.body, variables, counter)
+        return CompiledExpression(source, root, frozenset(variables), counter[0])
+
+    @staticmethod
+    def _build(node: ast.AST, variables: set, counter: list) -> Tuple:
+        """Converte l'AST Python nel formato interno, rifiutando i nodi non ammessi"""
+        counter[0] += 1
+        if counter[0] > ARITH_MAX_NODES:
+            raise ExpressionError(f"Expression too complex (max {ARITH_MAX_NODES} nodes)")
+
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ExpressionError(f"Unsupported constant: {value!r}")
+            ArithmeticEngine._check_operand(value)
+            return ("const", value)
+
+        if isinstance(node, ast.Name):
+            variables.add(node.id)
+            return ("var", node.id)
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            return ("unary", _UNARY_OPS[type(node.op)], ArithmeticEngine._build(node.operand, variables, counter))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return (
+                "binary",
+                _BINARY_OPS[type(node.op)],
+                ArithmeticEngine._build(node.left, variables, counter),
+                ArithmeticEngine._build(node.right, variables, counter),
+            )
+
+        raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+    @staticmethod
+    def _check_operand(value: Any) -> None:
+        """Verifica che un operando sia un numero di dimensione accettabile"""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ExpressionError(f"Operand is not a number: {value!r}")
+        if isinstance(value, int) and value.bit_length() > ARITH_MAX_BITS:
+            raise ExpressionError(f"Operand too large (max {ARITH_MAX_BITS} bits)")
+
+    @staticmethod
+    def _eval(node: Tuple, variables: Dict[str, Any], deadline: float) -> int | float:
+        kind = node[0]
+        if kind == "const":
+            return node[1]
+        if kind == "var":
+            return variables[node[1]]
+
+        if time.perf_counter() > deadline:
+            raise ExpressionError("Evaluation time budget exceeded")
+
+        if kind == "unary":
+            return node[1](ArithmeticEngine._eval(node[2], variables, deadline))
+
+        op = node[1]
+        left = ArithmeticEngine._eval(node[2], variables, deadline)
+        right = ArithmeticEngine._eval(node[3], variables, deadline)
+
+        # Stima del costo prima di operazioni che possono far esplodere gli interi
+        if isinstance(left, int) and isinstance(right, int):
+            if op is operator.pow and right > 0:
+                if left not in (-1, 0, 1) and math.log2(abs(left)) * right > ARITH_MAX_BITS:
+                    raise ExpressionError(f"Result too large (max {ARITH_MAX_BITS} bits)")
+            elif op is operator.mul:
+                if left.bit_length() + right.bit_length() > ARITH_MAX_BITS + 1:
+                    raise ExpressionError(f"Result too large (max {ARITH_MAX_BITS} bits)")
+
+        try:
+            result = op(left, right)
+        except OverflowError:
+            raise ExpressionError("Numerical result out of range")
+
+        if isinstance(result, complex):
+            raise ExpressionError("Complex results are not supported")
+        return result
+
+
+class BulkEvaluator:
+    """
+    Valutazione di molte espressioni in un solo passaggio vettorizzato con NumPy.
+    Le espressioni con la stessa struttura (es. la stessa formula su numeri diversi)
+    vengono raggruppate e calcolate insieme; gli errori sono riportati per riga.
+    Senza NumPy si ricade sulla valutazione scalare con ArithmeticEngine.
+    """
+
+    # Oltre 2**53 un float64 non rappresenta più esattamente gli interi
+    _EXACT_INT_LIMIT = 2 ** 53
+
+    _ERRORS = {
+        1: "division by zero",
+        2: "Complex results are not supported",
+        3: "Numerical result out of range",
+    }
+
+    @staticmethod
+    def evaluate_expressions(expressions: List[str]) -> List[Dict[str, Any]]:
+        """Valuta una lista di espressioni costanti, raggruppandole per struttura"""
+        results: List[Dict[str, Any]] = [{} for _ in expressions]
+        groups: Dict[Tuple, Tuple[List[int], List[List[Any]]]] = {}
+
+        for index, expression in enumerate(expressions):
+            try:
+                if not isinstance(expression, str):
+                    raise ExpressionError("Expression must be a string")
+                compiled = ArithmeticEngine.compile(expression)
+                if compiled.variables:
+                    raise ExpressionError("Operation contains unsafe characters")
+            except ExpressionError as e:
+                results[index] = {"error": str(e)}
+                continue
+
+            constants: List[Any] = []
+            template = BulkEvaluator._template(compiled.root, constants)
+            rows, values = groups.setdefault(template, ([], []))
+            rows.append(index)
+            values.append(constants)
+
+        for template, (rows, values) in groups.items():
+            names = [f"#{i}" for i in range(len(values[0]))]
+            bindings = [dict(zip(names, row_values)) for row_values in values]
+            for index, outcome in zip(rows, BulkEvaluator._evaluate_template(template, bindings)):
+                results[index] = outcome
+        return results
+
+    @staticmethod
+    def evaluate_formula(formula: str, bindings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Valuta una formula con variabili su una tabella di binding (una riga per binding)"""
+        compiled = ArithmeticEngine.compile(formula)
+        constants: List[Any] = []
+        template = BulkEvaluator._template(compiled.root, constants)
+        extra = {f"#{i}": value for i, value in enumerate(constants)}
+        rows = [{**row, **extra} if isinstance(row, dict) else row for row in bindings]
+        return BulkEvaluator._evaluate_template(template, rows)
+
+    @staticmethod
+    def _template(node: Tuple, constants: List[Any]) -> Tuple:
+        """
+        Sostituisce le costanti con variabili posizionali (#0, #1, ...), nomi che
+        non possono collidere con le variabili dell'utente
+        """
+        kind = node[0]
+        if kind == "const":
+            constants.append(node[1])
+            return ("var", f"#{len(constants) - 1}")
+        if kind == "var":
+            return node
+        if kind == "unary":
+            return ("unary", node[1], BulkEvaluator._template(node[2], constants))
+        return (
+            "binary",
+            node[1],
+            BulkEvaluator._template(node[2], constants),
+            BulkEvaluator._template(node[3], constants),
+        )
+
+    @staticmethod
+    def _variables(node: Tuple, found: set) -> set:
+        if node[0] == "var":
+            found.add(node[1])
+        elif node[0] == "unary":
+            BulkEvaluator._variables(node[2], found)
+        elif node[0] == "binary":
+            BulkEvaluator._variables(node[2], found)
+            BulkEvaluator._variables(node[3], found)
+        return found
+
+    @staticmethod
+    def _has_operator(node: Tuple, ops: Tuple) -> bool:
+        if node[0] == "unary":
+            return BulkEvaluator._has_operator(node[2], ops)
+        if node[0] == "binary":
+            return (
+                node[1] in ops
+                or BulkEvaluator._has_operator(node[2], ops)
+                or BulkEvaluator._has_operator(node[3], ops)
+            )
+        return False
+
+    @staticmethod
+    def _pow_feeds_modulo(node: Tuple) -> bool:
+        """True se un ** compare tra gli operandi di un % o //"""
+        if node[0] == "unary":
+            return BulkEvaluator._pow_feeds_modulo(node[2])
+        if node[0] != "binary":
+            return False
+        if node[1] in (operator.mod, operator.floordiv) and BulkEvaluator._has_operator(node, (operator.pow,)):
+            return True
+        return BulkEvaluator._pow_feeds_modulo(node[2]) or BulkEvaluator._pow_feeds_modulo(node[3])
+
+    @staticmethod
+    def _evaluate_scalar(root: Tuple, bindings: Dict[str, Any]) -> Dict[str, Any]:
+        """Valutazione esatta di una singola riga con le regole di ArithmeticEngine"""
+        if not isinstance(bindings, dict):
+            return {"error": "Variable bindings must be an object"}
+        try:
+            for value in bindings.values():
+                ArithmeticEngine._check_operand(value)
+            result = ArithmeticEngine._eval(root, bindings, time.perf_counter() + ARITH_TIME_BUDGET)
+            if isinstance(result, float) and not math.isfinite(result):
+                raise ExpressionError("Numerical result out of range")
+            return {"result": result}
+        except KeyError as e:
+            return {"error": f"Missing value for variable(s): {e.args[0]}"}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def _evaluate_template(root: Tuple, bindings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Valuta la stessa espressione su tutte le righe, vettorizzando quando possibile"""
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is None or len(bindings) < ARITH_VECTOR_MIN_ROWS:
+            return [BulkEvaluator._evaluate_scalar(root, row) for row in bindings]
+
+        names = sorted(BulkEvaluator._variables(root, set()))
+        count = len(bindings)
+        results: List[Dict[str, Any]] = [{} for _ in range(count)]
+        invalid = np.zeros(count, dtype=bool)
+        # Righe in cui tutti gli operandi sono interi: il risultato deve restare intero ed esatto
+        integer_rows = np.full(count, not BulkEvaluator._has_operator(root, (operator.truediv,)), dtype=bool)
+        columns = {}
+
+        for name in names:
+            raw = [binding.get(name) if isinstance(binding, dict) else None for binding in bindings]
+            try:
+                # Percorso veloce: colonna interamente numerica
+                if not all(type(value) is int or type(value) is float for value in raw):
+                    raise TypeError
+                column = np.array(raw, dtype=np.float64)
+                is_int = np.fromiter((type(value) is int for value in raw), dtype=bool, count=count)
+            except (TypeError, OverflowError):
+                column, is_int = BulkEvaluator._slow_column(np, name, raw, bindings, results, invalid)
+
+            integer_rows &= is_int
+            # Interi non rappresentabili esattamente: la riga verrà calcolata in modo scalare
+            invalid |= is_int & (np.abs(column) >= BulkEvaluator._EXACT_INT_LIMIT)
+            columns[name] = column
+
+        state = {
+            "errors": np.zeros(count, dtype=np.int8),
+            "inexact": np.zeros(count, dtype=bool),
+            "negative_pow": np.zeros(count, dtype=bool),
+        }
+        with np.errstate(all="ignore"):
+            values = BulkEvaluator._eval_vector(np, root, columns, count, state)
+
+        errors = state["errors"].tolist()
+        exact_rows = integer_rows & ~state["negative_pow"]
+        scalar_rows = invalid | (integer_rows & state["inexact"])
+        if BulkEvaluator._pow_feeds_modulo(root):
+            # np.power e ** possono differire di un ulp sui float: % e // lo amplificano
+            # fino a cambiare il risultato, quindi quelle righe seguono il percorso scalare
+            scalar_rows |= ~exact_rows
+        scalar_rows = scalar_rows.tolist()
+        exact_rows = exact_rows.tolist()
+        values = values.tolist()
+
+        for row in range(count):
+            if results[row]:
+                continue
+            if scalar_rows[row]:
+                results[row] = BulkEvaluator._evaluate_scalar(root, bindings[row])
+            elif errors[row]:
+                results[row] = {"error": BulkEvaluator._ERRORS[errors[row]]}
+            elif exact_rows[row] and values[row].is_integer():
+                results[row] = {"result": int(values[row])}
+            else:
+                results[row] = {"result": values[row]}
+        return results
+
+    @staticmethod
+    def _slow_column(np, name: str, raw: List[Any], bindings: List[Any], results: List[Dict[str, Any]], invalid):
+        """Costruisce una colonna validando riga per riga (valori mancanti o non numerici)"""
+        count = len(raw)
+        column = np.zeros(count, dtype=np.float64)
+        is_int = np.zeros(count, dtype=bool)
+        for row, value in enumerate(raw):
+            if invalid[row]:
+                continue
+            if not isinstance(bindings[row], dict):
+                results[row] = {"error": "Variable bindings must be an object"}
+                invalid[row] = True
+                continue
+            if value is None:
+                results[row] = {"error": f"Missing value for variable(s): {name}"}
+                invalid[row] = True
+                continue
+            try:
+                ArithmeticEngine._check_operand(value)
+                column[row] = value
+            except ExpressionError as e:
+                results[row] = {"error": str(e)}
+                invalid[row] = True
+                continue
+            except OverflowError:
+                # Intero oltre il range dei float: ci penserà la valutazione scalare
+                invalid[row] = True
+            is_int[row] = isinstance(value, int)
+        return column, is_int
+
+    @staticmethod
+    def _eval_vector(np, node: Tuple, columns: Dict[str, Any], count: int, state: Dict[str, Any]):
+        kind = node[0]
+        if kind == "const":
+            return np.full(count, float(node[1]), dtype=np.float64)
+        if kind == "var":
+            return columns[node[1]]
+        if kind == "unary":
+            operand = BulkEvaluator._eval_vector(np, node[2], columns, count, state)
+            return -operand if node[1] is operator.neg else operand
+
+        op = node[1]
+        left = BulkEvaluator._eval_vector(np, node[2], columns, count, state)
+        right = BulkEvaluator._eval_vector(np, node[3], columns, count, state)
+        errors = state["errors"]
+
+        if op in (operator.truediv, operator.floordiv, operator.mod):
+            errors[(errors == 0) & (right == 0)] = 1
+        if op is operator.pow:
+            errors[(errors == 0) & (left == 0) & (right < 0)] = 1
+            errors[(errors == 0) & (left < 0) & (right != np.floor(right))] = 2
+            state["negative_pow"] |= right < 0
+
+        result = {
+            operator.add: np.add,
+            operator.sub: np.subtract,
+            operator.mul: np.multiply,
+            operator.truediv: np.true_divide,
+            operator.floordiv: np.floor_divide,
+            operator.mod: np.mod,
+            operator.pow: np.power,
+        }[op](left, right)
+
+        overflow = ~np.isfinite(result) & np.isfinite(left) & np.isfinite(right)
+        errors[(errors == 0) & overflow] = 3
+        state["inexact"] |= np.abs(result) >= BulkEvaluator._EXACT_INT_LIMIT
+        return result
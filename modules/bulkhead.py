@@ -0,0 +1,134 @@
+"""
+Bulkhead Module
+Limiti per tool: concorrenza massima, coda di attesa limitata e deadline di esecuzione
+"""
+import os
+import asyncio
+from typing import Dict, Any, Callable, Awaitable
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.codec import MCPError, INVALID_PARAMS, REQUEST_TIMEOUT, SERVER_OVERLOADED
+    from modules.metrics import Metrics, Counter
+    from modules.tool_registry import ToolSpec
+except ImportError:
+    # Fall back to relative import (for development)
+    from .codec import MCPError, INVALID_PARAMS, REQUEST_TIMEOUT, SERVER_OVERLOADED
+    from .metrics import Metrics, Counter
+    from .tool_registry import ToolSpec
+
+# Default per i tool che non dichiarano gli hint max_concurrency, max_queue e timeout
+TOOL_DEFAULT_MAX_CONCURRENCY = int(os.getenv("TOOL_DEFAULT_MAX_CONCURRENCY", 16))
+TOOL_DEFAULT_MAX_QUEUE = int(os.getenv("TOOL_DEFAULT_MAX_QUEUE", 32))
+TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", 30))
+
+
+class DeadlineExceeded(TimeoutError):
+    """La deadline del bulkhead è scaduta (in coda o durante l'esecuzione)"""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Deadline of {timeout:g}s exceeded")
+        self.timeout = timeout
+
+
+class Bulkhead:
+    """
+    Semaforo con coda limitata per un singolo tool: oltre max_concurrency le
+    chiamate attendono, oltre max_queue in attesa vengono rifiutate subito.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def is_full(self) -> bool:
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+
+    async def run(self, factory: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        """
+        Esegue factory(tempo_rimanente) entro timeout secondi, attesa in coda compresa.
+        Allo scadere il task viene cancellato e si solleva DeadlineExceeded;
+        un TimeoutError sollevato dal tool stesso si propaga invariato.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        scope = asyncio.timeout_at(deadline)
+        try:
+            async with scope:
+                self.waiting += 1
+                try:
+                    await self._semaphore.acquire()
+                finally:
+                    self.waiting -= 1
+                try:
+                    return await factory(max(0.0, deadline - loop.time()))
+                finally:
+                    self._semaphore.release()
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            raise DeadlineExceeded(timeout) from None
+
+
+class ToolBulkheads:
+    """Un Bulkhead per tool, creato al primo uso a partire dagli hint del registro"""
+
+    rejections_total = Counter(
+        "mcp_tool_rejections_total", "tools/call rejected by the bulkhead or cancelled at the deadline",
+        ("tool", "reason")
+    )
+
+    _bulkheads: Dict[str, Bulkhead] = {}
+
+    @classmethod
+    def get(cls, spec: ToolSpec) -> Bulkhead:
+        bulkhead = cls._bulkheads.get(spec.name)
+        if bulkhead is None:
+            bulkhead = cls._bulkheads[spec.name] = Bulkhead(
+                int(spec.hints.get("max_concurrency", TOOL_DEFAULT_MAX_CONCURRENCY)),
+                int(spec.hints.get("max_queue", TOOL_DEFAULT_MAX_QUEUE)),
+            )
+        return bulkhead
+
+    @staticmethod
+    def deadline(spec: ToolSpec, params: Dict[str, Any]) -> float:
+        """
+        Deadline della chiamata in secondi: il timeout del tool (hint o default),
+        ridotto da params._meta.timeout se il client ne chiede uno più breve.
+        """
+        limit = float(spec.hints.get("timeout", TOOL_DEFAULT_TIMEOUT))
+        meta = params.get("_meta")
+        requested = meta.get("timeout") if isinstance(meta, dict) else None
+        if requested is None:
+            return limit
+        if isinstance(requested, bool) or not isinstance(requested, (int, float)) or requested <= 0:
+            raise MCPError(INVALID_PARAMS, "Invalid params: '_meta.timeout' must be a positive number of seconds")
+        return min(float(requested), limit)
+
+    @classmethod
+    async def run(cls, spec: ToolSpec, params: Dict[str, Any], factory: Callable[[float], Awaitable[Any]]) -> Any:
+        """
+        Esegue la chiamata dentro il bulkhead del tool.
+        Coda piena e deadline superata diventano errori JSON-RPC (MCPError).
+        Nota: un tool sincrono eseguito inline non può essere interrotto, la
+        deadline lo cancella solo al primo punto di attesa.
+        """
+        timeout = cls.deadline(spec, params)
+        bulkhead = cls.get(spec)
+        if bulkhead.is_full():
+            cls.rejections_total.inc(spec.name, "queue_full")
+            raise MCPError(
+                SERVER_OVERLOADED,
+                f"Tool '{spec.name}' is overloaded "
+                f"({bulkhead.max_concurrency} running, {bulkhead.max_queue} queued), retry later"
+            )
+        try:
+            return await bulkhead.run(factory, timeout)
+        except DeadlineExceeded:
+            cls.rejections_total.inc(spec.name, "timeout")
+            raise MCPError(REQUEST_TIMEOUT, f"Tool '{spec.name}' exceeded its {timeout:g}s deadline") from None
+
+
+Metrics.register(ToolBulkheads.rejections_total)
@@ -0,0 +1,81 @@
+"""
+Calculator Module
+Implementazione del tool calculate_operation. Dipende solo dall'engine aritmetico:
+i worker del pool di processi la importano senza caricare server, registro o stato condiviso
+"""
+import json
+from typing import Dict, Any
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.arithmetic import ArithmeticEngine, BulkEvaluator, ARITH_MAX_BATCH
+except ImportError:
+    # Fall back to relative import (for development)
+    from .arithmetic import ArithmeticEngine, BulkEvaluator, ARITH_MAX_BATCH
+
+
+class Calculator:
+    """Calcolo delle espressioni e formattazione del risultato del tool"""
+
+    @staticmethod
+    def calculate(arguments: Dict[str, Any]) -> str:
+        """Esegue operazioni matematiche (singola espressione o modalità bulk)"""
+        if arguments.get("operations") is not None or arguments.get("formula") is not None:
+            return Calculator._calculate_bulk(arguments)
+
+        operation = arguments.get("operation", "")
+        if not operation:
+            return "Error: Operation parameter is required"
+        
+        try:
+            compiled = ArithmeticEngine.compile(operation)
+            if compiled.variables:
+                return "Error: Operation contains unsafe characters"
+            result = compiled.evaluate()
+            return f"Calculation: {operation} = {result}"
+        except Exception as e:
+            return f"Error calculating operation: {e}"
+
+    @staticmethod
+    def _calculate_bulk(arguments: Dict[str, Any]) -> str:
+        """Modalità bulk: molte espressioni (o una formula su più binding) in un solo passaggio"""
+        operations = arguments.get("operations")
+        formula = arguments.get("formula")
+
+        if formula is not None:
+            variables = arguments.get("variables", [])
+            if isinstance(variables, dict):
+                # Formato a colonne: {"x": [1, 2], "y": [3, 4]} -> righe
+                columns = {k: v if isinstance(v, list) else [v] for k, v in variables.items()}
+                length = max((len(v) for v in columns.values()), default=0)
+                variables = [
+                    {k: v[i] for k, v in columns.items() if i < len(v)}
+                    for i in range(length)
+                ]
+            if not isinstance(variables, list) or not variables:
+                return "Error: 'variables' must be a non-empty list of bindings or an object of columns"
+            if len(variables) > ARITH_MAX_BATCH:
+                return f"Error: Too many rows (max {ARITH_MAX_BATCH})"
+            try:
+                outcomes = BulkEvaluator.evaluate_formula(formula, variables)
+            except Exception as e:
+                return f"Error calculating operation: {e}"
+            results = [{"index": i, **outcome} for i, outcome in enumerate(outcomes)]
+        else:
+            if not isinstance(operations, list) or not operations:
+                return "Error: 'operations' must be a non-empty list of strings"
+            if len(operations) > ARITH_MAX_BATCH:
+                return f"Error: Too many operations (max {ARITH_MAX_BATCH})"
+            outcomes = BulkEvaluator.evaluate_expressions(operations)
+            results = [
+                {"index": i, "operation": operation, **outcome}
+                for i, (operation, outcome) in enumerate(zip(operations, outcomes))
+            ]
+
+        failed = sum(1 for r in results if "error" in r)
+        return json.dumps({
+            "count": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": results
+        })
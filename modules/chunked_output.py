@@ -0,0 +1,156 @@
+"""
+Chunked Output Module
+Output dei tool prodotto a pezzi (generatori) e inviato al client man mano che viene letto
+"""
+import os
+import asyncio
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, AsyncIterable, List
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.structured_logging import StructuredLogger
+except ImportError:
+    # Fall back to relative import (for development)
+    from .structured_logging import StructuredLogger
+
+# Dimensione massima dell'output di un tool (caratteri): oltre viene troncato
+MCP_TOOL_MAX_OUTPUT = int(os.getenv("MCP_TOOL_MAX_OUTPUT", 16 * 1024 * 1024))
+# Dimensione indicativa dei pezzi prodotti dai tool in streaming (caratteri)
+MCP_STREAM_CHUNK_SIZE = int(os.getenv("MCP_STREAM_CHUNK_SIZE", 64 * 1024))
+
+_END = object()
+
+logger = StructuredLogger("mcp.chunked_output")
+
+
+def truncation_notice(limit: int) -> str:
+    return f"\n[output truncated at {limit} characters]"
+
+
+class ChunkedText:
+    """
+    Testo prodotto da un generatore sync o async di stringhe.
+    Il generatore avanza solo quando il trasporto chiede il pezzo successivo
+    (backpressure: un client lento ferma il tool invece di far crescere un buffer).
+    Un generatore sync avanza in un thread, così il calcolo di ogni pezzo non blocca l'event loop.
+    L'output si interrompe con un avviso oltre max_chars o allo scadere della deadline;
+    un'eccezione a metà stream chiude il testo con un avviso e imposta error.
+    on_finish(failed) viene chiamata alla chiusura dello stream (metriche del tool).
+    """
+
+    def __init__(
+        self, source: Iterable[str] | AsyncIterable[str], buffered: List[str], max_chars: int, deadline: float | None
+    ):
+        self._source = source
+        self._buffered = buffered
+        self.max_chars = max_chars
+        self.deadline = deadline
+        self.size = 0
+        self.error: str | None = None
+        self.on_finish: Callable[[bool], None] | None = None
+
+    @classmethod
+    async def start(
+        cls,
+        source: Iterable[str] | AsyncIterable[str],
+        timeout: float | None = None,
+        max_chars: int = MCP_TOOL_MAX_OUTPUT
+    ) -> "ChunkedText | str":
+        """
+        Legge i primi pezzi, fino a MCP_STREAM_CHUNK_SIZE caratteri. Se il primo è un
+        errore ("Error...") o il generatore termina entro quel limite restituisce
+        direttamente la stringa (risposta normale, senza streaming), altrimenti un ChunkedText
+        """
+        if hasattr(source, "__anext__"):
+            buffered = await cls._aprefetch(source, MCP_STREAM_CHUNK_SIZE)
+        else:
+            source = iter(source)
+            # Un solo passaggio nel thread per tutti i pezzi iniziali
+            buffered = await asyncio.to_thread(cls._prefetch, source, MCP_STREAM_CHUNK_SIZE)
+        first = buffered[0]
+        if first is not _END and first.startswith("Error"):
+            await cls._close(source)
+            return first
+        if buffered[-1] is _END:
+            return "".join(buffered[:-1])
+        deadline = asyncio.get_running_loop().time() + timeout if timeout is not None else None
+        return cls(source, buffered, max_chars, deadline)
+
+    @staticmethod
+    def _prefetch(source: Iterator[str], limit: int) -> List[Any]:
+        """Pezzi letti finché superano limit caratteri; termina con _END se il generatore è esaurito"""
+        buffered: List[Any] = []
+        size = 0
+        while size <= limit:
+            chunk = next(source, _END)
+            buffered.append(chunk)
+            if chunk is _END or (len(buffered) == 1 and chunk.startswith("Error")):
+                break
+            size += len(chunk)
+        return buffered
+
+    @staticmethod
+    async def _aprefetch(source: AsyncIterator[str], limit: int) -> List[Any]:
+        buffered: List[Any] = []
+        size = 0
+        while size <= limit:
+            chunk = await anext(source, _END)
+            buffered.append(chunk)
+            if chunk is _END or (len(buffered) == 1 and chunk.startswith("Error")):
+                break
+            size += len(chunk)
+        return buffered
+
+    @staticmethod
+    async def _next(source) -> Any:
+        if hasattr(source, "__anext__"):
+            return await anext(source, _END)
+        return await asyncio.to_thread(next, source, _END)
+
+    @staticmethod
+    async def _close(source) -> None:
+        if hasattr(source, "aclose"):
+            await source.aclose()
+        elif hasattr(source, "close"):
+            try:
+                source.close()
+            except ValueError:
+                # Stream cancellato mentre il thread calcola ancora un pezzo: il generatore
+                # termina quel passo e viene raccolto dal garbage collector
+                pass
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        pending = iter(self._buffered)
+        chunk = next(pending)
+        try:
+            while chunk is not _END:
+                if self.size + len(chunk) > self.max_chars:
+                    yield chunk[:self.max_chars - self.size] + truncation_notice(self.max_chars)
+                    return
+                self.size += len(chunk)
+                yield chunk
+                if self.deadline is not None and loop.time() > self.deadline:
+                    yield "\n[output truncated: deadline exceeded]"
+                    return
+                try:
+                    chunk = next(pending, _END)
+                    if chunk is _END:
+                        chunk = await self._next(self._source)
+                except Exception as e:
+                    # Lo status 200 è già stato inviato: il testo si chiude con l'errore
+                    self.error = str(e) or type(e).__name__
+                    logger.warning("stream_error", error=self.error, sent_chars=self.size)
+                    yield f"\n[output truncated: error: {self.error}]"
+                    return
+        finally:
+            await self._close(self._source)
+            if self.on_finish is not None:
+                self.on_finish(self.error is not None)
+
+    @staticmethod
+    def truncate(text: str, max_chars: int = MCP_TOOL_MAX_OUTPUT) -> str:
+        """Applica il limite di output anche ai tool che restituiscono una stringa"""
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars] + truncation_notice(max_chars)
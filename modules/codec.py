@@ -0,0 +1,169 @@
+"""
+MCP Codec Module
+Decodifica e serializzazione dei messaggi JSON-RPC direttamente da/in bytes
+"""
+import json
+from typing import Dict, Any, AsyncIterable, AsyncIterator
+
+try:
+    import orjson
+except ImportError:
+    # orjson è opzionale: senza, si usa il modulo json della libreria standard
+    orjson = None
+
+# Codici di errore JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+INVALID_PARAMS = -32602
+# Codici riservati al server (-32000..-32099)
+REQUEST_TIMEOUT = -32001
+SERVER_OVERLOADED = -32003
+RATE_LIMITED = -32029
+IDEMPOTENCY_CONFLICT = -32009
+
+
+class MCPError(Exception):
+    """Errore da restituire al client come risposta JSON-RPC con il codice indicato"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class PreEncodedResponse(dict):
+    """
+    Risposta JSON-RPC con il campo "result" già serializzato.
+    Si comporta come un normale dict, ma MCPCodec riusa i bytes precalcolati
+    invece di ricodificare il risultato: il contenuto non va modificato.
+    """
+
+    def __init__(self, msg_id: int | str | None, result: Any, result_bytes: bytes):
+        super().__init__(jsonrpc="2.0", id=msg_id, result=result)
+        self.result_bytes = result_bytes
+
+
+class ChunkedResponse(dict):
+    """
+    Risposta tools/call il cui testo viene prodotto a pezzi durante l'invio.
+    Nel dict il testo è vuoto: il contenuto reale arriva da chunks e viene
+    serializzato solo da MCPCodec.iter_encode.
+    """
+
+    def __init__(self, msg_id: int | str | None, chunks: AsyncIterable[str]):
+        super().__init__(jsonrpc="2.0", id=msg_id, result={"content": [{"type": "text", "text": ""}]})
+        self.chunks = chunks
+
+
+class MCPCodec:
+    """Codifica e decodifica dei messaggi JSON-RPC"""
+
+    @staticmethod
+    def dumps(obj: Any) -> bytes:
+        """Serializza un oggetto JSON in forma compatta"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj)
+            except TypeError:
+                # Es. interi oltre 64 bit: li gestisce il modulo json standard
+                pass
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def loads(body: bytes) -> Any:
+        """Decodifica il body di una richiesta (solleva ValueError se non è JSON valido)"""
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+
+    @staticmethod
+    def encode(message: Any) -> bytes:
+        """Serializza una risposta o un batch di risposte"""
+        if isinstance(message, PreEncodedResponse):
+            return (
+                b'{"jsonrpc":"2.0","id":' + MCPCodec.dumps(message["id"])
+                + b',"result":' + message.result_bytes + b"}"
+            )
+        if isinstance(message, list):
+            return b"[" + b",".join(MCPCodec.encode(m) for m in message) + b"]"
+        return MCPCodec.dumps(message)
+
+    @staticmethod
+    def is_chunked(message: Any) -> bool:
+        """True se la risposta (o una risposta del batch) va inviata in streaming"""
+        if isinstance(message, list):
+            return any(isinstance(m, ChunkedResponse) for m in message)
+        return isinstance(message, ChunkedResponse)
+
+    @staticmethod
+    async def iter_encode(message: Any) -> AsyncIterator[bytes]:
+        """
+        Serializza una risposta pezzo per pezzo: il testo delle ChunkedResponse
+        viene codificato come stringa JSON un chunk alla volta, senza mai
+        costruire l'output completo in memoria
+        """
+        if isinstance(message, ChunkedResponse):
+            yield (
+                b'{"jsonrpc":"2.0","id":' + MCPCodec.dumps(message["id"])
+                + b',"result":{"content":[{"type":"text","text":"'
+            )
+            async for chunk in message.chunks:
+                # L'escape JSON è per carattere: codificare i pezzi separatamente è equivalente
+                yield MCPCodec.dumps(chunk)[1:-1]
+            if getattr(message.chunks, "error", None) is not None:
+                # Errore a metà stream: il JSON resta valido e il risultato è marcato come errore
+                yield b'"}],"isError":true}}'
+            else:
+                yield b'"}]}}'
+        elif isinstance(message, list):
+            yield b"["
+            for index, item in enumerate(message):
+                if index:
+                    yield b","
+                async for part in MCPCodec.iter_encode(item):
+                    yield part
+            yield b"]"
+        else:
+            yield MCPCodec.encode(message)
+
+    @staticmethod
+    def validate_envelope(message: Any) -> str | None:
+        """
+        Controlla solo i campi della busta JSON-RPC, completando i default
+        (jsonrpc, id, params) direttamente sul dict ricevuto senza copiarlo.
+        Restituisce None se valida, altrimenti il motivo dell'errore.
+        """
+        if not isinstance(message, dict):
+            return "Request must be a JSON object"
+        if message.setdefault("jsonrpc", "2.0") != "2.0":
+            return "Unsupported jsonrpc version"
+        if not isinstance(message.get("method"), str):
+            return "Missing or invalid 'method'"
+        msg_id = message.setdefault("id", None)
+        if isinstance(msg_id, bool) or not isinstance(msg_id, (int, str, type(None))):
+            return "Invalid 'id'"
+        if message.get("params") is None:
+            message["params"] = {}
+        elif not isinstance(message["params"], dict):
+            return "'params' must be an object"
+        return None
+
+    @staticmethod
+    def request_id(message: Any) -> int | str | None:
+        """Id da riportare nella risposta di errore (None se mancante o non valido)"""
+        msg_id = message.get("id") if isinstance(message, dict) else None
+        if isinstance(msg_id, bool) or not isinstance(msg_id, (int, str)):
+            return None
+        return msg_id
+
+    @staticmethod
+    def error(msg_id: int | str | None, code: int, message: str) -> Dict[str, Any]:
+        """Costruisce una risposta di errore JSON-RPC"""
+        return {
+            "jsonrpc": "2.0",
+            "id": msg_id,
+            "error": {
+                "code": code,
+                "message": message
+            }
+        }
@@ -0,0 +1,197 @@
+"""
+CPU Pool Module
+Pool di processi per i tool CPU-bound, così l'event loop resta libero di servire le altre richieste
+"""
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.metrics import Metrics, Counter, Gauge
+    from modules.structured_logging import StructuredLogger
+    from modules.cpu_worker import init_worker, ping
+except ImportError:
+    # Fall back to relative import (for development)
+    from .metrics import Metrics, Counter, Gauge
+    from .structured_logging import StructuredLogger
+    from .cpu_worker import init_worker, ping
+
+# Configurazione del pool (CPU_POOL_WORKERS=0 disabilita il pool: tutto inline)
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+# Chiamate massime in attesa o in esecuzione; oltre, la chiamata viene rifiutata
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", 64))
+# Tempo massimo di esecuzione di una chiamata (secondi) prima di uccidere i worker
+CPU_POOL_TIMEOUT = float(os.getenv("CPU_POOL_TIMEOUT", 30))
+# Input più piccoli di questa dimensione (caratteri/elementi) vengono eseguiti inline
+CPU_POOL_INLINE_MAX_SIZE = int(os.getenv("CPU_POOL_INLINE_MAX_SIZE", 2048))
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+logger = StructuredLogger("mcp.cpu_pool")
+
+
+class CPUPoolBusy(RuntimeError):
+    """La coda del pool è piena"""
+
+
+class CPUPoolTimeout(TimeoutError):
+    """La chiamata ha superato il tempo massimo ed è stata interrotta"""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"CPU-bound call exceeded {timeout}s")
+        self.timeout = timeout
+
+
+def payload_size(value: Any, limit: int) -> int:
+    """Stima della dimensione di un input JSON; si ferma appena supera limit"""
+    size = 0
+    stack = [value]
+    while stack and size <= limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item)
+        elif isinstance(item, dict):
+            size += len(item)
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += len(item)
+            stack.extend(item)
+        else:
+            size += 1
+    return size
+
+
+class CPUPool:
+    """
+    ProcessPoolExecutor condiviso, avviato e riscaldato nel lifespan dell'app.
+    - coda limitata: oltre CPU_POOL_MAX_PENDING chiamate viene sollevato CPUPoolBusy
+    - un semaforo lascia passare al pool solo tante chiamate quanti sono i worker,
+      così il timeout misura l'esecuzione e non l'attesa in coda
+    - allo scadere del timeout i worker vengono uccisi e il pool ricreato; le altre
+      chiamate in corso su quel pool vengono ripetute una volta sul nuovo pool,
+      con il tempo che resta del loro timeout
+    """
+
+    pending = Gauge("mcp_cpu_pool_pending", "CPU-bound calls queued or running in the process pool")
+    restarts_total = Counter("mcp_cpu_pool_restarts_total", "Process pool restarts", ("reason",))
+    rejected_total = Counter("mcp_cpu_pool_rejected_total", "CPU-bound calls rejected because the queue was full")
+
+    _executor: ProcessPoolExecutor | None = None
+    _slots: asyncio.Semaphore | None = None
+    _pending = 0
+    _modules: tuple = ()
+    _unavailable = False
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return CPU_POOL_WORKERS > 0 and not cls._unavailable
+
+    @classmethod
+    def should_offload(cls, arguments: Any) -> bool:
+        """True se l'input è abbastanza grande da giustificare il passaggio al pool"""
+        return cls.enabled() and payload_size(arguments, CPU_POOL_INLINE_MAX_SIZE) > CPU_POOL_INLINE_MAX_SIZE
+
+    @classmethod
+    async def startup(cls, module_names: Iterable[str] = ()) -> None:
+        """
+        Crea il pool e attende che ogni worker sia avviato (idempotente).
+        Se i worker non partono (es. con "spawn" quando il programma principale
+        non è protetto da if __name__ == "__main__") i tool restano inline.
+        """
+        cls._modules = tuple(dict.fromkeys(module_names))
+        if not cls.enabled() or cls._executor is not None:
+            return
+        executor = cls._get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, ping) for _ in range(CPU_POOL_WORKERS)))
+        except BrokenProcessPool as e:
+            cls._unavailable = True
+            cls._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.warning("cpu_pool_unavailable", error=str(e), start_method=CPU_POOL_START_METHOD)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Annulla le chiamate in coda e attende (in un thread) l'uscita dei worker"""
+        if cls._executor is not None:
+            executor, cls._executor = cls._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD),
+                initializer=init_worker,
+                initargs=(cls._modules,),
+            )
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(CPU_POOL_WORKERS)
+        return cls._executor
+
+    @classmethod
+    def _restart(cls, executor: ProcessPoolExecutor, reason: str) -> None:
+        """Uccide i worker del pool indicato e ne prepara uno nuovo (solo la prima volta)"""
+        if cls._executor is not executor:
+            return
+        cls._executor = None
+        cls.restarts_total.inc(reason)
+        # shutdown annulla solo le chiamate in coda: un task in esecuzione si interrompe
+        # solo terminando i processi. ProcessPoolExecutor non espone i propri worker, quindi
+        # si leggono da _processes (privato, stabile dalla 3.8) prima che shutdown lo azzeri
+        # e si uccidono solo quelli di questo pool
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    @classmethod
+    async def run(cls, func: Callable, *args: Any, timeout: float | None = None) -> Any:
+        """
+        Esegue func(*args) in un worker, per al massimo min(timeout, CPU_POOL_TIMEOUT) secondi
+        complessivi, retry compreso.
+        func e gli argomenti devono essere picklabili
+        (funzioni a livello di modulo o metodi statici di classi a livello di modulo).
+        """
+        if cls._pending >= CPU_POOL_MAX_PENDING:
+            cls.rejected_total.inc()
+            raise CPUPoolBusy(f"Too many CPU-bound calls in progress (max {CPU_POOL_MAX_PENDING})")
+
+        timeout = CPU_POOL_TIMEOUT if timeout is None else min(timeout, CPU_POOL_TIMEOUT)
+        loop = asyncio.get_running_loop()
+        cls._pending += 1
+        cls.pending.inc()
+        try:
+            cls._get_executor()
+            async with cls._slots:
+                # Il tempo parte quando la chiamata ottiene uno slot; il retry usa solo quello rimasto
+                deadline = loop.time() + timeout
+                for attempt in range(2):
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise CPUPoolTimeout(timeout)
+                    executor = cls._get_executor()
+                    future = loop.run_in_executor(executor, func, *args)
+                    try:
+                        return await asyncio.wait_for(future, remaining)
+                    except asyncio.TimeoutError:
+                        cls._restart(executor, "timeout")
+                        raise CPUPoolTimeout(timeout) from None
+                    except BrokenProcessPool:
+                        # Worker ucciso da un'altra chiamata in timeout o morto da solo
+                        cls._restart(executor, "broken")
+                        if attempt:
+                            raise
+        finally:
+            cls._pending -= 1
+            cls.pending.dec()
+
+
+Metrics.register(CPUPool.pending)
+Metrics.register(CPUPool.restarts_total)
+Metrics.register(CPUPool.rejected_total)
@@ -0,0 +1,18 @@
+"""
+CPU Worker Module
+Funzioni eseguite nei processi del pool all'avvio: il modulo non importa nulla del server,
+così un worker carica solo i moduli dei tool che deve eseguire
+"""
+import os
+import importlib
+from typing import Iterable
+
+
+def init_worker(module_names: Iterable[str]) -> None:
+    """Importa nei worker i moduli con le funzioni dei tool CPU-bound"""
+    for name in module_names:
+        importlib.import_module(name)
+
+
+def ping() -> int:
+    return os.getpid()
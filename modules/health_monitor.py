@@ -0,0 +1,291 @@
+"""
+Health Monitor Module
+Probe periodici in background degli URL registrati, con storia compatta per URL
+"""
+import os
+import math
+import time
+import random
+import asyncio
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.health_probe import HealthProbe, normalize_url, percentile
+    from modules.system_status import SampleRing
+    from modules.state_store import StateStore, StateTable
+    from modules.metrics import Metrics, Gauge
+    from modules.structured_logging import StructuredLogger
+except ImportError:
+    # Fall back to relative import (for development)
+    from .health_probe import HealthProbe, normalize_url, percentile
+    from .system_status import SampleRing
+    from .state_store import StateStore, StateTable
+    from .metrics import Metrics, Gauge
+    from .structured_logging import StructuredLogger
+
+# URL monitorati al massimo e probe conservati per URL
+HEALTH_MONITOR_MAX_TARGETS = int(os.getenv("HEALTH_MONITOR_MAX_TARGETS", 100))
+HEALTH_MONITOR_HISTORY = int(os.getenv("HEALTH_MONITOR_HISTORY", 1000))
+# Intervallo tra i probe (secondi): default e minimo consentito
+HEALTH_MONITOR_INTERVAL = float(os.getenv("HEALTH_MONITOR_INTERVAL", 60))
+HEALTH_MONITOR_MIN_INTERVAL = float(os.getenv("HEALTH_MONITOR_MIN_INTERVAL", 5))
+# Variazione casuale dell'intervallo (frazione) per non allineare i probe
+HEALTH_MONITOR_JITTER = float(os.getenv("HEALTH_MONITOR_JITTER", 0.1))
+# Probe in corso al massimo contemporaneamente
+HEALTH_MONITOR_CONCURRENCY = int(os.getenv("HEALTH_MONITOR_CONCURRENCY", 8))
+# Con lo stato persistente (STATE_BACKEND=sqlite): secondi minimi tra due salvataggi della storia di un URL
+HEALTH_MONITOR_PERSIST_INTERVAL = float(os.getenv("HEALTH_MONITOR_PERSIST_INTERVAL", 60))
+
+logger = StructuredLogger("mcp.health_monitor")
+
+
+@dataclass
+class MonitorTarget:
+    """URL monitorato: pianificazione e ultimi probe (timestamp, latenza, status, esito)"""
+    url: str
+    interval: float
+    next_due: float
+    added: float = field(default_factory=time.time)
+    history: SampleRing = field(
+        default_factory=lambda: SampleRing(("elapsed", "status_code", "healthy"), HEALTH_MONITOR_HISTORY)
+    )
+    last_result: Dict[str, Any] | None = None
+    running: bool = False
+    # Probe non ancora salvati nello stato persistente e ultimo salvataggio (monotonic)
+    dirty: bool = False
+    persisted: float = 0.0
+
+
+class HealthMonitor:
+    """
+    Scheduler in background: un solo task sveglia i probe quando sono dovuti,
+    i tool leggono stato e storia dalla memoria senza accedere alla rete.
+    Con lo stato persistente registrazioni e storia sopravvivono al riavvio:
+    le ripristina all'avvio un solo worker, gli altri partono vuoti.
+    """
+
+    targets: Dict[str, MonitorTarget] = {}
+    targets_gauge = Gauge("mcp_health_monitor_targets", "URLs monitored by the background health monitor")
+
+    _task: asyncio.Task | None = None
+    _wakeup: asyncio.Event | None = None
+    _probes: set = set()
+    _limit: asyncio.Semaphore | None = None
+
+    @classmethod
+    async def start(cls) -> None:
+        if cls._task is None or cls._task.done():
+            cls._wakeup = asyncio.Event()
+            cls._limit = asyncio.Semaphore(max(1, HEALTH_MONITOR_CONCURRENCY))
+            if StateStore.claim("health_monitor"):
+                await cls._restore()
+            cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls) -> None:
+        tasks = [cls._task, *cls._probes] if cls._task is not None else list(cls._probes)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        cls._task = None
+        cls._probes.clear()
+        for key, target in cls.targets.items():
+            if target.dirty:
+                cls._persist(key, target)
+
+    @staticmethod
+    def _tables() -> Tuple[StateTable, StateTable] | None:
+        """(registrazioni, storia) nel backend di stato, None se lo stato non è persistente"""
+        if not StateStore.persistent():
+            return None
+        return StateStore.table("health_monitor"), StateStore.table("health_monitor_history")
+
+    @classmethod
+    async def _restore(cls) -> None:
+        """Ricarica URL monitorati, storia e ultimo risultato salvati prima del riavvio"""
+        registrations, histories = cls._tables()
+        now = time.monotonic()
+        restored = 0
+        for key, record in await registrations.aitems():
+            if key in cls.targets or len(cls.targets) >= HEALTH_MONITOR_MAX_TARGETS:
+                continue
+            interval = record["interval"]
+            target = MonitorTarget(
+                record["url"], interval, now + random.uniform(0, min(interval, 1.0)), added=record["added"]
+            )
+            saved = await histories.aget(key)
+            if saved is not None:
+                target.history.load(saved[0]["history"])
+                target.last_result = saved[0]["last_result"]
+            cls.targets[key] = target
+            restored += 1
+        cls.targets_gauge.set(value=len(cls.targets))
+        if restored:
+            logger.info("health_monitor_restored", targets=restored)
+
+    @classmethod
+    def _persist(cls, key: str, target: MonitorTarget) -> None:
+        tables = cls._tables()
+        if tables is None:
+            return
+        target.dirty = False
+        target.persisted = time.monotonic()
+        tables[1].put(key, {"history": target.history.dump(), "last_result": target.last_result})
+
+    @classmethod
+    def add(cls, urls: List[str], interval: float = HEALTH_MONITOR_INTERVAL) -> List[str]:
+        """
+        Registra gli URL (o ne aggiorna l'intervallo) e restituisce le chiavi normalizzate.
+        Il primo probe cade in un istante casuale entro il primo secondo.
+        Solleva ValueError se si supera HEALTH_MONITOR_MAX_TARGETS.
+        """
+        interval = max(float(interval), HEALTH_MONITOR_MIN_INTERVAL)
+        keys = [normalize_url(url) for url in urls]
+        new = {key for key in keys if key not in cls.targets}
+        if len(cls.targets) + len(new) > HEALTH_MONITOR_MAX_TARGETS:
+            raise ValueError(f"Too many monitored URLs (max {HEALTH_MONITOR_MAX_TARGETS})")
+
+        now = time.monotonic()
+        tables = cls._tables()
+        for url, key in zip(urls, keys):
+            target = cls.targets.get(key)
+            if target is None:
+                target = cls.targets[key] = MonitorTarget(url, interval, now + random.uniform(0, min(interval, 1.0)))
+            else:
+                target.interval = interval
+                target.next_due = min(target.next_due, now + interval)
+            if tables is not None:
+                tables[0].put(key, {"url": target.url, "interval": interval, "added": target.added})
+        cls.targets_gauge.set(value=len(cls.targets))
+        cls._wake()
+        return keys
+
+    @classmethod
+    def remove(cls, urls: List[str]) -> List[str]:
+        """Smette di monitorare gli URL; restituisce quelli effettivamente rimossi"""
+        removed = [key for key in map(normalize_url, urls) if cls.targets.pop(key, None) is not None]
+        tables = cls._tables()
+        if tables is not None:
+            for key in removed:
+                tables[0].delete(key)
+                tables[1].delete(key)
+        cls.targets_gauge.set(value=len(cls.targets))
+        cls._wake()
+        return removed
+
+    @classmethod
+    def running(cls) -> bool:
+        return cls._task is not None and not cls._task.done()
+
+    @classmethod
+    def _wake(cls) -> None:
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            now = time.monotonic()
+            next_due = math.inf
+            for key, target in list(cls.targets.items()):
+                if target.next_due <= now and not target.running:
+                    # Jitter sull'intervallo: URL registrati insieme si distribuiscono nel tempo
+                    jitter = random.uniform(-HEALTH_MONITOR_JITTER, HEALTH_MONITOR_JITTER)
+                    target.next_due = now + target.interval * (1 + jitter)
+                    target.running = True
+                    task = asyncio.create_task(cls._probe(key, target))
+                    cls._probes.add(task)
+                    task.add_done_callback(cls._probes.discard)
+                next_due = min(next_due, target.next_due)
+
+            cls._wakeup.clear()
+            timeout = None if next_due == math.inf else max(0.0, next_due - time.monotonic())
+            try:
+                async with asyncio.timeout(timeout):
+                    await cls._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    @classmethod
+    async def _probe(cls, key: str, target: MonitorTarget) -> None:
+        try:
+            async with cls._limit:
+                result = await HealthProbe.probe(target.url)
+        except Exception as e:
+            logger.warning("health_monitor_probe_failed", url=target.url, error=str(e))
+            return
+        finally:
+            target.running = False
+
+        status_code = result["status_code"]
+        target.history.append(time.time(), {
+            "elapsed": result["elapsed"] if result["elapsed"] is not None else math.nan,
+            "status_code": status_code if status_code is not None else math.nan,
+            "healthy": 1.0 if result["healthy"] else 0.0,
+        })
+        target.last_result = {**result, "checked_at": time.time()}
+        target.dirty = True
+        if status_code is not None:
+            # Anche check_remote_health beneficia del probe appena eseguito
+            HealthProbe.cache.set(key, result)
+        if time.monotonic() - target.persisted >= HEALTH_MONITOR_PERSIST_INTERVAL and key in cls.targets:
+            cls._persist(key, target)
+
+    @classmethod
+    def status(cls, key: str, window: float, samples: int = 0) -> Dict[str, Any]:
+        """Stato attuale e statistiche della finestra (uptime, latenza) dalla storia in memoria"""
+        target = cls.targets[key]
+        history = target.history.tail(target.history.count)
+        start = bisect_left(history["timestamp"], time.time() - window)
+        healthy = history["healthy"][start:]
+        latencies = [value for value in history["elapsed"][start:] if not math.isnan(value)]
+        codes = [int(value) for value in history["status_code"][start:] if not math.isnan(value)]
+
+        def ms(value: float | None) -> float | None:
+            return round(value * 1000, 2) if value is not None else None
+
+        last = target.last_result
+        status: Dict[str, Any] = {
+            "url": target.url,
+            "interval_s": target.interval,
+            "current": None if last is None else {
+                "healthy": last["healthy"],
+                "status_code": last["status_code"],
+                "elapsed_ms": ms(last["elapsed"]),
+                "error": last.get("error"),
+                "checked_at": round(last["checked_at"], 3),
+                "age_s": round(time.time() - last["checked_at"], 3),
+            },
+            "window_s": window,
+            "probes": len(healthy),
+            "uptime_percent": round(100 * sum(healthy) / len(healthy), 2) if healthy else None,
+            "errors": len(healthy) - len(codes),
+            "latency_ms": {
+                "min": ms(min(latencies)) if latencies else None,
+                "p50": ms(percentile(latencies, 50)),
+                "p95": ms(percentile(latencies, 95)),
+                "p99": ms(percentile(latencies, 99)),
+                "max": ms(max(latencies)) if latencies else None,
+            },
+        }
+        if samples > 0:
+            recent = slice(max(start, len(healthy) + start - samples), None)
+            status["samples"] = [
+                {
+                    "timestamp": round(ts, 3),
+                    "healthy": bool(ok),
+                    "status_code": None if math.isnan(code) else int(code),
+                    "elapsed_ms": None if math.isnan(elapsed) else ms(elapsed),
+                }
+                for ts, ok, code, elapsed in zip(
+                    history["timestamp"][recent], history["healthy"][recent],
+                    history["status_code"][recent], history["elapsed"][recent]
+                )
+            ]
+        return status
+
+
+Metrics.register(HealthMonitor.targets_gauge)
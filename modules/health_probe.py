@@ -0,0 +1,184 @@
+"""
+Health Probe Module
+Probe HTTP asincroni verso URL remoti e statistiche aggregate sui risultati
+"""
+import os
+import time
+import asyncio
+from collections import Counter
+from typing import Dict, Any, List
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.http_pool import HTTPPool
+    from modules.ttl_cache import TTLCache
+    from modules.metrics import Metrics
+    from modules.state_store import StateStore
+except ImportError:
+    # Fall back to relative import (for development)
+    from .http_pool import HTTPPool
+    from .ttl_cache import TTLCache
+    from .metrics import Metrics
+    from .state_store import StateStore
+
+# Limiti del controllo multi-URL
+HEALTH_BULK_MAX_URLS = int(os.getenv("HEALTH_BULK_MAX_URLS", 500))
+HEALTH_BULK_CONCURRENCY = int(os.getenv("HEALTH_BULK_CONCURRENCY", 20))
+HEALTH_BULK_PER_HOST = int(os.getenv("HEALTH_BULK_PER_HOST", 4))
+
+# Cache dei risultati: secondi di validità, finestra stale-while-revalidate, numero di URL
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", 10))
+HEALTH_CACHE_STALE = float(os.getenv("HEALTH_CACHE_STALE", 30))
+HEALTH_CACHE_SIZE = int(os.getenv("HEALTH_CACHE_SIZE", 1024))
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def percentile(values: List[float], p: float) -> float | None:
+    """Percentile con interpolazione lineare (p tra 0 e 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Forma canonica dell'URL usata come chiave di cache: schema e host minuscoli,
+    porta di default rimossa, path vuoto come "/" e frammento eliminato.
+    Le credenziali (utente e password) restano nella chiave: credenziali diverse
+    possono ottenere risposte diverse e non devono condividere il risultato.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if ":" in host:
+            host = f"[{host}]"
+        port = parts.port
+    except ValueError:
+        return url
+    netloc = host if port is None or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class HealthProbe:
+    """Esecuzione dei probe HTTP tramite il pool condiviso"""
+
+    # Risultati recenti per URL normalizzato (solo probe che hanno ottenuto una risposta),
+    # condivisi tra i worker in modalità multi-worker e conservati tra i riavvii con lo stato su SQLite
+    cache = TTLCache(HEALTH_CACHE_SIZE, HEALTH_CACHE_TTL, HEALTH_CACHE_STALE, StateStore.shared_table("health_cache"))
+
+    @staticmethod
+    async def probe_cached(url: str, fresh: bool = False) -> Dict[str, Any]:
+        """
+        Come probe(), ma servito dalla cache quando possibile.
+        Il risultato include cached (bool) e age (secondi dal probe effettivo).
+        """
+        value, info = await HealthProbe.cache.get_or_load(
+            normalize_url(url),
+            lambda: HealthProbe.probe(url),
+            should_cache=lambda result: result.get("status_code") is not None,
+            fresh=fresh
+        )
+        return {**value, "url": url, "cached": info["cached"], "age": round(info["age"], 3)}
+
+    @staticmethod
+    async def probe(url: str) -> Dict[str, Any]:
+        """
+        Esegue una GET verso l'URL e restituisce un dict con
+        url, status_code, healthy, elapsed (secondi) ed eventuali error/error_type
+        """
+        # Import differito (vedi HTTPPool): dopo la prima chiamata è solo una lookup in sys.modules
+        import aiohttp
+
+        result: Dict[str, Any] = {"url": url, "status_code": None, "healthy": False, "elapsed": None}
+        started = time.perf_counter()
+        try:
+            session = await HTTPPool.get_session()
+            started = time.perf_counter()
+            async with session.get(url) as response:
+                result["elapsed"] = time.perf_counter() - started
+                result["status_code"] = response.status
+                # Legge il body per restituire la connessione keep-alive al pool
+                await response.read()
+            result["healthy"] = 200 <= response.status < 300
+        except asyncio.TimeoutError:
+            result["error"] = "timeout"
+            result["error_type"] = "timeout"
+        except (aiohttp.ClientError, ValueError) as e:
+            result["error"] = str(e) or type(e).__name__
+            result["error_type"] = type(e).__name__
+
+        if result["status_code"] is not None:
+            outcome = f"{result['status_code'] // 100}xx"
+            Metrics.outbound_duration.observe(result["elapsed"], outcome)
+        else:
+            outcome = "timeout" if result.get("error_type") == "timeout" else "error"
+            Metrics.outbound_duration.observe(time.perf_counter() - started, outcome)
+        Metrics.outbound_requests_total.inc(outcome)
+        return result
+
+    @staticmethod
+    async def probe_many(
+        urls: List[str],
+        concurrency: int = HEALTH_BULK_CONCURRENCY,
+        per_host: int = HEALTH_BULK_PER_HOST,
+        on_result=None,
+        fresh: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Controlla più URL in parallelo con un limite globale e uno per host.
+        on_result(result, completed) viene chiamata al termine di ogni probe.
+        """
+        global_limit = asyncio.Semaphore(max(1, concurrency))
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        completed = 0
+
+        async def run_one(url: str) -> Dict[str, Any]:
+            nonlocal completed
+            host = urlsplit(url).netloc.lower()
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(max(1, per_host)))
+            # Prima lo slot dell'host: chi attende un host saturo non occupa slot globali
+            async with host_limit, global_limit:
+                result = await HealthProbe.probe_cached(url, fresh)
+            completed += 1
+            if on_result is not None:
+                on_result(result, completed)
+            return result
+
+        return await asyncio.gather(*(run_one(url) for url in urls))
+
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Statistiche aggregate: percentili di latenza, errori e istogramma degli status code"""
+        latencies = [r["elapsed"] for r in results if r.get("elapsed") is not None]
+        status_codes = Counter(str(r["status_code"]) for r in results if r.get("status_code") is not None)
+        errors = Counter(r["error_type"] for r in results if r.get("error_type"))
+
+        def ms(value: float | None) -> float | None:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "total": len(results),
+            "healthy": sum(1 for r in results if r.get("healthy")),
+            "unhealthy": sum(1 for r in results if not r.get("healthy")),
+            "cached": sum(1 for r in results if r.get("cached")),
+            "errors": sum(errors.values()),
+            "error_types": dict(errors),
+            "status_codes": dict(sorted(status_codes.items())),
+            "latency_ms": {
+                "min": ms(min(latencies)) if latencies else None,
+                "p50": ms(percentile(latencies, 50)),
+                "p95": ms(percentile(latencies, 95)),
+                "p99": ms(percentile(latencies, 99)),
+                "max": ms(max(latencies)) if latencies else None,
+            }
+        }
@@ -0,0 +1,60 @@
+"""
+HTTP Pool Module
+Pool di connessioni HTTP asincrone condiviso dai tool che fanno richieste in uscita
+"""
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Configurazione del pool
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", 100))
+HTTP_POOL_MAX_PER_HOST = int(os.getenv("HTTP_POOL_MAX_PER_HOST", 10))
+HTTP_POOL_KEEPALIVE = float(os.getenv("HTTP_POOL_KEEPALIVE", 30))
+HTTP_POOL_DNS_TTL = int(os.getenv("HTTP_POOL_DNS_TTL", 300))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", 10))
+
+
+class HTTPPool:
+    """
+    Sessione aiohttp unica per tutto il processo.
+    Viene creata all'avvio dell'app e chiusa allo shutdown, così le connessioni
+    keep-alive vengono riutilizzate tra le chiamate ai tool.
+    """
+
+    _session: "aiohttp.ClientSession | None" = None
+
+    @classmethod
+    async def startup(cls) -> None:
+        """Crea il pool di connessioni (idempotente)"""
+        if cls._session is not None and not cls._session.closed:
+            return
+
+        # Import differito: aiohttp pesa ~0.2s e serve solo ai tool che fanno richieste in uscita
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_MAX_CONNECTIONS,
+            limit_per_host=HTTP_POOL_MAX_PER_HOST,
+            keepalive_timeout=HTTP_POOL_KEEPALIVE,
+            ttl_dns_cache=HTTP_POOL_DNS_TTL,
+        )
+        cls._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT),
+        )
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Chiude il pool e tutte le connessioni aperte"""
+        if cls._session is not None:
+            await cls._session.close()
+            cls._session = None
+
+    @classmethod
+    async def get_session(cls) -> "aiohttp.ClientSession":
+        """Restituisce la sessione condivisa, creandola se l'app non l'ha ancora fatto"""
+        if cls._session is None or cls._session.closed:
+            await cls.startup()
+        return cls._session
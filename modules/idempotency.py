@@ -0,0 +1,153 @@
+"""
+Idempotency Module
+Deduplica dei tools/call ripetuti dai client (retry dopo un timeout): stessa chiave, stessa esecuzione
+"""
+import os
+import json
+import hashlib
+import contextvars
+from typing import Dict, Any, Callable, Awaitable, Tuple
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.ttl_cache import TTLCache
+    from modules.state_store import StateStore
+    from modules.shared_memory import SharedTable
+    from modules.metrics import Metrics, Counter
+    from modules.codec import MCPError, IDEMPOTENCY_CONFLICT
+    from modules.structured_logging import StructuredLogger
+except ImportError:
+    # Fall back to relative import (for development)
+    from .ttl_cache import TTLCache
+    from .state_store import StateStore
+    from .shared_memory import SharedTable
+    from .metrics import Metrics, Counter
+    from .codec import MCPError, IDEMPOTENCY_CONFLICT
+    from .structured_logging import StructuredLogger
+
+# Deduplica: "off", "key" (solo chiamate con chiave del client), "auto" (anche hash di sessione, tool
+# e argomenti, solo per i tool registrati con dedupe=True)
+MCP_IDEMPOTENCY = os.getenv("MCP_IDEMPOTENCY", "key").lower()
+# Secondi per cui il risultato di una chiamata completata viene restituito ai duplicati
+MCP_IDEMPOTENCY_TTL = float(os.getenv("MCP_IDEMPOTENCY_TTL", 60))
+MCP_IDEMPOTENCY_MAX = int(os.getenv("MCP_IDEMPOTENCY_MAX", 1000))
+# Risultati più lunghi (caratteri) non vengono conservati: li ricevono solo i duplicati in corso
+MCP_IDEMPOTENCY_MAX_RESULT = int(os.getenv("MCP_IDEMPOTENCY_MAX_RESULT", 256 * 1024))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Sessione e header Idempotency-Key della richiesta HTTP corrente
+_session_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("mcp_idempotency_session", default=None)
+_header_key: contextvars.ContextVar[str | None] = contextvars.ContextVar("mcp_idempotency_header", default=None)
+
+logger = StructuredLogger("mcp.idempotency")
+
+
+class Idempotency:
+    """
+    Una chiamata con la stessa chiave entro MCP_IDEMPOTENCY_TTL riceve il risultato
+    già calcolato; se la prima è ancora in corso la attende invece di rieseguire il tool.
+    La chiave del client (params._meta.idempotencyKey o header Idempotency-Key)
+    identifica l'operazione nella sessione: riusarla con argomenti diversi è un errore.
+    Senza Mcp-Session-Id non si deduplica nulla, perché la chiave non avrebbe un proprietario.
+    Con SQLite i risultati completati sono visibili agli altri worker e dopo un riavvio.
+    In memoria condivisa (multi-worker) solo se la voce entra in uno slot (MCP_SHARED_SLOT_SIZE):
+    le più grandi restano nel worker che le ha calcolate, contate in mcp_idempotency_unshared_total.
+    Le esecuzioni in corso restano per worker.
+    """
+
+    results = TTLCache(MCP_IDEMPOTENCY_MAX, MCP_IDEMPOTENCY_TTL, 0.0, StateStore.shared_table("idempotency"))
+    replays_total = Counter(
+        "mcp_tool_replays_total",
+        "tools/call answered by an identical completed or in-flight call",
+        ("tool", "source")
+    )
+    unshared_total = Counter(
+        "mcp_idempotency_unshared_total",
+        "Completed results kept only by the local worker because they do not fit a shared memory slot",
+        ("tool",)
+    )
+    # Chiave -> hash degli argomenti delle esecuzioni in corso in questo worker
+    _running: Dict[str, str | None] = {}
+
+    @staticmethod
+    def bind(session_id: str | None, header_key: str | None) -> None:
+        """Associa alla richiesta corrente sessione e chiave dell'header (solo per richieste singole)"""
+        _session_id.set(session_id)
+        _header_key.set(header_key)
+
+    @staticmethod
+    def fingerprint(arguments: Any) -> str | None:
+        """Hash degli argomenti in forma canonica, None se non serializzabili"""
+        try:
+            canonical = json.dumps(arguments, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @classmethod
+    def key(cls, spec: Any, arguments: Any, params: Dict[str, Any]) -> str | None:
+        """Chiave di deduplica della chiamata, None se non va deduplicata"""
+        session = _session_id.get()
+        if MCP_IDEMPOTENCY == "off" or not session:
+            return None
+        meta = params.get("_meta") or {}
+        client_key = meta.get("idempotencyKey") if isinstance(meta, dict) else None
+        if client_key is None:
+            client_key = _header_key.get()
+        if client_key is not None:
+            return f"key:{session}:{spec.name}:{client_key}"
+        # I tool di sola lettura vengono interrogati di proposito più volte: niente deduplica implicita
+        if MCP_IDEMPOTENCY != "auto" or not spec.hints.get("dedupe"):
+            return None
+        fingerprint = cls.fingerprint(arguments)
+        return f"args:{session}:{spec.name}:{fingerprint}" if fingerprint is not None else None
+
+    @classmethod
+    async def run(
+        cls, key: str, tool_name: str, arguments: Any, execute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Esegue (o riusa) la chiamata e restituisce (risultato, replay).
+        Le eccezioni e i risultati "Error..." non vengono conservati: un retry li riesegue.
+        Solleva MCPError(IDEMPOTENCY_CONFLICT) se la chiave è già associata ad argomenti diversi.
+        """
+        fingerprint = cls.fingerprint(arguments)
+        # Un duplicato con argomenti diversi viene respinto subito, senza attendere l'esecuzione in corso
+        if key in cls._running and cls._running[key] != fingerprint:
+            raise MCPError(IDEMPOTENCY_CONFLICT, "Idempotency key already used with different arguments")
+
+        def load() -> Awaitable[Dict[str, Any]]:
+            # Registrata prima che il task parta: i duplicati arrivati nel frattempo la vedono già
+            cls._running[key] = fingerprint
+            return run_once()
+
+        async def run_once() -> Dict[str, Any]:
+            try:
+                return {"arguments": fingerprint, "result": await execute()}
+            finally:
+                cls._running.pop(key, None)
+
+        # Il valore conserva l'hash degli argomenti, confrontato anche per i risultati completati
+        value, info = await cls.results.get_or_load(key, load, lambda loaded: cls._keep(key, tool_name, loaded))
+        if value["arguments"] != fingerprint:
+            raise MCPError(IDEMPOTENCY_CONFLICT, "Idempotency key already used with different arguments")
+        replay = info["cached"] or info["coalesced"]
+        if replay:
+            cls.replays_total.inc(tool_name, "completed" if info["cached"] else "inflight")
+        return value["result"], replay
+
+    @classmethod
+    def _keep(cls, key: str, tool_name: str, value: Dict[str, Any]) -> bool:
+        result = value["result"]
+        keep = isinstance(result, str) and not result.startswith("Error") and len(result) <= MCP_IDEMPOTENCY_MAX_RESULT
+        shared = cls.results.shared
+        if keep and isinstance(shared, SharedTable) and not shared.fits(key, value):
+            # Conservato solo in locale: un retry instradato su un altro worker riesegue il tool
+            cls.unshared_total.inc(tool_name)
+            logger.warning("idempotency_unshared", tool=tool_name, chars=len(result), slot_size=shared.slot_size)
+        return keep
+
+
+Metrics.register(Idempotency.replays_total)
+Metrics.register(Idempotency.unshared_total)
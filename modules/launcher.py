@@ -0,0 +1,73 @@
+"""
+Launcher Module
+Avvio di uvicorn in processo singolo o multi-worker, con il numero di worker ricavato dalla quota CPU del cgroup
+"""
+import os
+import math
+import shutil
+import tempfile
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8080))
+
+# Numero di worker uvicorn: intero oppure "auto" (quota CPU del cgroup).
+# Condivisi tra i worker: metriche, cache dei probe, sessioni e risultati idempotenti (entro MCP_SHARED_SLOT_SIZE).
+# Restano per worker: URL del health monitor, rate limit di ammissione, bulkhead dei tool
+# e stream SSE; con N worker i limiti effettivi sono N volte quelli configurati.
+MCP_WORKERS = os.getenv("MCP_WORKERS", "1")
+
+
+def cgroup_cpu_limit() -> float | None:
+    """CPU disponibili secondo la quota cgroup (v2 cpu.max o v1 cfs), None se non limitata"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return int(quota) / int(period) if quota != "max" else None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def worker_count(setting: str = MCP_WORKERS) -> int:
+    """
+    Numero di worker: intero esplicito, oppure "auto" = quota CPU del cgroup
+    arrotondata per eccesso, limitata dalle CPU su cui il processo può girare
+    """
+    if setting != "auto":
+        return max(1, int(setting))
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        available = min(available, math.ceil(limit))
+    return max(1, available)
+
+
+def serve(host: str, port: int, log_level: str = "info", reload: bool = False) -> None:
+    """
+    Avvia il server. Con più worker crea la directory condivisa (su /dev/shm se presente)
+    da cui i worker mappano metriche, cache e sessioni, e la rimuove all'uscita.
+    """
+    import uvicorn
+
+    workers = 1 if reload else worker_count()
+    if workers == 1:
+        uvicorn.run("main:app", host=host, port=port, reload=reload, log_level=log_level)
+        return
+
+    shared_dir = tempfile.mkdtemp(prefix="mcp-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    # Letti dai worker all'import: vanno impostati prima che uvicorn li avvii
+    os.environ["MCP_SHARED_DIR"] = shared_dir
+    # Ogni worker occupa già un core: niente pool di processi CPU salvo configurazione esplicita
+    os.environ.setdefault("CPU_POOL_WORKERS", "0")
+    print(f"👥 Starting {workers} workers (shared state in {shared_dir})")
+    try:
+        uvicorn.run("main:app", host=host, port=port, workers=workers, log_level=log_level)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
@@ -3,34 +3,97 @@ MCP Methods Core Module
 Contiene la logica principale dei metodi MCP
 """
 import json
-import requests
-from typing import Dict, Any
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Iterator
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.health_probe import HealthProbe, normalize_url, HEALTH_BULK_MAX_URLS, HEALTH_BULK_CONCURRENCY, HEALTH_BULK_PER_HOST
+    from modules.streaming import MCPStreaming
+    from modules.precomputed import PrecomputedResponses
+    from modules.tool_registry import ToolRegistry
+    from modules.calculator import Calculator
+    from modules.structured_logging import StructuredLogger
+    from modules.metrics import Metrics
+    from modules.cpu_pool import CPUPool, CPUPoolBusy, CPUPoolTimeout
+    from modules.bulkhead import ToolBulkheads
+    from modules.idempotency import Idempotency
+    from modules.codec import MCPError, ChunkedResponse, REQUEST_TIMEOUT, SERVER_OVERLOADED
+    from modules.chunked_output import ChunkedText, MCP_STREAM_CHUNK_SIZE
+    from modules.text_pipeline import TextPipeline
+    from modules.system_status import SystemStatus, SYSTEM_STATUS_WINDOWS, SYSTEM_STATUS_SAMPLES
+    from modules.health_monitor import HealthMonitor, HEALTH_MONITOR_INTERVAL, HEALTH_MONITOR_MIN_INTERVAL
+except ImportError:
+    # Fall back to relative import (for development)
+    from .health_probe import HealthProbe, normalize_url, HEALTH_BULK_MAX_URLS, HEALTH_BULK_CONCURRENCY, HEALTH_BULK_PER_HOST
+    from .streaming import MCPStreaming
+    from .precomputed import PrecomputedResponses
+    from .tool_registry import ToolRegistry
+    from .calculator import Calculator
+    from .structured_logging import StructuredLogger
+    from .metrics import Metrics
+    from .cpu_pool import CPUPool, CPUPoolBusy, CPUPoolTimeout
+    from .bulkhead import ToolBulkheads
+    from .idempotency import Idempotency
+    from .codec import MCPError, ChunkedResponse, REQUEST_TIMEOUT, SERVER_OVERLOADED
+    from .chunked_output import ChunkedText, MCP_STREAM_CHUNK_SIZE
+    from .text_pipeline import TextPipeline
+    from .system_status import SystemStatus, SYSTEM_STATUS_WINDOWS, SYSTEM_STATUS_SAMPLES
+    from .health_monitor import HealthMonitor, HEALTH_MONITOR_INTERVAL, HEALTH_MONITOR_MIN_INTERVAL
+
+logger = StructuredLogger("mcp.methods")
 
 
 class MCPMethods:
     """Classe principale per i metodi MCP"""
     
     @staticmethod
-    def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> str:
-        """Esegue il tool specificato con gli argomenti forniti"""
-        
-        if tool_name == "get_server_info":
-            return MCPMethods._get_server_info()
-        
-        elif tool_name == "calculate_operation":
-            return MCPMethods._calculate_operation(arguments)
-        
-        elif tool_name == "format_text":
-            return MCPMethods._format_text(arguments)
-        
-        elif tool_name == "check_remote_health":
-            return MCPMethods._check_remote_health(arguments)
-        
-        else:
+    async def execute_tool_async(
+        tool_name: str, arguments: Dict[str, Any], timeout: float | None = None
+    ) -> str | ChunkedText:
+        """
+        Esegue il tool senza bloccare l'event loop quando esiste una versione async
+        timeout limita l'esecuzione nel pool di processi (default CPU_POOL_TIMEOUT)
+        e la durata dello streaming per i tool generatori (ChunkedText)
+        """
+        spec = ToolRegistry.get(tool_name)
+        if spec is None:
             return f"Error: Unknown tool '{tool_name}'"
 
+        if spec.is_streaming:
+            # Qui si producono solo i primi pezzi: un output breve diventa una risposta normale,
+            # uno lungo prosegue durante l'invio della risposta
+            return await ChunkedText.start(spec.handler(arguments), timeout)
+        if spec.is_async:
+            return await spec.handler(arguments)
+        if spec.hints.get("cpu_bound") and CPUPool.should_offload(arguments):
+            # Input grande: l'esecuzione passa a un processo worker
+            try:
+                return await CPUPool.run(spec.process_handler or spec.handler, arguments, timeout=timeout)
+            except CPUPoolBusy as e:
+                raise MCPError(SERVER_OVERLOADED, str(e)) from None
+            except CPUPoolTimeout as e:
+                raise MCPError(REQUEST_TIMEOUT, f"Tool '{tool_name}' exceeded its {e.timeout:g}s deadline") from None
+            except BrokenProcessPool:
+                return f"Error: Worker process for '{tool_name}' terminated unexpectedly"
+        return spec.handler(arguments)
+
     @staticmethod
-    def _get_server_info() -> str:
+    def cpu_bound_modules() -> list:
+        """Moduli con le funzioni dei tool CPU-bound, da importare nei worker del pool"""
+        return [
+            (spec.process_handler or spec.handler).__module__
+            for spec in ToolRegistry.specs() if spec.hints.get("cpu_bound")
+        ]
+
+    @staticmethod
+    @ToolRegistry.tool(
+        name="get_server_info",
+        description="Get server information, status and configuration",
+        read_only=True
+    )
+    def _get_server_info(arguments: Dict[str, Any]) -> str:
         """Restituisce informazioni sul server"""
         return json.dumps({
             "server_name": "MCP HTTP Server",
@@ -41,180 +104,515 @@ class MCPMethods:
         }, indent=2)
 
     @staticmethod
+    @ToolRegistry.tool(
+        name="calculate_operation",
+        description="Perform mathematical calculations (+, -, *, /, //, %, **)",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "operation": {
+                    "type": "string",
+                    "description": "Math operation like '2+2', '10*5', '(3+4)/2'"
+                },
+                "operations": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Bulk mode: list of operations evaluated in one batched pass"
+                },
+                "formula": {
+                    "type": "string",
+                    "description": "Bulk mode: formula with variables, e.g. 'price * qty * (1 - discount)'"
+                },
+                "variables": {
+                    "type": ["array", "object"],
+                    "description": "Bulk mode: variable bindings for 'formula', as a list of rows "
+                                   "([{'x': 1}, {'x': 2}]) or as columns ({'x': [1, 2]})"
+                }
+            }
+        },
+        process_handler=Calculator.calculate,
+        read_only=True,
+        cpu_bound=True,
+        dedupe=True
+    )
     def _calculate_operation(arguments: Dict[str, Any]) -> str:
         """Esegue operazioni matematiche"""
-        operation = arguments.get("operation", "")
-        if not operation:
-            return "Error: Operation parameter is required"
-        
-        try:
-            # Calcolo sicuro - sostituisce eval()
-            allowed_chars = set('0123456789+-*/.() ')
-            if all(c in allowed_chars for c in operation.replace(' ', '')):
-                result = eval(operation)  # ⚠️ In produzione usa una libreria sicura
-                return f"Calculation: {operation} = {result}"
-            else:
-                return "Error: Operation contains unsafe characters"
-        except Exception as e:
-            return f"Error calculating operation: {e}"
+        return Calculator.calculate(arguments)
 
     @staticmethod
-    def _format_text(arguments: Dict[str, Any]) -> str:
-        """Formatta il testo secondo lo stile specificato"""
+    @ToolRegistry.tool(
+        name="format_text",
+        description=(
+            "Format text in different styles, or apply a chain of operations "
+            "(case changes, trim, whitespace normalization, truncation) in a single pass"
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "Text to format"
+                },
+                "style": {
+                    "type": "string",
+                    "enum": ["uppercase", "lowercase", "title", "capitalize"],
+                    "description": "Text formatting style (ignored when operations is given)",
+                    "default": "uppercase"
+                },
+                "operations": {
+                    "type": "array",
+                    "description": (
+                        "Operations applied in order, e.g. "
+                        "[\"trim\", \"normalize_whitespace\", \"title\", {\"op\": \"truncate\", \"length\": 80}]"
+                    ),
+                    "items": {
+                        "oneOf": [
+                            {"type": "string", "enum": list(TextPipeline.OPERATIONS)},
+                            {
+                                "type": "object",
+                                "properties": {
+                                    "op": {"type": "string", "enum": list(TextPipeline.OPERATIONS)},
+                                    "length": {"type": "integer", "minimum": 0}
+                                },
+                                "required": ["op"]
+                            }
+                        ]
+                    }
+                }
+            },
+            "required": ["text"]
+        },
+        read_only=True
+    )
+    def _format_text(arguments: Dict[str, Any]) -> Iterator[str]:
+        """
+        Formatta il testo con lo stile o la catena di operazioni richiesta.
+        Il testo è elaborato a pezzi di MCP_STREAM_CHUNK_SIZE caratteri:
+        viene calcolata solo l'operazione richiesta e l'output non è mai costruito per intero
+        """
         text = arguments.get("text", "")
-        style = arguments.get("style", "uppercase")
+        operations = arguments.get("operations")
         
         if not text:
-            return "Error: Text parameter is required"
-        
-        styles = {
-            "uppercase": text.upper(),
-            "lowercase": text.lower(),
-            "title": text.title(),
-            "capitalize": text.capitalize()
-        }
+            yield "Error: Text parameter is required"
+            return
         
-        if style in styles:
-            return f"Formatted text ({style}): {styles[style]}"
-        else:
-            return f"Error: Unknown style '{style}'. Available: {list(styles.keys())}"
+        if operations is None:
+            style = arguments.get("style", "uppercase")
+            styles = ["uppercase", "lowercase", "title", "capitalize"]
+            if style not in styles:
+                yield f"Error: Unknown style '{style}'. Available: {styles}"
+                return
+            operations = [style]
+
+        try:
+            pipeline = TextPipeline.parse(operations)
+        except ValueError as e:
+            yield f"Error: {e}"
+            return
+
+        yield f"Formatted text ({', '.join(pipeline.names)}): "
+        yield from pipeline.run(TextPipeline.chunks(text, MCP_STREAM_CHUNK_SIZE))
 
     @staticmethod
-    def _check_remote_health(arguments: Dict[str, Any]) -> str:
-        """Controlla lo stato di un URL remoto"""
+    @ToolRegistry.tool(
+        name="check_remote_health",
+        description="Check health and status of a remote URL",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "url": {
+                    "type": "string",
+                    "description": "URL to check (include http:// or https://)",
+                    "default": "https://httpbin.org/status/200"
+                },
+                "fresh": {
+                    "type": "boolean",
+                    "description": "Bypass the result cache and probe the URL now",
+                    "default": False
+                }
+            }
+        },
+        read_only=True,
+        open_world=True,
+        dedupe=True,
+        max_concurrency=32,
+        max_queue=64,
+        timeout=15
+    )
+    async def _check_remote_health_async(arguments: Dict[str, Any]) -> str:
+        """Controlla lo stato di un URL remoto usando il pool HTTP condiviso"""
         url = arguments.get("url", "https://httpbin.org/status/200")
-        
+
         try:
-            response = requests.get(url, timeout=10)
-            status = "healthy" if 200 <= response.status_code < 300 else "unhealthy"
-            return (
-                f"Health Check Results:\n"
-                f"URL: {url}\n"
-                f"Status Code: {response.status_code}\n"
-                f"Healthy: {status}\n"
-                f"Response Time: {response.elapsed.total_seconds():.2f}s"
-            )
-        except requests.exceptions.Timeout:
-            return f"Error: Timeout while checking {url}"
-        except requests.exceptions.RequestException as e:
-            return f"Error checking {url}: {e}"
+            MCPStreaming.report_progress(0, 1, f"Checking {url}")
+            result = await HealthProbe.probe_cached(url, bool(arguments.get("fresh", False)))
+            MCPStreaming.report_progress(1, 1, "Health check completed")
         except Exception as e:
             return f"Unexpected error: {e}"
 
+        if result.get("error") == "timeout":
+            return f"Error: Timeout while checking {url}"
+        if result.get("error"):
+            return f"Error checking {url}: {result['error']}"
+
+        status = "healthy" if result["healthy"] else "unhealthy"
+        return (
+            f"Health Check Results:\n"
+            f"URL: {url}\n"
+            f"Status Code: {result['status_code']}\n"
+            f"Healthy: {status}\n"
+            f"Response Time: {result['elapsed']:.2f}s\n"
+            f"Cached: {'yes' if result['cached'] else 'no'} (age {result['age']:.1f}s)"
+        )
+
     @staticmethod
-    def get_tools_list() -> list:
-        """Restituisce la lista dei tools disponibili"""
-        return [
-            {
-                "name": "get_server_info",
-                "description": "Get server information, status and configuration",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {}
+    @ToolRegistry.tool(
+        name="check_remote_health_bulk",
+        description="Check many remote URLs concurrently and return per-URL results "
+                    "plus aggregate latency percentiles, error counts and status-code histogram",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": f"URLs to check (max {HEALTH_BULK_MAX_URLS})"
+                },
+                "concurrency": {
+                    "type": "integer",
+                    "description": "Maximum probes in flight overall",
+                    "default": HEALTH_BULK_CONCURRENCY
+                },
+                "per_host_concurrency": {
+                    "type": "integer",
+                    "description": "Maximum probes in flight towards the same host",
+                    "default": HEALTH_BULK_PER_HOST
+                },
+                "fresh": {
+                    "type": "boolean",
+                    "description": "Bypass the result cache and probe every URL now",
+                    "default": False
+                },
+                "include_results": {
+                    "type": "boolean",
+                    "description": "Include per-URL results in the output (set false for stats only)",
+                    "default": True
                 }
             },
-            {
-                "name": "calculate_operation",
-                "description": "Perform mathematical calculations (+, -, *, /)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "operation": {
-                            "type": "string",
-                            "description": "Math operation like '2+2', '10*5', '(3+4)/2'"
-                        }
-                    },
-                    "required": ["operation"]
+            "required": ["urls"]
+        },
+        read_only=True,
+        open_world=True,
+        dedupe=True,
+        max_concurrency=4,
+        max_queue=8,
+        timeout=60
+    )
+    async def _check_remote_health_bulk(arguments: Dict[str, Any]) -> str:
+        """Controlla più URL in parallelo e aggrega le statistiche di latenza"""
+        urls = arguments.get("urls")
+        if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+            return "Error: 'urls' must be a non-empty list of strings"
+        if len(urls) > HEALTH_BULK_MAX_URLS:
+            return f"Error: Too many URLs (max {HEALTH_BULK_MAX_URLS})"
+
+        try:
+            concurrency = min(int(arguments.get("concurrency", HEALTH_BULK_CONCURRENCY)), HEALTH_BULK_MAX_URLS)
+            per_host = int(arguments.get("per_host_concurrency", HEALTH_BULK_PER_HOST))
+        except (TypeError, ValueError):
+            return "Error: 'concurrency' and 'per_host_concurrency' must be integers"
+
+        def on_result(result: Dict[str, Any], completed: int) -> None:
+            # Ogni risultato viene inviato subito ai client in streaming SSE
+            outcome = result.get("error") or result.get("status_code")
+            MCPStreaming.report_progress(completed, len(urls), f"{result['url']}: {outcome}")
+
+        started = time.perf_counter()
+        fresh = bool(arguments.get("fresh", False))
+        results = await HealthProbe.probe_many(urls, concurrency, per_host, on_result, fresh)
+        output: Dict[str, Any] = {
+            "stats": HealthProbe.summarize(results),
+            "duration_s": round(time.perf_counter() - started, 3)
+        }
+        if arguments.get("include_results", True):
+            output["results"] = [
+                {**r, "elapsed": round(r["elapsed"], 4) if r["elapsed"] is not None else None}
+                for r in results
+            ]
+        return json.dumps(output)
+
+    @staticmethod
+    @ToolRegistry.tool(
+        name="monitor_remote_health",
+        description="Add URLs to (or remove them from) the background health monitor, "
+                    "which probes them periodically; read the results with get_monitor_status",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "URLs to monitor (include http:// or https://)"
+                },
+                "action": {
+                    "type": "string",
+                    "enum": ["add", "remove"],
+                    "description": "Start or stop monitoring the URLs",
+                    "default": "add"
+                },
+                "interval": {
+                    "type": "number",
+                    "description": f"Seconds between probes (min {HEALTH_MONITOR_MIN_INTERVAL:g})",
+                    "default": HEALTH_MONITOR_INTERVAL
                 }
             },
-            {
-                "name": "format_text",
-                "description": "Format text in different styles",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "text": {
-                            "type": "string",
-                            "description": "Text to format"
-                        },
-                        "style": {
-                            "type": "string",
-                            "enum": ["uppercase", "lowercase", "title", "capitalize"],
-                            "description": "Text formatting style",
-                            "default": "uppercase"
-                        }
-                    },
-                    "required": ["text"]
+            "required": ["urls"]
+        },
+        open_world=True,
+        dedupe=True
+    )
+    def _monitor_remote_health(arguments: Dict[str, Any]) -> str:
+        """Registra o rimuove URL dal monitor in background"""
+        urls = arguments.get("urls")
+        if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+            return "Error: 'urls' must be a non-empty list of strings"
+        if not all(u.startswith(("http://", "https://")) for u in urls):
+            return "Error: URLs must start with http:// or https://"
+
+        action = arguments.get("action", "add")
+        if action == "remove":
+            removed = HealthMonitor.remove(urls)
+            return json.dumps({"removed": removed, "monitored": len(HealthMonitor.targets)})
+        if action != "add":
+            return f"Error: Unknown action '{action}'. Available: ['add', 'remove']"
+        if not HealthMonitor.running():
+            return "Error: Health monitor is not running"
+
+        try:
+            interval = float(arguments.get("interval", HEALTH_MONITOR_INTERVAL))
+            added = HealthMonitor.add(urls, interval)
+        except (TypeError, ValueError) as e:
+            return f"Error: {e}"
+        return json.dumps({
+            "added": added,
+            "interval_s": max(interval, HEALTH_MONITOR_MIN_INTERVAL),
+            "monitored": len(HealthMonitor.targets)
+        })
+
+    @staticmethod
+    @ToolRegistry.tool(
+        name="get_monitor_status",
+        description="Current status and history (uptime %, latency percentiles) of monitored URLs, "
+                    "served from memory without new network requests",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Monitored URLs to report (default: all)"
+                },
+                "window": {
+                    "type": "number",
+                    "description": "History window in seconds for uptime and latency",
+                    "default": 3600
+                },
+                "samples": {
+                    "type": "integer",
+                    "description": "Number of most recent probes to include per URL",
+                    "default": 0
                 }
-            },
-            {
-                "name": "check_remote_health",
-                "description": "Check health and status of a remote URL",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "url": {
-                            "type": "string",
-                            "description": "URL to check (include http:// or https://)",
-                            "default": "https://httpbin.org/status/200"
-                        }
-                    }
+            }
+        },
+        read_only=True
+    )
+    def _get_monitor_status(arguments: Dict[str, Any]) -> str:
+        """Restituisce stato e statistiche degli URL monitorati, dalla storia in memoria"""
+        urls = arguments.get("urls")
+        if urls is not None and (not isinstance(urls, list) or not all(isinstance(u, str) for u in urls)):
+            return "Error: 'urls' must be a list of strings"
+        try:
+            window = float(arguments.get("window", 3600))
+            samples = max(int(arguments.get("samples", 0)), 0)
+        except (TypeError, ValueError):
+            return "Error: 'window' must be a number and 'samples' an integer"
+
+        keys = list(HealthMonitor.targets) if urls is None else [normalize_url(u) for u in urls]
+        unknown = [url for url, key in zip(urls or [], keys) if key not in HealthMonitor.targets]
+        if unknown:
+            return f"Error: Not monitored: {unknown}. Add them with monitor_remote_health first"
+        return json.dumps({
+            "monitored": len(HealthMonitor.targets),
+            "targets": [HealthMonitor.status(key, window, samples) for key in keys]
+        })
+
+    @staticmethod
+    @ToolRegistry.tool(
+        name="get_system_status",
+        description="Get CPU, memory, process and event-loop statistics: latest sample "
+                    "plus min/avg/max history per time window, served from the background sampler",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "windows": {
+                    "type": "integer",
+                    "description": f"Number of history windows to return (max {SYSTEM_STATUS_WINDOWS})",
+                    "default": SYSTEM_STATUS_WINDOWS
+                },
+                "samples": {
+                    "type": "integer",
+                    "description": f"Number of most recent raw samples to include (max {SYSTEM_STATUS_SAMPLES})",
+                    "default": 0
                 }
             }
-        ]
+        },
+        read_only=True
+    )
+    def _get_system_status(arguments: Dict[str, Any]) -> str:
+        """Restituisce lo stato del sistema dai campioni già raccolti, senza interrogare psutil"""
+        if SystemStatus.unavailable:
+            return f"Error: System status is unavailable ({SystemStatus.unavailable})"
+        if not SystemStatus.samples.count:
+            return "Error: System status sampler is not running"
+
+        try:
+            windows = min(max(int(arguments.get("windows", SYSTEM_STATUS_WINDOWS)), 0), SYSTEM_STATUS_WINDOWS)
+            samples = min(max(int(arguments.get("samples", 0)), 0), SYSTEM_STATUS_SAMPLES)
+        except (TypeError, ValueError):
+            return "Error: 'windows' and 'samples' must be integers"
+
+        return json.dumps(SystemStatus.snapshot(windows, samples))
 
     @staticmethod
-    def handle_initialize(msg_id: int | str | None) -> dict:
-        """Gestisce la richiesta di inizializzazione MCP"""
+    def get_tools_list() -> list:
+        """Restituisce la lista dei tools disponibili"""
+        return ToolRegistry.list_tools()
+
+    @staticmethod
+    def _initialize_result() -> dict:
+        """Risultato costante della richiesta initialize"""
         return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {},
-                    "resources": {},
-                    "prompts": {},
-                    "logging": {}
-                },
-                "serverInfo": {
-                    "name": "http-mcp-server",
-                    "version": "1.0.0"
-                }
+            "protocolVersion": "2024-11-05",
+            "capabilities": {
+                "tools": {
+                    "listChanged": True
+                },
+                "resources": {},
+                "prompts": {},
+                "logging": {}
+            },
+            "serverInfo": {
+                "name": "http-mcp-server",
+                "version": "1.0.0"
             }
         }
 
+    @staticmethod
+    def refresh_precomputed() -> bool:
+        """
+        Ricostruisce le risposte precalcolate di initialize e tools/list.
+        Se il set di tools è cambiato notifica i client connessi allo stream SSE.
+        """
+        changed = PrecomputedResponses.update(
+            MCPMethods.get_tools_list(),
+            MCPMethods._initialize_result()
+        )
+        if changed:
+            MCPStreaming.publish({
+                "jsonrpc": "2.0",
+                "method": "notifications/tools/list_changed"
+            })
+        return changed
+
+    @staticmethod
+    def _on_tools_changed() -> None:
+        """Aggiorna le risposte precalcolate quando il registro dei tools cambia"""
+        if PrecomputedResponses.is_ready():
+            MCPMethods.refresh_precomputed()
+
+    @staticmethod
+    def handle_initialize(msg_id: int | str | None) -> dict:
+        """Gestisce la richiesta di inizializzazione MCP"""
+        if not PrecomputedResponses.is_ready():
+            MCPMethods.refresh_precomputed()
+        return PrecomputedResponses.initialize(msg_id)
+
     @staticmethod
     def handle_tools_list(msg_id: int | str | None) -> dict:
         """Gestisce la richiesta di lista tools"""
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": {
-                "tools": MCPMethods.get_tools_list()
-            }
-        }
+        if not PrecomputedResponses.is_ready():
+            MCPMethods.refresh_precomputed()
+        return PrecomputedResponses.tools_list(msg_id)
 
     @staticmethod
-    def handle_tools_call(msg_id: int | str | None, params: Dict[str, Any]) -> dict:
+    async def handle_tools_call(msg_id: int | str | None, params: Dict[str, Any]) -> dict:
         """Gestisce la chiamata a un tool"""
         tool_name = params.get("name", "")
         arguments = params.get("arguments", {})
         
-        print(f"Executing tool: {tool_name} with args: {arguments}")
-        result_text = MCPMethods.execute_tool(tool_name, arguments)
+        logger.debug("tool_call", tool=tool_name, arguments=arguments)
+        MCPStreaming.bind_progress_token(params)
+
+        spec = ToolRegistry.get(tool_name)
+        tool_label = tool_name if spec is not None else "unknown"
+        # L'output in streaming non viene deduplicato: non può essere consumato da più richieste
+        idempotency_key = None
+        if spec is not None and not spec.is_streaming:
+            idempotency_key = Idempotency.key(spec, arguments, params)
+        replay = False
+        started = time.perf_counter()
+
+        def record(failed: bool) -> None:
+            Metrics.tool_calls_total.inc(tool_label)
+            Metrics.tool_duration.observe(time.perf_counter() - started, tool_label)
+            if failed:
+                Metrics.tool_errors_total.inc(tool_label)
+
+        try:
+            if spec is None:
+                result_text = await MCPMethods.execute_tool_async(tool_name, arguments)
+            elif idempotency_key is not None:
+                result_text, replay = await Idempotency.run(idempotency_key, tool_name, arguments, lambda: ToolBulkheads.run(
+                    spec, params,
+                    lambda remaining: MCPMethods.execute_tool_async(tool_name, arguments, remaining)
+                ))
+            else:
+                result_text = await ToolBulkheads.run(
+                    spec, params,
+                    lambda remaining: MCPMethods.execute_tool_async(tool_name, arguments, remaining)
+                )
+        except Exception:
+            record(True)
+            raise
+        except BaseException:
+            # Cancellazione (es. client disconnesso): la chiamata conta, ma non come errore del tool
+            record(False)
+            raise
+        if isinstance(result_text, ChunkedText):
+            # Output in streaming: il testo viene serializzato a pezzi da MCPCodec.iter_encode.
+            # Il bulkhead copre solo il primo pezzo, la deadline e le metriche l'intero stream
+            result_text.on_finish = record
+            return ChunkedResponse(msg_id, result_text)
+        result_text = ChunkedText.truncate(result_text)
+        # Convenzione dei tool: gli errori sono restituiti come testo "Error..."
+        record(result_text.startswith("Error"))
         
+        result = {
+            "content": [
+                {
+                    "type": "text",
+                    "text": result_text
+                }
+            ]
+        }
+        if replay:
+            # Risultato di una chiamata identica (completata o ancora in corso), senza nuova esecuzione
+            result["_meta"] = {"idempotentReplay": True}
         return {
             "jsonrpc": "2.0",
             "id": msg_id,
-            "result": {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": result_text
-                    }
-                ]
-            }
+            "result": result
         }
 
     @staticmethod
@@ -225,3 +623,6 @@ class MCPMethods:
             "id": msg_id,
             "result": {}
         }
+
+
+ToolRegistry.on_change(MCPMethods._on_tools_changed)
@@ -0,0 +1,302 @@
+"""
+Metrics Module
+Contatori, gauge e istogrammi in memoria esposti in formato testo Prometheus
+"""
+import os
+import json
+import time
+import asyncio
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.shared_memory import SharedMemory, MetricSegment
+except ImportError:
+    # Fall back to relative import (for development)
+    from .shared_memory import SharedMemory, MetricSegment
+
+# Intervallo di campionamento del ritardo dell'event loop (secondi)
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _series_key(name: str, labels: Tuple[str, ...]) -> str:
+    return json.dumps([name, list(labels)])
+
+
+class _Shared:
+    """
+    Copia delle serie nel segmento condiviso del worker (modalità multi-worker).
+    Fuori da quella modalità _segment resta None e gli aggiornamenti restano locali.
+    """
+
+    _segment: MetricSegment | None = None
+    _width = 1
+
+    def attach(self, segment: MetricSegment) -> None:
+        """Da qui in poi ogni aggiornamento viene copiato anche nel segmento del worker"""
+        self._segment = segment
+        self._offsets: Dict[Tuple[str, ...], int | None] = {}
+        for labels, value in self._local().items():
+            for index, item in enumerate(self._flatten(value)):
+                self._share(labels, item, index)
+
+    def _share(self, labels: Tuple[str, ...], value: float, index: int = 0) -> None:
+        offset = self._offsets.get(labels, -1)
+        if offset == -1:
+            offset = self._offsets[labels] = self._segment.allocate(_series_key(self.name, labels), self._width)
+        if offset is not None:
+            self._segment.set(offset + 8 * index, value)
+
+
+class Counter(_Shared):
+    """
+    Contatore monotono per combinazione di label.
+    Viene aggiornato solo dal thread dell'event loop, quindi senza lock.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        value = self._values[labels] = self._values.get(labels, 0.0) + amount
+        if self._segment is not None:
+            self._share(labels, value)
+
+    def _local(self) -> Dict[Tuple[str, ...], float]:
+        return self._values
+
+    @staticmethod
+    def _flatten(value: float) -> List[float]:
+        return [value]
+
+    def _merge(self, shared: Dict[Tuple[str, ...], list]) -> Dict[Tuple[str, ...], float]:
+        """Somma dei valori di tutti i worker, compresi quelli terminati"""
+        return {labels: sum(values[0] for _, values in entries) for labels, entries in shared.items()}
+
+    def samples(self, shared: Dict[Tuple[str, ...], list] | None = None) -> List[str]:
+        values = self._values if shared is None else self._merge(shared)
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    Valore istantaneo, impostato o incrementato/decrementato.
+    Con più worker aggregate indica come combinare i valori dei processi vivi ("sum" o "max").
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), aggregate: str = "sum"):
+        super().__init__(name, documentation, labels)
+        self.aggregate = aggregate
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+        if self._segment is not None:
+            self._share(labels, value)
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def _merge(self, shared: Dict[Tuple[str, ...], list]) -> Dict[Tuple[str, ...], float]:
+        combine = max if self.aggregate == "max" else sum
+        merged = {}
+        for labels, entries in shared.items():
+            alive = [values[0] for is_alive, values in entries if is_alive]
+            if alive:
+                merged[labels] = combine(alive)
+        return merged
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+
+class Histogram(_Shared):
+    """
+    Istogramma a bucket fissi. observe() incrementa un solo bucket (non cumulativo),
+    i conteggi cumulativi richiesti da Prometheus sono calcolati solo allo scrape.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        # labels -> [conteggi per bucket (+Inf in coda), somma, numero osservazioni]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        # Nel segmento condiviso: conteggi per bucket, somma, numero osservazioni
+        self._width = len(self.buckets) + 3
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        bucket = bisect_left(self.buckets, value)
+        series[0][bucket] += 1
+        series[1] += value
+        series[2] += 1
+        if self._segment is not None:
+            self._share(labels, series[0][bucket], bucket)
+            self._share(labels, series[1], len(self.buckets) + 1)
+            self._share(labels, series[2], len(self.buckets) + 2)
+
+    def _local(self) -> Dict[Tuple[str, ...], list]:
+        return self._series
+
+    @staticmethod
+    def _flatten(series: list) -> List[float]:
+        return [*series[0], series[1], series[2]]
+
+    def _merge(self, shared: Dict[Tuple[str, ...], list]) -> Dict[Tuple[str, ...], list]:
+        """Somma bucket per bucket di tutti i worker, compresi quelli terminati"""
+        merged = {}
+        size = len(self.buckets) + 1
+        for labels, entries in shared.items():
+            totals = [sum(column) for column in zip(*(values for _, values in entries))]
+            merged[labels] = [[int(c) for c in totals[:size]], totals[size], int(totals[size + 1])]
+        return merged
+
+    def samples(self, shared: Dict[Tuple[str, ...], list] | None = None) -> List[str]:
+        lines = []
+        series = self._series if shared is None else self._merge(shared)
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Metrics:
+    """Registro delle metriche del server"""
+
+    requests_total = Counter("mcp_requests_total", "JSON-RPC requests handled", ("method",))
+    request_errors_total = Counter("mcp_request_errors_total", "JSON-RPC requests answered with an error", ("method",))
+    request_duration = Histogram("mcp_request_duration_seconds", "JSON-RPC request latency", ("method",))
+    requests_in_flight = Gauge("mcp_requests_in_flight", "JSON-RPC requests currently being processed")
+
+    tool_calls_total = Counter("mcp_tool_calls_total", "tools/call executions", ("tool",))
+    tool_errors_total = Counter("mcp_tool_errors_total", "tools/call executions that returned an error", ("tool",))
+    tool_duration = Histogram("mcp_tool_duration_seconds", "Tool execution latency", ("tool",))
+
+    outbound_requests_total = Counter(
+        "mcp_outbound_requests_total", "Outbound HTTP requests made by check_remote_health", ("outcome",)
+    )
+    outbound_duration = Histogram(
+        "mcp_outbound_request_duration_seconds", "Outbound HTTP request latency (time to response headers)", ("outcome",)
+    )
+
+    event_loop_lag = Gauge("mcp_event_loop_lag_seconds", "Last measured event-loop scheduling delay", aggregate="max")
+    event_loop_lag_histogram = Histogram(
+        "mcp_event_loop_lag_distribution_seconds", "Event-loop scheduling delay", (),
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    )
+
+    _collectors = []
+    _lag_task: asyncio.Task | None = None
+    _segment: MetricSegment | None = None
+
+    @classmethod
+    def all(cls) -> list:
+        return [
+            cls.requests_total, cls.request_errors_total, cls.request_duration, cls.requests_in_flight,
+            cls.tool_calls_total, cls.tool_errors_total, cls.tool_duration,
+            cls.outbound_requests_total, cls.outbound_duration,
+            cls.event_loop_lag, cls.event_loop_lag_histogram,
+        ] + cls._collectors
+
+    @classmethod
+    def register(cls, metric) -> None:
+        """Aggiunge una metrica al registro (usato dai moduli opzionali)"""
+        cls._collectors.append(metric)
+        if cls._segment is not None:
+            metric.attach(cls._segment)
+
+    @classmethod
+    def render(cls) -> str:
+        """
+        Esposizione nel formato testo Prometheus 0.0.4
+        Con più worker i valori sono aggregati dai segmenti condivisi di tutti i processi
+        """
+        shared = cls._collect_shared() if cls._segment is not None else None
+        lines = []
+        for metric in cls.all():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples() if shared is None else metric.samples(shared.get(metric.name, {})))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _collect_shared() -> Dict[str, Dict[Tuple[str, ...], list]]:
+        """nome -> labels -> [(worker vivo, valori)] letti dai segmenti di tutti i worker"""
+        collected: Dict[str, Dict[Tuple[str, ...], list]] = {}
+        for _, alive, buffer in SharedMemory.metric_segments():
+            for key, values in MetricSegment.read(buffer):
+                name, labels = json.loads(key)
+                collected.setdefault(name, {}).setdefault(tuple(labels), []).append((alive, values))
+        return collected
+
+    @classmethod
+    async def start(cls) -> None:
+        """
+        Avvia il monitor del ritardo dell'event loop
+        In modalità multi-worker collega le metriche al segmento condiviso di questo processo
+        """
+        segment = SharedMemory.metrics_segment()
+        if segment is not None and cls._segment is None:
+            cls._segment = segment
+            for metric in cls.all():
+                metric.attach(segment)
+        if cls._lag_task is None or cls._lag_task.done():
+            cls._lag_task = asyncio.create_task(cls._monitor_loop_lag())
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._lag_task is not None:
+            cls._lag_task.cancel()
+            try:
+                await cls._lag_task
+            except asyncio.CancelledError:
+                pass
+            cls._lag_task = None
+
+    @classmethod
+    async def _monitor_loop_lag(cls) -> None:
+        """Misura di quanto la sveglia di uno sleep arriva in ritardo rispetto al previsto"""
+        while True:
+            expected = time.perf_counter() + METRICS_LOOP_LAG_INTERVAL
+            await asyncio.sleep(METRICS_LOOP_LAG_INTERVAL)
+            lag = max(0.0, time.perf_counter() - expected)
+            cls.event_loop_lag.set(value=lag)
+            cls.event_loop_lag_histogram.observe(lag)
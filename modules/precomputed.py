@@ -0,0 +1,61 @@
+"""
+Precomputed Responses Module
+Risposte costanti (initialize, tools/list) serializzate una sola volta
+"""
+import hashlib
+from typing import Dict, Any
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.codec import MCPCodec, PreEncodedResponse
+except ImportError:
+    # Fall back to relative import (for development)
+    from .codec import MCPCodec, PreEncodedResponse
+
+
+class PrecomputedResponses:
+    """
+    Cache dei risultati di initialize e tools/list già codificati in bytes.
+    Viene ricostruita all'avvio e ogni volta che il set di tools cambia.
+    """
+
+    _tools_result: Dict[str, Any] | None = None
+    _tools_bytes: bytes | None = None
+    _tools_etag: str | None = None
+    _initialize_result: Dict[str, Any] | None = None
+    _initialize_bytes: bytes | None = None
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._tools_bytes is not None and cls._initialize_bytes is not None
+
+    @classmethod
+    def update(cls, tools: list, initialize_result: Dict[str, Any]) -> bool:
+        """
+        Serializza i risultati e ne calcola l'hash.
+        Restituisce True se la lista dei tools è cambiata rispetto alla precedente.
+        """
+        tools_result = {"tools": tools}
+        tools_bytes = MCPCodec.dumps(tools_result)
+        etag = '"' + hashlib.sha256(tools_bytes).hexdigest()[:32] + '"'
+        changed = cls._tools_etag is not None and etag != cls._tools_etag
+
+        cls._tools_result = tools_result
+        cls._tools_bytes = tools_bytes
+        cls._tools_etag = etag
+        cls._initialize_result = initialize_result
+        cls._initialize_bytes = MCPCodec.dumps(initialize_result)
+        return changed
+
+    @classmethod
+    def tools_etag(cls) -> str | None:
+        """Hash del contenuto di tools/list, usato come ETag"""
+        return cls._tools_etag
+
+    @classmethod
+    def tools_list(cls, msg_id: int | str | None) -> PreEncodedResponse:
+        return PreEncodedResponse(msg_id, cls._tools_result, cls._tools_bytes)
+
+    @classmethod
+    def initialize(cls, msg_id: int | str | None) -> PreEncodedResponse:
+        return PreEncodedResponse(msg_id, cls._initialize_result, cls._initialize_bytes)
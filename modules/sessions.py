@@ -0,0 +1,212 @@
+"""
+Sessions Module
+Sessioni MCP (header Mcp-Session-Id): create da initialize, con eviction per inattività
+"""
+import os
+import time
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.metrics import Metrics, Counter, Gauge
+    from modules.state_store import StateStore
+except ImportError:
+    # Fall back to relative import (for development)
+    from .metrics import Metrics, Counter, Gauge
+    from .state_store import StateStore
+
+# Sessioni abilitate (initialize restituisce Mcp-Session-Id)
+MCP_SESSIONS = os.getenv("MCP_SESSIONS", "true").lower() == "true"
+# Se true le richieste senza Mcp-Session-Id (eccetto initialize) ricevono 400
+MCP_SESSION_REQUIRED = os.getenv("MCP_SESSION_REQUIRED", "false").lower() == "true"
+# Secondi di inattività dopo i quali una sessione viene eliminata
+MCP_SESSION_IDLE_TIMEOUT = float(os.getenv("MCP_SESSION_IDLE_TIMEOUT", 1800))
+MCP_SESSION_MAX = int(os.getenv("MCP_SESSION_MAX", 10000))
+
+SESSION_HEADER = "Mcp-Session-Id"
+
+
+@dataclass
+class Session:
+    """Stato di un client MCP tra una richiesta e l'altra"""
+    session_id: str
+    created: float
+    last_seen: float
+    protocol_version: str | None = None
+    client_info: Dict[str, Any] = field(default_factory=dict)
+    client_capabilities: Dict[str, Any] = field(default_factory=dict)
+    initialized: bool = False
+    # ETag dell'ultima lista tools inviata a questo client
+    tools_etag: str | None = None
+    requests: int = 0
+    # Token bucket del rate limit (creato dal middleware di ammissione)
+    bucket: Any = None
+    # Ultima scrittura nella tabella condivisa tra i worker
+    shared_at: float = 0.0
+
+
+class SessionStore:
+    """
+    Store in memoria limitato a MCP_SESSION_MAX sessioni.
+    L'OrderedDict è tenuto in ordine di ultimo accesso: le sessioni inattive
+    sono in testa e vengono rimosse senza scandire tutto lo store.
+    Con più worker (o con lo stato su SQLite) le sessioni sono registrate anche
+    in una tabella condivisa: un worker che riceve un id creato altrove, o prima
+    di un riavvio, ricostruisce la sessione da lì.
+    """
+
+    active = Gauge("mcp_sessions_active", "MCP sessions currently stored")
+    closed_total = Counter("mcp_sessions_closed_total", "MCP sessions removed from the store", ("reason",))
+
+    _sessions: OrderedDict[str, Session] = OrderedDict()
+    _shared = StateStore.shared_table("sessions")
+
+    @classmethod
+    async def create(cls, params: Dict[str, Any]) -> Session:
+        """Crea una sessione a partire dai parametri di initialize"""
+        cls.purge()
+        now = time.monotonic()
+        session = Session(session_id=secrets.token_urlsafe(24), created=now, last_seen=now)
+        if isinstance(params, dict):
+            session.protocol_version = params.get("protocolVersion")
+            if isinstance(params.get("clientInfo"), dict):
+                session.client_info = params["clientInfo"]
+            if isinstance(params.get("capabilities"), dict):
+                session.client_capabilities = params["capabilities"]
+        cls._store(session)
+        # Scrittura attesa prima della risposta: la richiesta successiva può arrivare a un altro worker
+        cls._share(session, sync=True)
+        await StateStore.commit()
+        return session
+
+    @classmethod
+    def _store(cls, session: Session) -> None:
+        cls._sessions[session.session_id] = session
+        while len(cls._sessions) > MCP_SESSION_MAX:
+            cls._sessions.popitem(last=False)
+            cls.closed_total.inc("evicted")
+        cls.active.set(value=len(cls._sessions))
+
+    @classmethod
+    def _share(cls, session: Session, sync: bool = False) -> None:
+        """Registra (o rinnova) la sessione nella tabella condivisa tra i worker"""
+        if cls._shared is None:
+            return
+        session.shared_at = time.monotonic()
+        cls._shared.put(session.session_id, {
+            "created": session.created,
+            "protocol_version": session.protocol_version,
+            "client_info": session.client_info,
+            "client_capabilities": session.client_capabilities,
+            "initialized": session.initialized,
+        }, MCP_SESSION_IDLE_TIMEOUT * 1.25, sync)
+
+    @classmethod
+    async def _adopt(cls, session_id: str) -> Session | None:
+        """Sessione creata da un altro worker, ricostruita dalla tabella condivisa"""
+        hit = await cls._shared.aget(session_id) if cls._shared is not None else None
+        if hit is None:
+            return None
+        record, _ = hit
+        now = time.monotonic()
+        session = Session(
+            session_id=session_id,
+            created=record["created"],
+            last_seen=now,
+            protocol_version=record["protocol_version"],
+            client_info=record["client_info"],
+            client_capabilities=record["client_capabilities"],
+            initialized=record["initialized"],
+            shared_at=now
+        )
+        cls._store(session)
+        return session
+
+    @classmethod
+    def peek(cls, session_id: str) -> Session | None:
+        """Sessione valida senza aggiornarne l'ultimo accesso"""
+        session = cls._sessions.get(session_id)
+        if session is None or time.monotonic() - session.last_seen > MCP_SESSION_IDLE_TIMEOUT:
+            return None
+        return session
+
+    @classmethod
+    async def get(cls, session_id: str) -> Session | None:
+        """Sessione valida (aggiornandone l'ultimo accesso), None se sconosciuta o scaduta"""
+        session = cls._sessions.get(session_id)
+        now = time.monotonic()
+        if session is not None and now - session.last_seen > MCP_SESSION_IDLE_TIMEOUT:
+            cls._remove(session_id, "expired")
+            session = None
+        if cls._shared is not None:
+            if session is not None and await cls._shared.aget(session_id) is None:
+                # Terminata (DELETE) o scaduta su un altro worker
+                cls._remove(session_id, "deleted")
+                return None
+            if session is None:
+                return await cls._adopt(session_id)
+            if now - session.shared_at > MCP_SESSION_IDLE_TIMEOUT / 4:
+                cls._share(session)
+        if session is None:
+            return None
+        session.last_seen = now
+        cls._sessions.move_to_end(session_id)
+        return session
+
+    @classmethod
+    async def end(cls, session_id: str) -> bool:
+        """Termina una sessione (DELETE /mcp); False se non esisteva"""
+        if await cls.get(session_id) is None:
+            return False
+        cls._remove(session_id, "deleted")
+        if cls._shared is not None:
+            cls._shared.delete(session_id)
+            await StateStore.commit()
+        return True
+
+    @classmethod
+    def purge(cls) -> int:
+        """Rimuove le sessioni inattive da più di MCP_SESSION_IDLE_TIMEOUT"""
+        cutoff = time.monotonic() - MCP_SESSION_IDLE_TIMEOUT
+        removed = 0
+        while cls._sessions:
+            session_id, session = next(iter(cls._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            cls._remove(session_id, "expired")
+            removed += 1
+        return removed
+
+    @classmethod
+    async def record(cls, session: Session, batch: List[Dict[str, Any]], tools_etag: str | None) -> None:
+        """Aggiorna lo stato della sessione con le richieste appena eseguite"""
+        session.requests += len(batch)
+        shared = False
+        for message in batch:
+            method = message.get("method") if isinstance(message, dict) else None
+            if method == "notifications/initialized":
+                session.initialized = True
+                cls._share(session, sync=True)
+                shared = True
+            elif method == "tools/list":
+                session.tools_etag = tools_etag
+        if shared:
+            await StateStore.commit()
+
+    @classmethod
+    def _remove(cls, session_id: str, reason: str) -> None:
+        if cls._sessions.pop(session_id, None) is not None:
+            cls.closed_total.inc(reason)
+            cls.active.set(value=len(cls._sessions))
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._sessions.clear()
+        cls.active.set(value=0)
+
+
+Metrics.register(SessionStore.active)
+Metrics.register(SessionStore.closed_total)
@@ -0,0 +1,278 @@
+"""
+Shared Memory Module
+Stato condiviso tra i worker uvicorn: segmenti di metriche per processo e tabelle a slot (cache, sessioni)
+su file mappati in memoria (tmpfs /dev/shm)
+"""
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+from typing import Dict, Any, Iterator, Tuple
+
+# Directory condivisa creata dal launcher multi-worker (vuota = processo singolo, niente memoria condivisa)
+MCP_SHARED_DIR = os.getenv("MCP_SHARED_DIR", "")
+# Dimensione del segmento di metriche di ogni worker (byte)
+MCP_SHARED_METRICS_SIZE = int(os.getenv("MCP_SHARED_METRICS_SIZE", 1024 * 1024))
+# Tabelle condivise: slot totali, byte per slot e slot esaminati per chiave
+MCP_SHARED_TABLE_SLOTS = int(os.getenv("MCP_SHARED_TABLE_SLOTS", 4096))
+MCP_SHARED_SLOT_SIZE = int(os.getenv("MCP_SHARED_SLOT_SIZE", 2048))
+MCP_SHARED_TABLE_WAYS = 4
+
+# Blocco del segmento metriche: lunghezza chiave, numero di valori, chiave (padding a 8 byte), valori double
+_ENTRY_HEADER = struct.Struct("<HH")
+_VALUE = struct.Struct("<d")
+# Slot delle tabelle: versione (seqlock), lunghezza chiave, lunghezza valore, scadenza, scrittura, hash
+_SLOT_HEADER = struct.Struct("<IHIddQ")
+
+
+def _owner_alive(path: str) -> bool:
+    """
+    Il proprietario di un segmento ne tiene il flock esclusivo finché vive: il kernel lo rilascia
+    all'uscita, anche per kill -9. A differenza del PID, non può passare a un altro processo.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+def _map_file(path: str, size: int) -> mmap.mmap:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
+
+class MetricSegment:
+    """
+    Segmento di metriche di un solo worker: solo il proprietario scrive, senza lock.
+    Ogni serie è un blocco (chiave, n valori double) aggiunto in coda; l'offset di fine
+    viene aggiornato dopo il blocco, così un lettore non vede mai blocchi incompleti.
+    Il proprietario tiene un flock esclusivo sul file per dire ai lettori che è vivo.
+    """
+
+    def __init__(self, path: str, size: int = MCP_SHARED_METRICS_SIZE):
+        self.path = path
+        self.size = size
+        self.buffer = _map_file(path, size)
+        self._owner_fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+        fcntl.flock(self._owner_fd, fcntl.LOCK_EX)
+        self.full = False
+        # I primi 8 byte contengono l'offset di fine dei dati
+        if struct.unpack_from("<Q", self.buffer, 0)[0] == 0:
+            struct.pack_into("<Q", self.buffer, 0, 8)
+
+    def allocate(self, key: str, count: int) -> int | None:
+        """Riserva count valori per la serie e restituisce l'offset del primo, None se il segmento è pieno"""
+        encoded = key.encode()
+        end = struct.unpack_from("<Q", self.buffer, 0)[0]
+        key_end = end + _ENTRY_HEADER.size + len(encoded)
+        values_offset = key_end + (-key_end % 8)
+        if values_offset + _VALUE.size * count > self.size:
+            self.full = True
+            return None
+        _ENTRY_HEADER.pack_into(self.buffer, end, len(encoded), count)
+        self.buffer[end + _ENTRY_HEADER.size:key_end] = encoded
+        struct.pack_into(f"<{count}d", self.buffer, values_offset, *([0.0] * count))
+        struct.pack_into("<Q", self.buffer, 0, values_offset + _VALUE.size * count)
+        return values_offset
+
+    def set(self, offset: int, value: float) -> None:
+        _VALUE.pack_into(self.buffer, offset, value)
+
+    @staticmethod
+    def read(buffer) -> Iterator[Tuple[str, Tuple[float, ...]]]:
+        end = struct.unpack_from("<Q", buffer, 0)[0]
+        offset = 8
+        while offset < end:
+            length, count = _ENTRY_HEADER.unpack_from(buffer, offset)
+            key_end = offset + _ENTRY_HEADER.size + length
+            values_offset = key_end + (-key_end % 8)
+            key = bytes(buffer[offset + _ENTRY_HEADER.size:key_end]).decode()
+            yield key, struct.unpack_from(f"<{count}d", buffer, values_offset)
+            offset = values_offset + _VALUE.size * count
+
+
+class SharedTable:
+    """
+    Tabella chiave -> valore JSON a slot fissi in un file condiviso da tutti i worker.
+    Ogni chiave ha MCP_SHARED_TABLE_WAYS slot candidati; gli scrittori si serializzano
+    con flock, i lettori non prendono lock e usano la versione dello slot (seqlock)
+    per scartare letture concorrenti a una scrittura.
+    """
+
+    def __init__(self, path: str, slots: int = MCP_SHARED_TABLE_SLOTS, slot_size: int = MCP_SHARED_SLOT_SIZE):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.buffer = _map_file(path, slots * slot_size)
+        self._lock_fd = os.open(path, os.O_RDWR)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+    def _candidates(self, key_hash: int) -> range:
+        first = key_hash % self.slots
+        return range(first, first + MCP_SHARED_TABLE_WAYS)
+
+    def _read_slot(self, index: int) -> Tuple[int, str, bytes, float, float] | None:
+        """(hash, chiave, valore, scadenza, scrittura) con lettura consistente, None se vuoto"""
+        base = (index % self.slots) * self.slot_size
+        for _ in range(3):
+            version, key_length, value_length, expires, stored, key_hash = _SLOT_HEADER.unpack_from(self.buffer, base)
+            if version % 2 or key_length + value_length > self.slot_size - _SLOT_HEADER.size:
+                continue
+            data_start = base + _SLOT_HEADER.size
+            key = bytes(self.buffer[data_start:data_start + key_length])
+            value = bytes(self.buffer[data_start + key_length:data_start + key_length + value_length])
+            if struct.unpack_from("<I", self.buffer, base)[0] == version:
+                if key_length == 0:
+                    return None
+                return key_hash, key.decode(errors="replace"), value, expires, stored
+        return None
+
+    def get(self, key: str) -> Tuple[Any, float] | None:
+        """(valore, istante di scrittura time.time()) se presente e non scaduto"""
+        key_hash = self._hash(key)
+        now = time.time()
+        for index in self._candidates(key_hash):
+            slot = self._read_slot(index)
+            if slot is not None and slot[0] == key_hash and slot[1] == key and slot[3] > now:
+                return json.loads(slot[2]), slot[4]
+        return None
+
+    async def aget(self, key: str) -> Tuple[Any, float] | None:
+        """Come get: la lettura dalla memoria mappata non blocca l'event loop"""
+        return self.get(key)
+
+    def fits(self, key: str, value: Any) -> bool:
+        """True se chiave e valore serializzato entrano in uno slot (altrimenti put li scarta)"""
+        return self._fits(key.encode(), json.dumps(value, separators=(",", ":"), default=str).encode())
+
+    def _fits(self, encoded_key: bytes, encoded: bytes) -> bool:
+        return len(encoded_key) + len(encoded) <= self.slot_size - _SLOT_HEADER.size
+
+    def put(self, key: str, value: Any, ttl: float, sync: bool = False) -> bool:
+        """
+        Scrive il valore (sempre subito visibile: sync esiste per compatibilità con StateTable).
+        False se troppo grande per uno slot: in quel caso rimuove il valore precedente, ormai superato
+        """
+        encoded_key = key.encode()
+        encoded = json.dumps(value, separators=(",", ":"), default=str).encode()
+        if not self._fits(encoded_key, encoded):
+            self.delete(key)
+            return False
+        key_hash = self._hash(key)
+        now = time.time()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            # Slot della stessa chiave, altrimenti vuoto o scaduto, altrimenti il più vecchio
+            target = None
+            oldest = None
+            for index in self._candidates(key_hash):
+                slot = self._read_slot(index)
+                if slot is not None and slot[0] == key_hash and slot[1] == key:
+                    target = index
+                    break
+                if target is None and (slot is None or slot[3] <= now):
+                    target = index
+                if slot is not None and (oldest is None or slot[4] < oldest[1]):
+                    oldest = (index, slot[4])
+            if target is None:
+                target = oldest[0]
+            self._write_slot(target, key_hash, encoded_key, encoded, now + ttl, now)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        return True
+
+    def delete(self, key: str) -> None:
+        key_hash = self._hash(key)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            for index in self._candidates(key_hash):
+                slot = self._read_slot(index)
+                if slot is not None and slot[0] == key_hash and slot[1] == key:
+                    self._write_slot(index, 0, b"", b"", 0.0, 0.0)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _write_slot(self, index: int, key_hash: int, key: bytes, value: bytes, expires: float, stored: float) -> None:
+        base = (index % self.slots) * self.slot_size
+        version = struct.unpack_from("<I", self.buffer, base)[0]
+        # Versione dispari durante la scrittura: i lettori concorrenti riprovano
+        struct.pack_into("<I", self.buffer, base, (version + 1) & 0xFFFFFFFF)
+        data_start = base + _SLOT_HEADER.size
+        self.buffer[data_start:data_start + len(key)] = key
+        self.buffer[data_start + len(key):data_start + len(key) + len(value)] = value
+        _SLOT_HEADER.pack_into(self.buffer, base, (version + 1) & 0xFFFFFFFF, len(key), len(value), expires, stored, key_hash)
+        struct.pack_into("<I", self.buffer, base, (version + 2) & 0xFFFFFFFF)
+
+
+class SharedMemory:
+    """
+    Punto d'accesso allo stato condiviso. Fuori dalla modalità multi-worker
+    (MCP_SHARED_DIR vuota) restituisce None e ogni modulo resta in memoria locale.
+    """
+
+    _segment: MetricSegment | None = None
+    _segment_pid: int | None = None
+    _tables: Dict[str, SharedTable] = {}
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(MCP_SHARED_DIR)
+
+    @classmethod
+    def metrics_segment(cls) -> MetricSegment | None:
+        """Segmento di questo worker (creato al primo uso, anche dopo un fork)"""
+        if not MCP_SHARED_DIR:
+            return None
+        pid = os.getpid()
+        if cls._segment is None or cls._segment_pid != pid:
+            # Un PID può tornare a un nuovo worker: l'istante di avvio rende il file unico per processo
+            name = f"metrics-{pid}-{time.time_ns()}.bin"
+            cls._segment = MetricSegment(os.path.join(MCP_SHARED_DIR, name))
+            cls._segment_pid = pid
+        return cls._segment
+
+    @staticmethod
+    def metric_segments() -> Iterator[Tuple[int, bool, mmap.mmap]]:
+        """(pid, vivo, buffer) per i segmenti di tutti i worker, compresi quelli terminati"""
+        for name in sorted(os.listdir(MCP_SHARED_DIR)):
+            if not (name.startswith("metrics-") and name.endswith(".bin")):
+                continue
+            pid = int(name[len("metrics-"):-len(".bin")].split("-")[0])
+            path = os.path.join(MCP_SHARED_DIR, name)
+            try:
+                with open(path, "rb") as f:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                continue
+            try:
+                yield pid, _owner_alive(path), buffer
+            finally:
+                buffer.close()
+
+    @classmethod
+    def table(cls, name: str) -> SharedTable | None:
+        """Tabella condivisa con questo nome, None in modalità processo singolo"""
+        if not MCP_SHARED_DIR:
+            return None
+        table = cls._tables.get(name)
+        if table is None:
+            table = cls._tables[name] = SharedTable(os.path.join(MCP_SHARED_DIR, f"{name}.table"))
+        return table
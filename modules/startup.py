@@ -0,0 +1,140 @@
+"""
+Startup Module
+Misura dell'avvio a freddo: tempo di import per pacchetto, fasi del lifespan e prima risposta
+"""
+import os
+import sys
+import time
+import builtins
+from typing import Dict, Any, List
+
+# Modalità di avvio ottimizzata per scale-to-zero: pool HTTP e worker CPU creati in modo differito
+MCP_LAZY_STARTUP = os.getenv("MCP_LAZY_STARTUP", "false").lower() == "true"
+
+
+def _process_age() -> float | None:
+    """Secondi trascorsi dall'avvio del processo (Linux, da /proc), None se non disponibile"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Il nome del processo può contenere spazi: i campi utili seguono l'ultima ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """
+    Registro dei tempi di avvio, consultabile su /startup.
+    Il tempo di import è esclusivo per pacchetto di primo livello: gli import
+    annidati di altri pacchetti vengono attribuiti a questi ultimi.
+    """
+
+    started = time.perf_counter()
+    # Tempo trascorso tra l'avvio dell'interprete e l'import di questo modulo
+    before_profile = _process_age()
+
+    imports: Dict[str, float] = {}
+    phases: List[tuple] = []
+    first_response: float | None = None
+    first_response_path: str | None = None
+
+    _original_import = None
+    _stack: List[list] = []
+
+    @classmethod
+    def elapsed(cls) -> float:
+        return time.perf_counter() - cls.started
+
+    @classmethod
+    def track_imports(cls) -> None:
+        """Avvolge __import__ per misurare i moduli caricati da qui in poi"""
+        if cls._original_import is not None:
+            return
+        original = cls._original_import = builtins.__import__
+        imports = cls.imports
+        stack = cls._stack
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            # [tempo degli import annidati da escludere]
+            frame = [0.0]
+            stack.append(frame)
+            started = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                total = time.perf_counter() - started
+                stack.pop()
+                root = name.partition(".")[0]
+                imports[root] = imports.get(root, 0.0) + total - frame[0]
+                if stack:
+                    stack[-1][0] += total
+
+        builtins.__import__ = timed_import
+
+    @classmethod
+    def stop_tracking(cls) -> None:
+        if cls._original_import is not None:
+            builtins.__import__ = cls._original_import
+            cls._original_import = None
+
+    @classmethod
+    def mark(cls, phase: str) -> None:
+        """Registra il completamento di una fase dell'avvio"""
+        cls.phases.append((phase, cls.elapsed()))
+
+    @classmethod
+    def record_first_response(cls, path: str) -> None:
+        if cls.first_response is None:
+            cls.first_response = cls.elapsed()
+            cls.first_response_path = path
+
+    @classmethod
+    def report(cls, top: int = 15) -> Dict[str, Any]:
+        """Report in millisecondi, relativo all'import di questo modulo"""
+        ms = lambda seconds: round(seconds * 1000, 1)
+        slowest = sorted(cls.imports.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "lazy_startup": MCP_LAZY_STARTUP,
+            "interpreter_ms": ms(cls.before_profile) if cls.before_profile is not None else None,
+            "phases_ms": {phase: ms(at) for phase, at in cls.phases},
+            "time_to_first_response_ms": ms(cls.first_response) if cls.first_response is not None else None,
+            "first_response_path": cls.first_response_path,
+            "imports_ms": {name: ms(seconds) for name, seconds in slowest},
+            "imports_total_ms": ms(sum(cls.imports.values())),
+        }
+
+    @classmethod
+    def summary(cls, top: int = 5) -> Dict[str, Any]:
+        """Versione piatta del report, adatta a un record di log"""
+        report = cls.report(top)
+        return {
+            "lazy_startup": report["lazy_startup"],
+            "interpreter_ms": report["interpreter_ms"],
+            **{f"{phase}_done_ms": at for phase, at in report["phases_ms"].items()},
+            "imports_total_ms": report["imports_total_ms"],
+            "slowest_imports": " ".join(f"{name}={at}" for name, at in report["imports_ms"].items()),
+        }
+
+
+class FirstResponseMiddleware:
+    """Middleware ASGI che registra l'istante della prima risposta, poi si limita a inoltrare"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if StartupProfile.first_response is not None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                StartupProfile.record_first_response(scope["path"])
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
@@ -0,0 +1,387 @@
+"""
+State Store Module
+Interfaccia di persistenza per cache e store del server, con backend in memoria o SQLite (WAL, scritture a lotti)
+"""
+import os
+import json
+import time
+import fcntl
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Tuple
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.shared_memory import SharedMemory
+    from modules.structured_logging import StructuredLogger
+except ImportError:
+    # Fall back to relative import (for development)
+    from .shared_memory import SharedMemory
+    from .structured_logging import StructuredLogger
+
+# Backend dello stato: "memory" (perso al riavvio) o "sqlite" (file locale, condiviso tra worker e riavvii)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+# File del database SQLite (su Fly un volume montato, es. /data)
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "/data/mcp_state.db")
+# Scritture accumulate e applicate in un'unica transazione ogni STATE_FLUSH_INTERVAL secondi
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", 0.5))
+STATE_BATCH_MAX = int(os.getenv("STATE_BATCH_MAX", 500))
+# Intervallo di pulizia delle righe scadute (secondi)
+STATE_PURGE_INTERVAL = float(os.getenv("STATE_PURGE_INTERVAL", 300))
+
+logger = StructuredLogger("mcp.state")
+
+
+class StateTable(ABC):
+    """
+    Vista di un namespace del backend: chiavi stringa, valori serializzabili in JSON.
+    Stessa interfaccia di SharedTable (get/put/delete), più items() per il ripristino all'avvio.
+    Dall'event loop si legge con aget/aitems: per i backend su disco la lettura avviene in un thread.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Tuple[Any, float] | None:
+        """(valore, istante di scrittura time.time()) se presente e non scaduto"""
+
+    @abstractmethod
+    def put(self, key: str, value: Any, ttl: float | None = None, sync: bool = False) -> bool:
+        """
+        Scrive il valore (ttl None = senza scadenza). sync=True anticipa la scrittura del lotto;
+        chi deve attenderla (es. prima di rispondere al client) usa StateStore.commit()
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Tutte le coppie (chiave, valore) non scadute del namespace"""
+
+    async def aget(self, key: str) -> Tuple[Any, float] | None:
+        return self.get(key)
+
+    async def aitems(self) -> List[Tuple[str, Any]]:
+        return list(self.items())
+
+
+class MemoryTable(StateTable):
+    """Namespace in un dict del processo"""
+
+    def __init__(self):
+        # chiave -> (valore, scrittura, scadenza)
+        self._entries: Dict[str, Tuple[Any, float, float]] = {}
+
+    def get(self, key: str) -> Tuple[Any, float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del self._entries[key]
+            return None
+        return entry[0], entry[1]
+
+    def put(self, key: str, value: Any, ttl: float | None = None, sync: bool = False) -> bool:
+        now = time.time()
+        self._entries[key] = (value, now, now + ttl if ttl is not None else float("inf"))
+        return True
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        now = time.time()
+        for key, (value, _, expires) in list(self._entries.items()):
+            if expires > now:
+                yield key, value
+
+
+class SQLiteTable(StateTable):
+    """
+    Namespace nella tabella state del database SQLite.
+    Il database viene aperto al primo accesso, non quando la tabella viene creata
+    (le tabelle nascono all'import dei moduli, anche nel processo del launcher)
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    @property
+    def backend(self) -> "SQLiteBackend":
+        return StateStore.backend()
+
+    def get(self, key: str) -> Tuple[Any, float] | None:
+        return self.backend.get(self.namespace, key)
+
+    async def aget(self, key: str) -> Tuple[Any, float] | None:
+        return await self.backend.aget(self.namespace, key)
+
+    def put(self, key: str, value: Any, ttl: float | None = None, sync: bool = False) -> bool:
+        now = time.time()
+        row = (self.namespace, key, json.dumps(value, separators=(",", ":"), default=str), now,
+               now + ttl if ttl is not None else None)
+        self.backend.write(row, sync)
+        return True
+
+    def delete(self, key: str) -> None:
+        # Una riga con valore NULL nel lotto equivale a una cancellazione, scritta appena possibile
+        self.backend.write((self.namespace, key, None, time.time(), None), sync=True)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(self.backend.items(self.namespace))
+
+    async def aitems(self) -> List[Tuple[str, Any]]:
+        return await self.backend.aitems(self.namespace)
+
+
+class SQLiteBackend:
+    """
+    Database SQLite in modalità WAL: i lettori non bloccano lo scrittore e più
+    processi (worker) possono usare lo stesso file. Le scritture vengono accumulate
+    in memoria e applicate a lotti da un thread, in un'unica transazione; finché
+    non sono scritte le letture del processo le trovano nel lotto in attesa.
+    L'event loop non esegue mai commit: write() si limita ad accodare e, per le
+    scritture urgenti o a lotto pieno, a svegliare il task di StateStore con on_urgent.
+    Le letture dal database passano tutte da un thread dedicato, l'unico che usa la
+    connessione di lettura; aget e aitems lo attendono senza bloccare l'event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._reader = self._connect()
+        self._reads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-reader")
+        self._writer = self._connect()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " stored REAL NOT NULL, expires REAL,"
+            " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        self._writer.commit()
+        self._write_lock = threading.Lock()
+        # Protegge lo scambio di _pending tra l'event loop (write) e il thread di flush
+        self._pending_lock = threading.Lock()
+        self.on_urgent: Callable[[], None] | None = None
+        # (namespace, key) -> riga da scrivere; il lotto in scrittura resta consultabile
+        self._pending: Dict[Tuple[str, str], tuple] = {}
+        self._flushing: Dict[Tuple[str, str], tuple] = {}
+        self._last_purge = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Con WAL, NORMAL non perde la coerenza del database ma evita un fsync per transazione
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.isolation_level = "DEFERRED"
+        return connection
+
+    def _overlay(self, namespace: str) -> Dict[str, tuple]:
+        """Righe del namespace ancora nei lotti non scritti (più recenti di quelle nel database)"""
+        rows = {}
+        for batch in (self._flushing, self._pending):
+            rows.update({key: row for (ns, key), row in list(batch.items()) if ns == namespace})
+        return rows
+
+    def _select(self, namespace: str, key: str) -> tuple | None:
+        return self._reader.execute(
+            "SELECT namespace, key, value, stored, expires FROM state WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+
+    def _select_all(self, namespace: str) -> List[tuple]:
+        return self._reader.execute(
+            "SELECT namespace, key, value, stored, expires FROM state WHERE namespace = ?", (namespace,)
+        ).fetchall()
+
+    @staticmethod
+    def _decode(row: tuple | None) -> Tuple[Any, float] | None:
+        if row is None or row[2] is None or (row[4] is not None and row[4] <= time.time()):
+            return None
+        return json.loads(row[2]), row[3]
+
+    def _batched(self, namespace: str, key: str) -> tuple | None:
+        # Prima il lotto in attesa, poi quello in scrittura: dopo il commit la riga è nel database
+        return self._pending.get((namespace, key)) or self._flushing.get((namespace, key))
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, float] | None:
+        """Lettura bloccante (fuori dall'event loop); dal loop si usa aget"""
+        row = self._batched(namespace, key)
+        if row is None:
+            row = self._reads.submit(self._select, namespace, key).result()
+        return self._decode(row)
+
+    async def aget(self, namespace: str, key: str) -> Tuple[Any, float] | None:
+        row = self._batched(namespace, key)
+        if row is None:
+            row = await asyncio.get_running_loop().run_in_executor(self._reads, self._select, namespace, key)
+        return self._decode(row)
+
+    def _merge(self, rows: List[tuple], overlay: Dict[str, tuple]) -> List[Tuple[str, Any]]:
+        merged = {row[1]: row for row in rows}
+        merged.update(overlay)
+        now = time.time()
+        return [
+            (key, json.loads(row[2])) for key, row in merged.items()
+            if row[2] is not None and (row[4] is None or row[4] > now)
+        ]
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        overlay = self._overlay(namespace)
+        return self._merge(self._reads.submit(self._select_all, namespace).result(), overlay)
+
+    async def aitems(self, namespace: str) -> List[Tuple[str, Any]]:
+        # I lotti vengono copiati prima della query: una riga scritta nel frattempo è in uno dei due
+        overlay = self._overlay(namespace)
+        rows = await asyncio.get_running_loop().run_in_executor(self._reads, self._select_all, namespace)
+        return self._merge(rows, overlay)
+
+    def write(self, row: tuple, sync: bool = False) -> None:
+        with self._pending_lock:
+            self._pending[(row[0], row[1])] = row
+            urgent = sync or len(self._pending) >= STATE_BATCH_MAX
+        if urgent and self.on_urgent is not None:
+            self.on_urgent()
+
+    def flush(self) -> None:
+        """Applica il lotto in attesa in un'unica transazione (chiamabile da un thread)"""
+        with self._write_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+            try:
+                upserts = [row for row in self._flushing.values() if row[2] is not None]
+                deletes = [row[:2] for row in self._flushing.values() if row[2] is None]
+                with self._writer:
+                    self._writer.executemany(
+                        "INSERT OR REPLACE INTO state (namespace, key, value, stored, expires) VALUES (?, ?, ?, ?, ?)",
+                        upserts
+                    )
+                    self._writer.executemany("DELETE FROM state WHERE namespace = ? AND key = ?", deletes)
+                    if time.monotonic() - self._last_purge > STATE_PURGE_INTERVAL:
+                        self._writer.execute("DELETE FROM state WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+                        self._last_purge = time.monotonic()
+            except sqlite3.Error as e:
+                # Il lotto torna in coda (senza sovrascrivere scritture più recenti) per il prossimo tentativo
+                with self._pending_lock:
+                    self._pending = {**self._flushing, **self._pending}
+                logger.warning("state_flush_failed", error=str(e), rows=len(self._flushing))
+            finally:
+                self._flushing = {}
+
+
+class MemoryBackend:
+    """Backend di default: namespace in memoria, persi al riavvio"""
+
+    def __init__(self):
+        self._tables: Dict[str, MemoryTable] = {}
+
+    def table(self, namespace: str) -> MemoryTable:
+        return self._tables.setdefault(namespace, MemoryTable())
+
+    def flush(self) -> None:
+        pass
+
+
+class StateStore:
+    """
+    Punto d'accesso al backend configurato da STATE_BACKEND.
+    Le scritture SQLite a lotti sono applicate, sempre in un thread, da un task
+    periodico (svegliato in anticipo dalle scritture urgenti), da commit() e allo shutdown.
+    """
+
+    _backend: MemoryBackend | SQLiteBackend | None = None
+    _task: asyncio.Task | None = None
+    _wakeup: asyncio.Event | None = None
+    _claims: Dict[str, int] = {}
+
+    @classmethod
+    def backend(cls) -> MemoryBackend | SQLiteBackend:
+        if cls._backend is None:
+            cls._backend = SQLiteBackend(STATE_SQLITE_PATH) if STATE_BACKEND == "sqlite" else MemoryBackend()
+        return cls._backend
+
+    @staticmethod
+    def persistent() -> bool:
+        return STATE_BACKEND == "sqlite"
+
+    @classmethod
+    def table(cls, namespace: str) -> StateTable:
+        if cls.persistent():
+            return SQLiteTable(namespace)
+        return cls.backend().table(namespace)
+
+    @classmethod
+    def shared_table(cls, namespace: str):
+        """
+        Tabella di appoggio per cache e store che tengono già i dati in memoria:
+        SQLite se configurato, altrimenti memoria condivisa tra i worker,
+        altrimenti None (nessuna copia oltre a quella locale)
+        """
+        if cls.persistent():
+            return cls.table(namespace)
+        return SharedMemory.table(namespace)
+
+    @classmethod
+    async def start(cls) -> None:
+        if cls.persistent() and (cls._task is None or cls._task.done()):
+            cls._wakeup = asyncio.Event()
+            cls.backend().on_urgent = cls._wakeup.set
+            cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def commit(cls) -> None:
+        """Attende che le scritture accodate siano nel database (visibili agli altri processi)"""
+        if cls.persistent() and cls._backend is not None:
+            await asyncio.to_thread(cls._backend.flush)
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._backend is not None:
+            cls._backend.on_urgent = None
+            await asyncio.to_thread(cls._backend.flush)
+
+    @classmethod
+    def claim(cls, name: str) -> bool:
+        """
+        Lock esclusivo accanto al database, tenuto fino all'uscita del processo:
+        con più worker un solo processo ottiene True. Lo usa HealthMonitor.start, così
+        gli URL monitorati salvati vengono ripristinati (e sondati) da un solo worker
+        """
+        if name in cls._claims:
+            return True
+        if not cls.persistent():
+            return False
+        fd = os.open(f"{STATE_SQLITE_PATH}.{name}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        cls._claims[name] = fd
+        return True
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                async with asyncio.timeout(STATE_FLUSH_INTERVAL):
+                    await cls._wakeup.wait()
+            except TimeoutError:
+                pass
+            cls._wakeup.clear()
+            # La transazione gira in un thread: l'event loop non attende il disco
+            await asyncio.to_thread(cls.backend().flush)
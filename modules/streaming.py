@@ -0,0 +1,151 @@
+"""
+MCP Streaming Module
+Trasporto streamable HTTP del protocollo MCP basato su Server-Sent Events
+"""
+import os
+import asyncio
+import contextvars
+from typing import Dict, Any, List, AsyncIterator, Awaitable
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.codec import MCPCodec
+except ImportError:
+    # Fall back to relative import (for development)
+    from .codec import MCPCodec
+
+# Intervallo dei commenti keep-alive sugli stream SSE (secondi)
+MCP_SSE_KEEPALIVE = float(os.getenv("MCP_SSE_KEEPALIVE", 15))
+# Messaggi massimi in coda per ogni client connesso allo stream GET /mcp
+MCP_SSE_QUEUE_SIZE = int(os.getenv("MCP_SSE_QUEUE_SIZE", 100))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# Coda dello stream SSE della richiesta corrente (None se la risposta è JSON)
+_stream_sink: contextvars.ContextVar[asyncio.Queue | None] = contextvars.ContextVar(
+    "mcp_stream_sink", default=None
+)
+# progressToken fornito dal client in params._meta della richiesta corrente
+_progress_token: contextvars.ContextVar[str | int | None] = contextvars.ContextVar(
+    "mcp_progress_token", default=None
+)
+
+_STREAM_DONE = object()
+
+
+class MCPStreaming:
+    """Gestione delle risposte SSE e delle notifiche di progresso"""
+
+    # Code dei client connessi allo stream GET /mcp
+    _subscribers: set = set()
+
+    @staticmethod
+    def format_sse(message: Dict[str, Any]) -> bytes:
+        """Serializza un messaggio JSON-RPC come evento SSE"""
+        return b"event: message\ndata: " + MCPCodec.encode(message) + b"\n\n"
+
+    @staticmethod
+    def wants_stream(accept: str | None, requests: List[Dict[str, Any]]) -> bool:
+        """
+        Sceglie la risposta SSE solo se il client la accetta e il messaggio
+        contiene almeno un tools/call (l'unico metodo potenzialmente lento)
+        """
+        if not accept or "text/event-stream" not in accept:
+            return False
+        return any(isinstance(r, dict) and r.get("method") == "tools/call" for r in requests)
+
+    @staticmethod
+    def bind_progress_token(params: Dict[str, Any]) -> None:
+        """Associa alla richiesta corrente il progressToken del client, se presente"""
+        meta = params.get("_meta") or {}
+        _progress_token.set(meta.get("progressToken"))
+
+    @staticmethod
+    def report_progress(progress: float, total: float | None = None, message: str | None = None) -> None:
+        """
+        Invia una notifications/progress sullo stream della richiesta corrente.
+        Non fa nulla se la risposta non è SSE o il client non ha chiesto il progresso.
+        """
+        sink = _stream_sink.get()
+        token = _progress_token.get()
+        if sink is None or token is None:
+            return
+
+        params: Dict[str, Any] = {"progressToken": token, "progress": progress}
+        if total is not None:
+            params["total"] = total
+        if message is not None:
+            params["message"] = message
+
+        sink.put_nowait({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": params
+        })
+
+    @staticmethod
+    async def stream_response(handler: Awaitable) -> AsyncIterator[bytes]:
+        """
+        Esegue l'handler e produce gli eventi SSE: prima le notifiche di progresso,
+        poi la risposta finale (una per ogni elemento in caso di batch)
+        """
+        sink: asyncio.Queue = asyncio.Queue()
+
+        async def run():
+            _stream_sink.set(sink)
+            try:
+                return await handler
+            finally:
+                sink.put_nowait(_STREAM_DONE)
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                message = await sink.get()
+                if message is _STREAM_DONE:
+                    break
+                yield MCPStreaming.format_sse(message)
+
+            result = await task
+            for response in result if isinstance(result, list) else [result]:
+                if MCPCodec.is_chunked(response):
+                    # Output in streaming: i dati dell'evento SSE escono un pezzo alla volta
+                    yield b"event: message\ndata: "
+                    async for part in MCPCodec.iter_encode(response):
+                        yield part
+                    yield b"\n\n"
+                else:
+                    yield MCPStreaming.format_sse(response)
+        finally:
+            # Il client si è disconnesso: interrompe il lavoro ancora in corso
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    def publish(message: Dict[str, Any]) -> None:
+        """Invia un messaggio server-initiated a tutti i client connessi a GET /mcp"""
+        for queue in list(MCPStreaming._subscribers):
+            if queue.full():
+                # Client lento: scarta il messaggio più vecchio
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    @staticmethod
+    async def subscribe() -> AsyncIterator[bytes]:
+        """Stream SSE dei messaggi server-initiated con keep-alive periodico"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MCP_SSE_QUEUE_SIZE)
+        MCPStreaming._subscribers.add(queue)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=MCP_SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                yield MCPStreaming.format_sse(message)
+        finally:
+            MCPStreaming._subscribers.discard(queue)
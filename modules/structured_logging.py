@@ -0,0 +1,191 @@
+"""
+Structured Logging Module
+Logging JSON non bloccante: i record passano da una coda a un thread in background
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import reprlib
+import logging
+import itertools
+import threading
+import contextvars
+from typing import Dict, Any, Tuple
+
+# Configurazione
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", 256))
+# Campionamento per livello, es. "DEBUG=0.01,INFO=0.5" (default: tutto)
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("mcp_request_id", default=None)
+_request_counter = itertools.count(1)
+_request_prefix = os.urandom(3).hex()
+
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+_STOP = None
+
+
+def _parse_sample_rates(spec: str) -> Dict[int, float]:
+    rates: Dict[int, float] = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        level, rate = item.split("=", 1)
+        level_no = logging.getLevelNamesMapping().get(level.strip().upper())
+        if level_no is not None:
+            rates[level_no] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+class StructuredLogging:
+    """
+    Pipeline di logging: il thread chiamante mette in coda una tupla
+    (ts, livello, logger, evento, request_id, campi) senza formattare nulla;
+    troncamento e serializzazione JSON avvengono nel thread di scrittura.
+    Se la coda è piena il record viene scartato e conteggiato, mai atteso.
+    I valori dei campi sono letti dal thread di scrittura: non vanno modificati
+    dopo la chiamata al logger.
+    """
+
+    level: int = logging.getLevelNamesMapping().get(LOG_LEVEL, logging.INFO)
+    sample_rates: Dict[int, float] = _parse_sample_rates(LOG_SAMPLE_RATES)
+
+    _queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _thread: threading.Thread | None = None
+    _dropped = 0
+    _repr = reprlib.Repr()
+    _repr.maxstring = LOG_MAX_FIELD_LENGTH
+    _repr.maxother = LOG_MAX_FIELD_LENGTH
+    _repr.maxdict = 20
+    _repr.maxlist = 20
+    _repr.maxlevel = 3
+
+    @classmethod
+    def start(cls) -> None:
+        """Avvia il thread che scrive i record su stdout (idempotente)"""
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        cls._thread = threading.Thread(target=cls._writer, name="mcp-log-writer", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls, timeout: float = 2.0) -> None:
+        """Scrive i record rimasti in coda e ferma il thread"""
+        if cls._thread is None:
+            return
+        try:
+            cls._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        cls._thread.join(timeout)
+        cls._thread = None
+
+    @classmethod
+    def dropped(cls) -> int:
+        """Numero di record scartati perché la coda era piena"""
+        return cls._dropped
+
+    @classmethod
+    def enqueue(cls, entry: Tuple) -> None:
+        try:
+            cls._queue.put_nowait(entry)
+        except queue.Full:
+            cls._dropped += 1
+
+    @staticmethod
+    def new_request_id() -> str:
+        """Genera e associa al contesto corrente un id di richiesta"""
+        request_id = f"{_request_prefix}-{next(_request_counter):x}"
+        _request_id.set(request_id)
+        return request_id
+
+    @staticmethod
+    def current_request_id() -> str | None:
+        return _request_id.get()
+
+    @classmethod
+    def truncate(cls, value: Any) -> Any:
+        """Limita la dimensione di un campo: stringhe tagliate, oggetti ridotti a repr limitato"""
+        if isinstance(value, str):
+            if len(value) > LOG_MAX_FIELD_LENGTH:
+                return value[:LOG_MAX_FIELD_LENGTH] + f"...(+{len(value) - LOG_MAX_FIELD_LENGTH} chars)"
+            return value
+        if isinstance(value, _PRIMITIVE_TYPES):
+            return value
+        return cls._repr.repr(value)
+
+    @classmethod
+    def format(cls, entry: Tuple) -> str:
+        """Serializza un record in una riga JSON"""
+        created, level, name, event, request_id, fields = entry
+        line: Dict[str, Any] = {
+            "ts": round(created, 6),
+            "level": logging.getLevelName(level),
+            "logger": name,
+            "event": event,
+        }
+        if request_id:
+            line["request_id"] = request_id
+        for key, value in fields.items():
+            try:
+                line[key] = cls.truncate(value)
+            except Exception:
+                line[key] = "<unrepresentable>"
+        return json.dumps(line, default=str)
+
+    @classmethod
+    def _writer(cls) -> None:
+        stream = sys.stdout
+        while True:
+            entry = cls._queue.get()
+            if entry is _STOP:
+                stream.flush()
+                return
+            try:
+                stream.write(cls.format(entry) + "\n")
+                if cls._queue.empty():
+                    stream.flush()
+            except Exception:
+                # Il logging non deve mai far cadere il thread di scrittura
+                pass
+
+
+class StructuredLogger:
+    """
+    Logger con campi strutturati: logger.info("evento", campo=valore).
+    Livello e campionamento sono verificati prima di creare il record, e nel
+    thread chiamante il costo è solo quello di una put_nowait sulla coda.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any]) -> None:
+        if level < StructuredLogging.level:
+            return
+        rate = StructuredLogging.sample_rates.get(level)
+        if rate is not None and random.random() >= rate:
+            return
+        StructuredLogging.enqueue((time.time(), level, self.name, event, _request_id.get(), fields))
+
+    def debug(self, event: str, **fields) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    @staticmethod
+    def elapsed_ms(started: float) -> float:
+        """Millisecondi trascorsi da un time.perf_counter()"""
+        return round((time.perf_counter() - started) * 1000, 3)
@@ -0,0 +1,264 @@
+"""
+System Status Module
+Campionamento periodico in background di CPU, memoria, processo ed event loop su ring buffer a dimensione fissa
+"""
+import os
+import math
+import time
+import base64
+import asyncio
+from array import array
+from typing import Dict, Any, List, Tuple
+
+try:
+    # Try absolute import first (for when running as a module)
+    from modules.metrics import Metrics
+    from modules.structured_logging import StructuredLogger
+except ImportError:
+    # Fall back to relative import (for development)
+    from .metrics import Metrics
+    from .structured_logging import StructuredLogger
+
+# Intervallo di campionamento (secondi)
+SYSTEM_STATUS_INTERVAL = float(os.getenv("SYSTEM_STATUS_INTERVAL", 5))
+# Campioni grezzi conservati (720 x 5s = 1 ora)
+SYSTEM_STATUS_SAMPLES = int(os.getenv("SYSTEM_STATUS_SAMPLES", 720))
+# Ampiezza di una finestra della storia aggregata (secondi) e finestre conservate
+SYSTEM_STATUS_WINDOW = float(os.getenv("SYSTEM_STATUS_WINDOW", 60))
+SYSTEM_STATUS_WINDOWS = int(os.getenv("SYSTEM_STATUS_WINDOWS", 60))
+
+FIELDS = (
+    "cpu_percent",
+    "load_1m",
+    "memory_percent",
+    "memory_available_mb",
+    "process_cpu_percent",
+    "process_rss_mb",
+    "process_threads",
+    "process_open_fds",
+    "loop_lag_ms",
+)
+
+logger = StructuredLogger("mcp.system_status")
+
+
+class SampleRing:
+    """
+    Ring buffer a dimensione fissa con un array('d') per campo:
+    nessuna allocazione dopo la creazione, append e ultimo valore in O(1)
+    """
+
+    def __init__(self, fields: Tuple[str, ...], size: int):
+        self.fields = fields
+        self.size = max(1, size)
+        self.timestamps = array("d", bytes(8 * self.size))
+        self.columns = {name: array("d", bytes(8 * self.size)) for name in fields}
+        self.next = 0
+        self.count = 0
+
+    def append(self, timestamp: float, values: Dict[str, float]) -> None:
+        index = self.next
+        self.timestamps[index] = timestamp
+        for name, column in self.columns.items():
+            column[index] = values.get(name, math.nan)
+        self.next = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self) -> Dict[str, float] | None:
+        if not self.count:
+            return None
+        index = self.next - 1
+        return {"timestamp": self.timestamps[index], **{name: column[index] for name, column in self.columns.items()}}
+
+    def tail(self, n: int) -> Dict[str, List[float]]:
+        """Ultimi n elementi in ordine cronologico, per colonna"""
+        n = max(0, min(n, self.count))
+        indexes = [(self.next - n + i) % self.size for i in range(n)]
+        return {
+            "timestamp": [self.timestamps[i] for i in indexes],
+            **{name: [column[i] for i in indexes] for name, column in self.columns.items()},
+        }
+
+    def dump(self) -> Dict[str, str]:
+        """Contenuto in ordine cronologico, una colonna di double in base64 per campo (per la persistenza)"""
+        return {
+            name: base64.b64encode(array("d", values).tobytes()).decode()
+            for name, values in self.tail(self.count).items()
+        }
+
+    def load(self, data: Dict[str, str]) -> None:
+        """Aggiunge in coda i campioni prodotti da dump(); i campi sconosciuti vengono ignorati"""
+        columns = {name: array("d", base64.b64decode(text)) for name, text in data.items()}
+        timestamps = columns.pop("timestamp", array("d"))
+        for index, timestamp in enumerate(timestamps[-self.size:], max(0, len(timestamps) - self.size)):
+            self.append(timestamp, {name: column[index] for name, column in columns.items() if index < len(column)})
+
+
+class _WindowAccumulator:
+    """Min/somma/max della finestra in corso, aggiornati a ogni campione"""
+
+    def __init__(self):
+        self.reset(0.0)
+
+    def reset(self, started: float) -> None:
+        self.started = started
+        self.samples = 0
+        self.minimum = dict.fromkeys(FIELDS, math.inf)
+        self.maximum = dict.fromkeys(FIELDS, -math.inf)
+        self.total = dict.fromkeys(FIELDS, 0.0)
+        self.counted = dict.fromkeys(FIELDS, 0)
+
+    def add(self, values: Dict[str, float]) -> None:
+        self.samples += 1
+        for name in FIELDS:
+            value = values.get(name, math.nan)
+            if math.isnan(value):
+                continue
+            self.minimum[name] = min(self.minimum[name], value)
+            self.maximum[name] = max(self.maximum[name], value)
+            self.total[name] += value
+            self.counted[name] += 1
+
+    def summary(self) -> Dict[str, float]:
+        result = {}
+        for name in FIELDS:
+            counted = self.counted[name]
+            result[f"{name}_min"] = self.minimum[name] if counted else math.nan
+            result[f"{name}_avg"] = self.total[name] / counted if counted else math.nan
+            result[f"{name}_max"] = self.maximum[name] if counted else math.nan
+        return result
+
+
+class SystemStatus:
+    """
+    Sampler in background: psutil viene interrogato solo dal task periodico,
+    get_system_status legge l'ultimo campione e le finestre già aggregate
+    """
+
+    samples = SampleRing(FIELDS, SYSTEM_STATUS_SAMPLES)
+    windows = SampleRing(
+        tuple(f"{name}_{stat}" for name in FIELDS for stat in ("min", "avg", "max")),
+        SYSTEM_STATUS_WINDOWS
+    )
+    _current = _WindowAccumulator()
+    _task: asyncio.Task | None = None
+    _process = None
+    _psutil = None
+    unavailable: str | None = None
+
+    @classmethod
+    async def start(cls) -> None:
+        """Avvia il campionamento; il primo campione è disponibile subito"""
+        if cls._task is not None and not cls._task.done():
+            return
+        try:
+            # Import differito: psutil non rallenta l'avvio a freddo
+            import psutil
+        except ImportError:
+            cls.unavailable = "psutil is not installed"
+            logger.warning("system_status_unavailable", reason=cls.unavailable)
+            return
+        cls._psutil = psutil
+        cls._process = psutil.Process()
+        # Le percentuali di CPU di psutil sono relative alla chiamata precedente: la prima fa da riferimento
+        psutil.cpu_percent(interval=None)
+        cls._process.cpu_percent(interval=None)
+        cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    def running(cls) -> bool:
+        return cls._task is not None and not cls._task.done()
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                cls.record(time.time(), cls._collect())
+            except Exception as e:
+                logger.warning("system_status_sample_failed", error=str(e))
+            await asyncio.sleep(SYSTEM_STATUS_INTERVAL)
+
+    @classmethod
+    def _collect(cls) -> Dict[str, float]:
+        psutil = cls._psutil
+        process = cls._process
+        memory = psutil.virtual_memory()
+        with process.oneshot():
+            values = {
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_available_mb": memory.available / 1048576,
+                "process_cpu_percent": process.cpu_percent(interval=None),
+                "process_rss_mb": process.memory_info().rss / 1048576,
+                "process_threads": process.num_threads(),
+                "loop_lag_ms": Metrics.event_loop_lag.value() * 1000,
+            }
+            if hasattr(process, "num_fds"):
+                values["process_open_fds"] = process.num_fds()
+        if hasattr(os, "getloadavg"):
+            values["load_1m"] = os.getloadavg()[0]
+        return values
+
+    @classmethod
+    def record(cls, timestamp: float, values: Dict[str, float]) -> None:
+        """Aggiunge un campione e chiude la finestra aggregata quando è piena"""
+        cls.samples.append(timestamp, values)
+        current = cls._current
+        if current.samples and timestamp - current.started >= SYSTEM_STATUS_WINDOW:
+            cls.windows.append(current.started, current.summary())
+            current.reset(timestamp)
+        if not current.samples:
+            current.started = timestamp
+        current.add(values)
+
+    @classmethod
+    def snapshot(cls, windows: int = SYSTEM_STATUS_WINDOWS, samples: int = 0) -> Dict[str, Any]:
+        """Ultimo campione, storia per finestre (min/avg/max) e opzionalmente gli ultimi campioni grezzi"""
+        latest = cls.samples.latest() or {}
+        sampled_at = latest.pop("timestamp", None)
+        history = cls.windows.tail(windows)
+        if cls._current.samples and windows > 0:
+            # La finestra in corso è parziale ma già aggregata: nessun ricalcolo
+            partial = cls._current.summary()
+            history["timestamp"].append(cls._current.started)
+            for name, value in partial.items():
+                history[name].append(value)
+            if len(history["timestamp"]) > windows:
+                history = {name: values[1:] for name, values in history.items()}
+
+        result = {
+            "interval_s": SYSTEM_STATUS_INTERVAL,
+            "sampled_at": sampled_at,
+            "age_s": round(time.time() - sampled_at, 3) if sampled_at is not None else None,
+            "latest": {name: _clean(value) for name, value in latest.items()},
+            "history": {
+                "window_s": SYSTEM_STATUS_WINDOW,
+                "window_start": history["timestamp"],
+                **{
+                    name: {
+                        stat: [_clean(value) for value in history[f"{name}_{stat}"]]
+                        for stat in ("min", "avg", "max")
+                    }
+                    for name in FIELDS
+                },
+            },
+        }
+        if samples > 0:
+            raw = cls.samples.tail(samples)
+            result["samples"] = {name: [_clean(value) for value in values] for name, values in raw.items()}
+        return result
+
+
+def _clean(value: float) -> float | None:
+    """NaN (metrica non disponibile) diventa null nel JSON, il resto viene arrotondato"""
+    return None if math.isnan(value) or math.isinf(value) else round(value, 3)
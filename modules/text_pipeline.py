@@ -0,0 +1,198 @@
+"""
+Text Pipeline Module
+Catena di trasformazioni di testo applicate in un solo passaggio, a pezzi, senza materializzare l'output
+"""
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Iterable, Iterator
+
+# Operazioni massime in una catena di format_text
+TEXT_PIPELINE_MAX_OPS = int(os.getenv("TEXT_PIPELINE_MAX_OPS", 16))
+
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def _is_cased(char: str) -> bool:
+    """Carattere con maiuscola/minuscola, come inteso da str.title()"""
+    return char.isupper() or char.islower() or char.istitle()
+
+
+class TextStage(ABC):
+    """
+    Trasformazione incrementale: feed() riceve un pezzo e restituisce l'output
+    disponibile, flush() l'eventuale residuo a fine testo.
+    Lo stato tra un pezzo e l'altro rende il risultato identico a quello sul testo intero.
+    """
+
+    done = False
+
+    @abstractmethod
+    def feed(self, chunk: str) -> str:
+        pass
+
+    def flush(self) -> str:
+        return ""
+
+
+class Uppercase(TextStage):
+    def feed(self, chunk: str) -> str:
+        return chunk.upper()
+
+
+class Lowercase(TextStage):
+    def feed(self, chunk: str) -> str:
+        return chunk.lower()
+
+
+class Title(TextStage):
+    """str.title(): una parola prosegue nel pezzo successivo se l'ultimo carattere è "cased" """
+
+    def __init__(self):
+        self.in_word = False
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return chunk
+        head = 0
+        if self.in_word:
+            while head < len(chunk) and _is_cased(chunk[head]):
+                head += 1
+        self.in_word = _is_cased(chunk[-1])
+        return chunk[:head].lower() + chunk[head:].title()
+
+
+class Capitalize(TextStage):
+    """str.capitalize(): solo il primo carattere del testo resta maiuscolo"""
+
+    def __init__(self):
+        self.started = False
+
+    def feed(self, chunk: str) -> str:
+        if self.started or not chunk:
+            return chunk.lower()
+        self.started = True
+        return chunk.capitalize()
+
+
+class Trim(TextStage):
+    """str.strip(): lo spazio finale di un pezzo viene trattenuto finché non segue altro testo"""
+
+    def __init__(self):
+        self.started = False
+        self.pending = ""
+
+    def feed(self, chunk: str) -> str:
+        if not self.started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ""
+            self.started = True
+        body = chunk.rstrip()
+        if not body:
+            self.pending += chunk
+            return ""
+        output = self.pending + body
+        self.pending = chunk[len(body):]
+        return output
+
+
+class NormalizeWhitespace(TextStage):
+    """Sostituisce ogni sequenza di spazi, tab e a capo con un singolo spazio"""
+
+    def __init__(self):
+        self.after_space = False
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return chunk
+        output = _WHITESPACE_RUN.sub(" ", chunk)
+        if self.after_space and output.startswith(" "):
+            output = output[1:]
+        self.after_space = chunk[-1].isspace()
+        return output
+
+
+class Truncate(TextStage):
+    """Tronca a length caratteri; una volta raggiunto il limite la catena smette di leggere"""
+
+    def __init__(self, length: int):
+        self.remaining = length
+        self.done = length == 0
+
+    def feed(self, chunk: str) -> str:
+        output = chunk[:self.remaining]
+        self.remaining -= len(output)
+        self.done = self.remaining == 0
+        return output
+
+
+class TextPipeline:
+    """Catena di TextStage costruita dalla specifica di format_text"""
+
+    OPERATIONS = {
+        "uppercase": Uppercase,
+        "lowercase": Lowercase,
+        "title": Title,
+        "capitalize": Capitalize,
+        "trim": Trim,
+        "normalize_whitespace": NormalizeWhitespace,
+        "truncate": Truncate,
+    }
+
+    def __init__(self, stages: List[TextStage], names: List[str]):
+        self.stages = stages
+        self.names = names
+
+    @classmethod
+    def parse(cls, operations: List[Any]) -> "TextPipeline":
+        """
+        Costruisce la catena da una lista di nomi ("trim") od oggetti
+        ({"op": "truncate", "length": 80}); solleva ValueError se non valida
+        """
+        if not isinstance(operations, list) or not operations:
+            raise ValueError("operations must be a non-empty list")
+        if len(operations) > TEXT_PIPELINE_MAX_OPS:
+            raise ValueError(f"Too many operations (max {TEXT_PIPELINE_MAX_OPS})")
+
+        stages = []
+        names = []
+        for item in operations:
+            spec = {"op": item} if isinstance(item, str) else item
+            name = spec.get("op") if isinstance(spec, dict) else None
+            if name not in cls.OPERATIONS:
+                raise ValueError(f"Unknown operation {name!r}. Available: {list(cls.OPERATIONS)}")
+            if name == "truncate":
+                length = spec.get("length")
+                if not isinstance(length, int) or isinstance(length, bool) or length < 0:
+                    raise ValueError("truncate requires a non-negative integer 'length'")
+                stages.append(Truncate(length))
+                names.append(f"truncate {length}")
+            else:
+                stages.append(cls.OPERATIONS[name]())
+                names.append(name)
+        return cls(stages, names)
+
+    def run(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Applica tutte le trasformazioni a ogni pezzo, in ordine, in un solo passaggio"""
+        for chunk in chunks:
+            for stage in self.stages:
+                chunk = stage.feed(chunk)
+            if chunk:
+                yield chunk
+            if any(stage.done for stage in self.stages):
+                # Un troncamento ha raggiunto il limite: il resto del testo non serve
+                break
+
+        # Il residuo di ogni stadio passa attraverso quelli successivi
+        for index, stage in enumerate(self.stages):
+            tail = stage.flush()
+            for later in self.stages[index + 1:]:
+                tail = later.feed(tail)
+            if tail:
+                yield tail
+
+    @staticmethod
+    def chunks(text: str, size: int) -> Iterator[str]:
+        for start in range(0, len(text), size):
+            yield text[start:start + size]
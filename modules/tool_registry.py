@@ -0,0 +1,105 @@
+"""
+Tool Registry Module
+Registro centrale dei tool MCP: nome, schema, natura sync/async e hint di esecuzione
+"""
+import inspect
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List
+
+
+@dataclass
+class ToolSpec:
+    """Descrizione completa di un tool registrato"""
+    name: str
+    description: str
+    handler: Callable[[Dict[str, Any]], Any]
+    input_schema: Dict[str, Any]
+    is_async: bool
+    hints: Dict[str, Any] = field(default_factory=dict)
+    # Handler generatore (sync o async) di pezzi di testo inviati in streaming
+    is_streaming: bool = False
+    # Funzione eseguita nei worker del pool per i tool cpu_bound (default: handler).
+    # Deve stare in un modulo leggero: il worker importa solo quello
+    process_handler: Callable[[Dict[str, Any]], Any] | None = None
+
+    def to_mcp(self) -> Dict[str, Any]:
+        """Rappresentazione del tool nella risposta di tools/list"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": self.input_schema
+        }
+
+
+class ToolRegistry:
+    """
+    Registro dei tool con dispatch O(1) per nome.
+    tools/list, la pagina /tools ed execute_tool_async leggono tutti da qui.
+    """
+
+    _tools: Dict[str, ToolSpec] = {}
+    _listeners: List[Callable[[], Any]] = []
+
+    @classmethod
+    def tool(
+        cls,
+        name: str,
+        description: str,
+        input_schema: Dict[str, Any] | None = None,
+        process_handler: Callable[[Dict[str, Any]], Any] | None = None,
+        **hints
+    ):
+        """
+        Decoratore che registra una funzione come tool MCP.
+        Gli hint (es. read_only, open_world) descrivono come va eseguito;
+        dedupe=True rende il tool deduplicabile anche senza chiave del client (MCP_IDEMPOTENCY=auto).
+        Un generatore di stringhe diventa un tool con output in streaming.
+        process_handler è la variante dell'handler eseguita nel pool di processi (cpu_bound=True).
+        """
+        def decorator(func: Callable) -> Callable:
+            cls.register(ToolSpec(
+                name=name,
+                description=description,
+                handler=func,
+                input_schema=input_schema or {"type": "object", "properties": {}},
+                is_async=inspect.iscoroutinefunction(func),
+                hints=hints,
+                is_streaming=inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func),
+                process_handler=process_handler
+            ))
+            return func
+        return decorator
+
+    @classmethod
+    def register(cls, spec: ToolSpec) -> None:
+        """Registra (o sostituisce) un tool e notifica i listener"""
+        cls._tools[spec.name] = spec
+        cls._notify()
+
+    @classmethod
+    def unregister(cls, name: str) -> None:
+        """Rimuove un tool e notifica i listener"""
+        if cls._tools.pop(name, None) is not None:
+            cls._notify()
+
+    @classmethod
+    def get(cls, name: str) -> ToolSpec | None:
+        return cls._tools.get(name)
+
+    @classmethod
+    def specs(cls) -> List[ToolSpec]:
+        return list(cls._tools.values())
+
+    @classmethod
+    def list_tools(cls) -> List[Dict[str, Any]]:
+        return [spec.to_mcp() for spec in cls._tools.values()]
+
+    @classmethod
+    def on_change(cls, listener: Callable[[], Any]) -> None:
+        """Registra una callback invocata a ogni modifica del set di tools"""
+        cls._listeners.append(listener)
+
+    @classmethod
+    def _notify(cls) -> None:
+        for listener in cls._listeners:
+            listener()
@@ -0,0 +1,129 @@
+"""
+TTL Cache Module
+Cache LRU con scadenza, stale-while-revalidate e coalescing delle richieste identiche
+"""
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    Cache asincrona con:
+    - TTL: entro ttl secondi il valore è fresco e viene restituito subito
+    - stale-while-revalidate: fino a ttl + stale_ttl il valore vecchio viene
+      restituito subito mentre un refresh parte in background
+    - singleflight: caricamenti concorrenti della stessa chiave condividono
+      un'unica esecuzione del loader
+    - dimensione massima con eviction LRU
+    - opzionale: tabella di stato (condivisa tra i worker o persistente su SQLite,
+      chiavi stringa, valori JSON) consultata da get_or_load quando la chiave manca
+      in locale (con aget, senza bloccare l'event loop) e aggiornata a ogni set
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float = 0.0, shared: Any = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self._entries: OrderedDict[Hashable, Tuple[Any, float]] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Tuple[Any, float] | None:
+        """Restituisce (valore, età in secondi) se la chiave è presente in locale e non scaduta del tutto"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return self._check(key, entry)
+
+    def _check(self, key: Hashable, entry: Tuple[Any, float]) -> Tuple[Any, float] | None:
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, age
+
+    async def _get_shared(self, key: Hashable) -> Tuple[Any, float] | None:
+        """Valore scritto da un altro worker (o prima di un riavvio), copiato in locale con la sua età"""
+        if self.shared is None:
+            return None
+        hit = await self.shared.aget(key)
+        if hit is None:
+            return None
+        value, written = hit
+        entry = self._entries[key] = (value, time.monotonic() - max(0.0, time.time() - written))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return self._check(key, entry) if key in self._entries else None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if self.shared is not None:
+            self.shared.put(key, value, self.ttl + self.stale_ttl)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] | None = None,
+        fresh: bool = False
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Restituisce (valore, info) dove info contiene cached, age, stale e coalesced.
+        Con fresh=True ignora il valore in cache ma partecipa comunque al singleflight.
+        """
+        if not fresh:
+            hit = self.get(key)
+            if hit is None and key not in self._inflight:
+                hit = await self._get_shared(key)
+            if hit is not None:
+                value, age = hit
+                stale = age > self.ttl
+                if stale and key not in self._inflight:
+                    # Valore scaduto ma ancora servibile: lo aggiorna in background
+                    self._start_load(key, loader, should_cache)
+                return value, {"cached": True, "age": age, "stale": stale, "coalesced": False}
+
+        coalesced = key in self._inflight
+        task = self._inflight.get(key) or self._start_load(key, loader, should_cache)
+        # shield: se il chiamante viene cancellato, il caricamento condiviso prosegue
+        value = await asyncio.shield(task)
+        return value, {"cached": False, "age": 0.0, "stale": False, "coalesced": coalesced}
+
+    def _start_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] | None
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if finished.cancelled() or finished.exception() is not None:
+                return
+            value = finished.result()
+            if should_cache is None or should_cache(value):
+                self.set(key, value)
+
+        task.add_done_callback(done)
+        return task
@@ -2,19 +2,42 @@
 MCP Routes Module
 Contiene gli endpoint API per il protocollo MCP
 """
+import os
+import time
+import asyncio
+import inspect
 from fastapi import HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 try:
     # Try absolute import first (for when running as a module)
     from modules.mcp_methods import MCPMethods
+    from modules.structured_logging import StructuredLogger, StructuredLogging
+    from modules.metrics import Metrics
+    from modules.codec import MCPCodec, MCPError, INVALID_REQUEST
 except ImportError:
     # Fall back to relative import (for development)
     from ..modules.mcp_methods import MCPMethods
+    from ..modules.structured_logging import StructuredLogger, StructuredLogging
+    from ..modules.metrics import Metrics
+    from ..modules.codec import MCPCodec, MCPError, INVALID_REQUEST
+
+# Numero massimo di richieste di un batch JSON-RPC eseguite in parallelo
+MCP_BATCH_CONCURRENCY = int(os.getenv("MCP_BATCH_CONCURRENCY", 8))
+
+logger = StructuredLogger("mcp.routes")
 
 
 class MCPRoutes:
     """Classe per gestire le routes MCP"""
+
+    # Dispatch dei metodi JSON-RPC: handler(msg_id, params)
+    METHOD_HANDLERS = {
+        "initialize": lambda msg_id, params: MCPMethods.handle_initialize(msg_id),
+        "tools/list": lambda msg_id, params: MCPMethods.handle_tools_list(msg_id),
+        "tools/call": lambda msg_id, params: MCPMethods.handle_tools_call(msg_id, params),
+        "notifications/initialized": lambda msg_id, params: MCPMethods.handle_initialized_notification(msg_id),
+    }
     
     @staticmethod
     async def handle_mcp_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -22,42 +45,91 @@ class MCPRoutes:
         Gestisce le richieste MCP over HTTP
         Compatibile con il client HTTP ufficiale di Anthropic
         """
+        invalid = MCPCodec.validate_envelope(request_data)
+        if invalid is not None:
+            msg_id = MCPCodec.request_id(request_data)
+            Metrics.requests_total.inc("invalid")
+            Metrics.request_errors_total.inc("invalid")
+            return MCPCodec.error(msg_id, INVALID_REQUEST, f"Invalid Request: {invalid}")
+
+        started = time.perf_counter()
+        StructuredLogging.new_request_id()
+        method = request_data.get("method")
+        msg_id = request_data.get("id")
+        # Label limitata ai metodi noti per non far crescere le serie all'infinito
+        method_label = method if method in MCPRoutes.METHOD_HANDLERS else "unknown"
+        Metrics.requests_in_flight.inc()
+
         try:
-            method = request_data.get("method")
-            msg_id = request_data.get("id")
-            
-            print(f"MCP Request: {method} (ID: {msg_id})")
+            logger.debug("mcp_request", method=method, id=msg_id)
             
-            if method == "initialize":
-                response = MCPMethods.handle_initialize(msg_id)
-                
-            elif method == "tools/list":
-                response = MCPMethods.handle_tools_list(msg_id)
-                
-            elif method == "tools/call":
-                params = request_data.get("params", {})
-                response = MCPMethods.handle_tools_call(msg_id, params)
-                
-            elif method == "notifications/initialized":
-                response = MCPMethods.handle_initialized_notification(msg_id)
-                
-            else:
+            handler = MCPRoutes.METHOD_HANDLERS.get(method)
+            if handler is None:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unsupported MCP method: {method}"
                 )
+
+            response = handler(msg_id, request_data.get("params", {}))
+            if inspect.isawaitable(response):
+                response = await response
             
-            print(f"MCP Response: {method} -> Success")
-            return response
+            logger.info("mcp_response", method=method, id=msg_id, duration_ms=logger.elapsed_ms(started))
             
+        except MCPError as e:
+            logger.warning(
+                "mcp_error", method=method, id=msg_id, code=e.code, error=e.message,
+                duration_ms=logger.elapsed_ms(started)
+            )
+            response = MCPCodec.error(msg_id, e.code, e.message)
+
         except Exception as e:
-            print(f"MCP Error: {e}")
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "error": {
-                    "code": -32000,
-                    "message": str(e)
-                }
-            }
-            return error_response
\ No newline at end of file
+            logger.warning(
+                "mcp_error", method=method, id=msg_id, error=str(e),
+                duration_ms=logger.elapsed_ms(started)
+            )
+            response = MCPCodec.error(msg_id, -32000, str(e))
+
+        finally:
+            Metrics.requests_in_flight.dec()
+
+        Metrics.requests_total.inc(method_label)
+        Metrics.request_duration.observe(time.perf_counter() - started, method_label)
+        if "error" in response:
+            Metrics.request_errors_total.inc(method_label)
+        return response
+
+    @staticmethod
+    def is_notification(request_data: Dict[str, Any]) -> bool:
+        """
+        Una notifica JSON-RPC non ha id e non prevede risposta. Conta solo l'id, non il nome del metodo:
+        una richiesta "notifications/..." con id riceve la sua risposta (o il suo errore)
+        """
+        if not isinstance(request_data, dict) or not isinstance(request_data.get("method"), str):
+            # Voce non valida: riceve comunque una risposta di errore
+            return False
+        return request_data.get("id") is None
+
+    @staticmethod
+    async def handle_batch_request(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]] | Dict[str, Any]:
+        """
+        Gestisce un batch JSON-RPC 2.0
+        Le richieste vengono eseguite in parallelo (fino a MCP_BATCH_CONCURRENCY),
+        le risposte mantengono l'ordine del batch e le notifiche vengono omesse
+        """
+        if not batch:
+            return MCPCodec.error(None, INVALID_REQUEST, "Invalid Request: empty batch")
+
+        semaphore = asyncio.Semaphore(MCP_BATCH_CONCURRENCY)
+
+        async def run_one(request_data: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await MCPRoutes.handle_mcp_request(request_data)
+
+        responses = await asyncio.gather(*(run_one(entry) for entry in batch))
+
+        return [
+            response
+            for entry, response in zip(batch, responses)
+            if not MCPRoutes.is_notification(entry)
+        ]
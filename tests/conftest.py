@@ -0,0 +1,7 @@
+"""
+Configurazione pytest: la radice del repository nel path, come quando il server gira da /app
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
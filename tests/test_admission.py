@@ -0,0 +1,129 @@
+"""
+Test di AdmissionMiddleware: rate limit per indirizzo e sessione, load shedding e identità del client
+"""
+import json
+import time
+import asyncio
+
+import pytest
+
+from modules import admission
+from modules.admission import AdmissionMiddleware, admitted_path, client_key
+from modules.codec import RATE_LIMITED, SERVER_OVERLOADED
+from modules.sessions import Session, SessionStore
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    # Ricarica trascurabile: ogni token speso resta speso per tutta la durata del test
+    monkeypatch.setattr(admission, "ADMISSION_RATE", 0.001)
+    monkeypatch.setattr(admission, "ADMISSION_BURST", 3)
+    monkeypatch.setattr(admission, "ADMISSION_IP_RATE", 0.001)
+    monkeypatch.setattr(admission, "ADMISSION_IP_BURST", 3)
+    monkeypatch.setattr(SessionStore, "_sessions", type(SessionStore._sessions)())
+
+
+def session(session_id: str) -> Session:
+    now = time.monotonic()
+    SessionStore._store(Session(session_id=session_id, created=now, last_seen=now))
+    return SessionStore._sessions[session_id]
+
+
+async def call(middleware, method="POST", path="/mcp", session_id=None, client="10.0.0.1"):
+    headers = [(b"mcp-session-id", session_id.encode())] if session_id else []
+    scope = {"type": "http", "method": method, "path": path, "headers": headers, "client": (client, 1234)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def statuses(middleware, requests):
+    async def main():
+        return [(await call(middleware, **request))[0] for request in requests]
+    return asyncio.run(main())
+
+
+def test_admitted_paths():
+    paths = ("/mcp",)
+    assert admitted_path("/mcp", paths) and admitted_path("/mcp/stream", paths)
+    assert not admitted_path("/mcpX", paths)
+    assert not admitted_path("/health", paths)
+
+
+def test_rate_limit_answers_429_with_retry_after():
+    middleware = AdmissionMiddleware(ok_app)
+
+    async def main():
+        return [await call(middleware) for _ in range(4)], await call(middleware, path="/mcpX")
+
+    responses, unrelated = asyncio.run(main())
+    assert [status for status, _, _ in responses] == [200, 200, 200, 429]
+    status, headers, body = responses[-1]
+    assert int(headers[b"retry-after"]) >= 1
+    assert json.loads(body)["error"]["code"] == RATE_LIMITED
+    assert unrelated[0] == 200
+
+
+def test_overload_answers_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_IN_FLIGHT", 1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await gate.wait()
+            await ok_app(scope, receive, send)
+
+        middleware = AdmissionMiddleware(slow_app)
+        first = asyncio.ensure_future(call(middleware, client="10.0.0.1"))
+        await asyncio.sleep(0)
+        rejected = await call(middleware, client="10.0.0.2")
+        gate.set()
+        return (await first)[0], rejected
+
+    first, (status, headers, body) = asyncio.run(main())
+    assert first == 200
+    assert status == 503
+    assert headers[b"retry-after"] == str(admission.ADMISSION_RETRY_AFTER).encode()
+    assert json.loads(body)["error"]["code"] == SERVER_OVERLOADED
+
+
+def test_new_session_gets_no_fresh_burst():
+    middleware = AdmissionMiddleware(ok_app)
+    session("a")
+    session("b")
+    requests = [{"session_id": "a"}] * 3 + [{"session_id": "b"}]
+    assert statuses(middleware, requests) == [200, 200, 200, 429]
+
+
+def test_session_rejection_refunds_the_address_token(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_BURST", 1)
+    middleware = AdmissionMiddleware(ok_app)
+    session("a")
+    # La seconda richiesta è respinta dalla sessione: l'indirizzo riprende il token e ne conserva due
+    requests = [{"session_id": "a"}, {"session_id": "a"}, {}, {}, {}]
+    assert statuses(middleware, requests) == [200, 429, 200, 200, 429]
+
+
+def test_client_key_trusted_proxy_modes():
+    scope = {"client": ("10.0.0.9", 5555)}
+    headers = {b"fly-client-ip": b"1.1.1.1", b"x-forwarded-for": b"6.6.6.6, 2.2.2.2"}
+    assert client_key(scope, headers, "") == "10.0.0.9"
+    assert client_key(scope, headers, "fly") == "1.1.1.1"
+    assert client_key(scope, headers, "xff") == "2.2.2.2"
+    assert client_key(scope, {}, "fly") == "10.0.0.9"
+    assert client_key({}, {}, "") == "unknown"
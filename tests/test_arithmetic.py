@@ -0,0 +1,97 @@
+"""
+Test di ArithmeticEngine: input rifiutati dai limiti di costo e casi limite validi
+"""
+import pytest
+
+from modules import arithmetic
+from modules.arithmetic import ArithmeticEngine, ExpressionError, ARITH_MAX_BITS, ARITH_MAX_LENGTH, ARITH_MAX_NODES
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("9**9**9**9", "Result too large"),
+    ("2**5000", "Result too large"),
+    ("(2**4000)*(2**4000)", "Result too large"),
+    ("(-8)**0.5", "Complex results"),
+    ("10.0**400", "out of range"),
+    ("1" * (ARITH_MAX_LENGTH + 1), "too long"),
+    ("+".join(["1"] * (ARITH_MAX_NODES // 2 + 1)), "too complex"),
+    ("-" * (ARITH_MAX_NODES + 1) + "1", "too complex"),
+    ("(" * 250 + "1" + ")" * 250, "Invalid expression"),
+    ("", "Empty expression"),
+    ("1 +", "Invalid expression"),
+    ("abs(-1)", "Unsupported syntax"),
+    ("(1).__class__", "Unsupported syntax"),
+    ("[1, 2]", "Unsupported syntax"),
+    ("'a' * 3", "Unsupported constant"),
+    ("True + 1", "Unsupported constant"),
+    ("1j * 2", "Unsupported constant"),
+    ("1 < 2", "Unsupported syntax"),
+])
+def test_rejected_expressions(expression, message):
+    with pytest.raises(ExpressionError, match=message):
+        ArithmeticEngine.evaluate(expression)
+
+
+def test_rejected_operands(monkeypatch):
+    # Un letterale oltre ARITH_MAX_BITS supera anche la lunghezza massima: la si alza per isolare il controllo sui bit
+    monkeypatch.setattr(arithmetic, "ARITH_MAX_LENGTH", 10 * ARITH_MAX_LENGTH)
+    with pytest.raises(ExpressionError, match="Operand too large"):
+        ArithmeticEngine.evaluate(str(2 ** (ARITH_MAX_BITS + 1)))
+    with pytest.raises(ExpressionError, match="Operand too large"):
+        ArithmeticEngine.evaluate("x + 1", {"x": 2 ** (ARITH_MAX_BITS + 1)})
+    with pytest.raises(ExpressionError, match="not a number"):
+        ArithmeticEngine.evaluate("x + 1", {"x": "1"})
+    with pytest.raises(ExpressionError, match="not a number"):
+        ArithmeticEngine.evaluate("x + 1", {"x": True})
+    with pytest.raises(ExpressionError, match="Missing value"):
+        ArithmeticEngine.evaluate("x + y", {"x": 1})
+
+
+def test_time_budget(monkeypatch):
+    monkeypatch.setattr(arithmetic, "ARITH_TIME_BUDGET", -1.0)
+    with pytest.raises(ExpressionError, match="time budget"):
+        ArithmeticEngine.evaluate("x * 2 + 1", {"x": 3})
+
+
+def test_division_by_zero_is_not_hidden():
+    with pytest.raises(ZeroDivisionError):
+        ArithmeticEngine.evaluate("1 / 0")
+    with pytest.raises(ZeroDivisionError):
+        ArithmeticEngine.evaluate("0 ** -1")
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2+2", 4),
+    ("(3+4)/2", 3.5),
+    ("7 // 2", 3),
+    ("-7 // 2", -4),
+    ("-7 % 3", 2),
+    ("7 % -3", -2),
+    ("2 ** -1", 0.5),
+    ("(-8) ** 3", -512),
+    ("(-1) ** 100000001", -1),
+    ("0 ** 0", 1),
+    ("1 ** 9999999999", 1),
+    ("2 ** 4096", 2 ** 4096),
+    ("(2**2047) * (2**2048)", 2 ** 4095),
+    ("-2 ** 2", -4),
+    ("+-+3", -3),
+    ("1e308 * 1", 1e308),
+    ("0.1 + 0.2", 0.1 + 0.2),
+    ("  10 * 5  ", 50),
+])
+def test_valid_expressions(expression, expected):
+    result = ArithmeticEngine.evaluate(expression)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_variables_and_compile_cache():
+    compiled = ArithmeticEngine.compile("x * y + 1")
+    assert compiled.variables == frozenset({"x", "y"})
+    assert compiled.evaluate({"x": 3, "y": 4}) == 13
+    assert compiled.evaluate({"x": 0.5, "y": 4}) == 3.0
+    assert ArithmeticEngine.compile("x * y + 1") is compiled
+    # Un nome che sembra una funzione resta una semplice variabile non legata
+    with pytest.raises(ExpressionError, match="Missing value"):
+        ArithmeticEngine.evaluate("__import__")
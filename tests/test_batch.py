@@ -0,0 +1,57 @@
+"""
+Test dei batch JSON-RPC: ordine delle risposte, notifiche e batch vuoti o non validi
+"""
+import asyncio
+
+import httpx
+
+from main import app
+from modules.codec import INVALID_REQUEST
+from routes.mcp_routes import MCPRoutes
+
+
+def post(payload):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/mcp", json=payload)
+
+    return asyncio.run(main())
+
+
+def test_responses_follow_batch_order():
+    batch = [
+        {"jsonrpc": "2.0", "id": "list", "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 7, "method": "unknown/method"},
+        {"jsonrpc": "2.0", "id": "init", "method": "initialize", "params": {}},
+    ]
+    responses = asyncio.run(MCPRoutes.handle_batch_request(batch))
+    assert [r["id"] for r in responses] == ["list", 7, "init"]
+    assert "error" in responses[1] and "result" in responses[2]
+
+
+def test_only_entries_without_id_are_notifications():
+    batch = [
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 1, "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    ]
+    responses = asyncio.run(MCPRoutes.handle_batch_request(batch))
+    assert [r["id"] for r in responses] == [1, 2]
+
+
+def test_notification_only_batch_is_accepted_without_body():
+    response = post([{"jsonrpc": "2.0", "method": "notifications/initialized"}])
+    assert response.status_code == 202
+    assert response.content == b""
+
+
+def test_empty_and_invalid_batches():
+    empty = post([]).json()
+    assert empty["id"] is None and empty["error"]["code"] == INVALID_REQUEST
+
+    invalid = post([1, {"jsonrpc": "2.0", "method": 5}, {"jsonrpc": "2.0", "id": 3, "method": "tools/list"}]).json()
+    assert [r["id"] for r in invalid] == [None, None, 3]
+    assert [r["error"]["code"] for r in invalid[:2]] == [INVALID_REQUEST, INVALID_REQUEST]
+    assert "result" in invalid[2]
@@ -0,0 +1,93 @@
+"""
+Test di BulkEvaluator: il percorso vettorizzato deve dare gli stessi risultati della valutazione scalare
+"""
+import math
+import random
+
+import pytest
+
+from modules.arithmetic import ArithmeticEngine, BulkEvaluator, ARITH_VECTOR_MIN_ROWS
+
+OPERATORS = ["+", "-", "*", "/", "//", "%", "**"]
+
+
+def random_shape(rng, depth):
+    """Struttura casuale: None è una foglia, altrimenti (operatore, sinistra, destra)"""
+    if depth == 0 or rng.random() < 0.3:
+        return None
+    return rng.choice(OPERATORS), random_shape(rng, depth - 1), random_shape(rng, depth - 1)
+
+
+def random_number(rng):
+    if rng.random() < 0.5:
+        return str(rng.randint(-50, 50))
+    return repr(round(rng.uniform(-50, 50), 3))
+
+
+def fill(rng, shape):
+    """Espressione con la struttura data e costanti casuali (esponenti piccoli o float fino a 45)"""
+    if shape is None:
+        return random_number(rng)
+    op, left, right = shape
+    if op == "**" and right is None:
+        exponent = str(rng.randint(-3, 3)) if rng.random() < 0.5 else repr(round(rng.uniform(0, 45), 3))
+        return f"({fill(rng, left)}**{exponent})"
+    return f"({fill(rng, left)}{op}{fill(rng, right)})"
+
+
+def scalar(expression):
+    try:
+        return {"result": ArithmeticEngine.evaluate(expression)}
+    except (ArithmeticError, ValueError) as e:
+        return {"error": str(e)}
+
+
+def assert_same(expression, bulk, expected):
+    assert ("error" in bulk) == ("error" in expected), (expression, bulk, expected)
+    if "error" in expected:
+        return
+    got, want = bulk["result"], expected["result"]
+    assert type(got) is type(want), (expression, got, want)
+    if isinstance(want, float):
+        assert math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-9), (expression, got, want)
+    else:
+        assert got == want, (expression, got, want)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bulk_matches_scalar(seed):
+    rng = random.Random(seed)
+    expressions = []
+    for _ in range(60):
+        shape = random_shape(rng, 3)
+        # Righe sufficienti per struttura, così ogni gruppo passa dal percorso vettorizzato
+        expressions += [fill(rng, shape) for _ in range(4 * ARITH_VECTOR_MIN_ROWS)]
+    for expression, bulk in zip(expressions, BulkEvaluator.evaluate_expressions(expressions)):
+        assert_same(expression, bulk, scalar(expression))
+
+
+def test_float_pow_feeding_modulo():
+    # np.power e ** differiscono di un ulp su 19**42.581: dopo % il vettorizzato dava -14.259
+    rng = random.Random(0)
+    expressions = ["(((19**42.581)%(27.022/35.259))-15)"]
+    expressions += [
+        f"((({rng.randint(2, 50)}**{rng.uniform(20, 45):.3f})%({rng.uniform(1, 50):.3f}))//1.5)"
+        for _ in range(500)
+    ]
+    for expression, bulk in zip(expressions, BulkEvaluator.evaluate_expressions(expressions)):
+        assert_same(expression, bulk, scalar(expression))
+
+
+def test_formula_matches_scalar():
+    rng = random.Random(1)
+    formula = "(a ** b) % c + a // (c - 3)"
+    bindings = [
+        {"a": rng.choice([rng.randint(-20, 20), rng.uniform(-20, 20)]), "b": rng.randint(0, 12), "c": rng.randint(1, 6)}
+        for _ in range(500)
+    ]
+    for row, bulk in zip(bindings, BulkEvaluator.evaluate_formula(formula, bindings)):
+        try:
+            expected = {"result": ArithmeticEngine.evaluate(formula, row)}
+        except (ArithmeticError, ValueError) as e:
+            expected = {"error": str(e)}
+        assert_same(row, bulk, expected)
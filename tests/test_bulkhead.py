@@ -0,0 +1,83 @@
+"""
+Test di ToolBulkheads: coda limitata, deadline della chiamata e timeout sollevati dal tool
+"""
+import asyncio
+
+import pytest
+
+from modules.bulkhead import ToolBulkheads
+from modules.codec import MCPError, INVALID_PARAMS, REQUEST_TIMEOUT, SERVER_OVERLOADED
+from modules.tool_registry import ToolSpec
+
+
+@pytest.fixture(autouse=True)
+def fresh_bulkheads(monkeypatch):
+    # Ogni Bulkhead contiene un semaforo legato all'event loop del test
+    monkeypatch.setattr(ToolBulkheads, "_bulkheads", {})
+
+
+def spec(**hints) -> ToolSpec:
+    return ToolSpec("slow", "test tool", lambda arguments: None, {}, True, hints)
+
+
+def test_queue_limit_rejects_immediately():
+    tool = spec(max_concurrency=1, max_queue=1, timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def factory(remaining):
+            await release.wait()
+            return "done"
+
+        running = asyncio.ensure_future(ToolBulkheads.run(tool, {}, factory))
+        queued = asyncio.ensure_future(ToolBulkheads.run(tool, {}, factory))
+        await asyncio.sleep(0)
+        with pytest.raises(MCPError) as rejected:
+            await ToolBulkheads.run(tool, {}, factory)
+        release.set()
+        return rejected.value, await running, await queued
+
+    rejected, running, queued = asyncio.run(main())
+    assert rejected.code == SERVER_OVERLOADED
+    assert (running, queued) == ("done", "done")
+
+
+def test_deadline_covers_the_queue_and_the_call():
+    tool = spec(max_concurrency=1, timeout=5)
+    remaining = []
+
+    async def factory(seconds):
+        remaining.append(seconds)
+        await asyncio.sleep(10)
+
+    async def main():
+        # Il client chiede una deadline più breve di quella del tool
+        params = {"_meta": {"timeout": 0.1}}
+        return await asyncio.gather(
+            ToolBulkheads.run(tool, params, factory), ToolBulkheads.run(tool, params, factory),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert [r.code for r in results] == [REQUEST_TIMEOUT, REQUEST_TIMEOUT]
+    # Il secondo è scaduto in coda, senza mai partire
+    assert len(remaining) == 1 and remaining[0] <= 0.1
+
+
+def test_tool_timeout_is_not_the_deadline():
+    async def factory(remaining):
+        raise TimeoutError("upstream did not answer")
+
+    async def main():
+        return await ToolBulkheads.run(spec(timeout=5), {}, factory)
+
+    with pytest.raises(TimeoutError, match="upstream"):
+        asyncio.run(main())
+
+
+def test_invalid_requested_timeout():
+    with pytest.raises(MCPError) as invalid:
+        ToolBulkheads.deadline(spec(), {"_meta": {"timeout": -1}})
+    assert invalid.value.code == INVALID_PARAMS
+    assert ToolBulkheads.deadline(spec(timeout=5), {"_meta": {"timeout": 60}}) == 5
@@ -0,0 +1,87 @@
+"""
+Test di ChunkedText e MCPCodec.iter_encode: output dei tool in streaming
+"""
+import json
+import asyncio
+import threading
+
+import pytest
+
+from modules import chunked_output
+from modules.chunked_output import ChunkedText
+from modules.codec import MCPCodec, ChunkedResponse
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Pezzi iniziali di pochi caratteri: anche output brevi passano dallo streaming
+    monkeypatch.setattr(chunked_output, "MCP_STREAM_CHUNK_SIZE", 2)
+
+
+async def encode(chunks) -> bytes:
+    return b"".join([part async for part in MCPCodec.iter_encode(ChunkedResponse(7, chunks))])
+
+
+def test_sync_generator_runs_off_the_event_loop():
+    threads = []
+
+    def source():
+        for part in ("a", "b", "c"):
+            threads.append(threading.get_ident())
+            yield part
+
+    async def main():
+        chunks = await ChunkedText.start(source())
+        return await encode(chunks)
+
+    body = json.loads(asyncio.run(main()))
+    assert body["result"]["content"][0]["text"] == "abc"
+    assert threading.get_ident() not in threads
+
+
+def test_error_mid_stream_closes_the_json():
+    finished = []
+
+    def source():
+        yield "first "
+        yield "second"
+        raise RuntimeError("disk gone")
+
+    async def main():
+        chunks = await ChunkedText.start(source())
+        chunks.on_finish = finished.append
+        return await encode(chunks)
+
+    body = json.loads(asyncio.run(main()))
+    assert body["id"] == 7
+    assert body["result"]["isError"] is True
+    text = body["result"]["content"][0]["text"]
+    assert text.startswith("first second")
+    assert "disk gone" in text
+    assert finished == [True]
+
+
+def test_output_cap_and_first_chunk_error():
+    async def main():
+        capped = await ChunkedText.start(iter(["x" * 6, "y" * 6]), max_chars=8)
+        error = await ChunkedText.start(iter(["Error: bad input", "never"]))
+        return await encode(capped), error
+
+    body, error = asyncio.run(main())
+    result = json.loads(body)["result"]
+    assert result["content"][0]["text"].startswith("x" * 6 + "yy\n[output truncated at 8")
+    assert "isError" not in result
+    assert error == "Error: bad input"
+
+
+def test_short_output_is_returned_whole(monkeypatch):
+    monkeypatch.setattr(chunked_output, "MCP_STREAM_CHUNK_SIZE", 64)
+
+    async def source():
+        yield "fits in "
+        yield "one response"
+
+    async def main():
+        return await ChunkedText.start(iter(["fits in ", "one response"])), await ChunkedText.start(source())
+
+    assert asyncio.run(main()) == ("fits in one response", "fits in one response")
@@ -0,0 +1,56 @@
+"""
+Test di CPUPool: timeout, riavvio del pool e deadline complessiva del retry
+"""
+import time
+import asyncio
+import multiprocessing
+
+import pytest
+
+from modules import cpu_pool
+from modules.cpu_pool import CPUPool, CPUPoolTimeout
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 2)
+    # Semaforo e executor sono legati all'event loop del test precedente
+    monkeypatch.setattr(CPUPool, "_slots", None)
+    monkeypatch.setattr(CPUPool, "_executor", None)
+    monkeypatch.setattr(CPUPool, "_pending", 0)
+
+
+async def timed(delay: float, timeout: float):
+    started = time.monotonic()
+    try:
+        await CPUPool.run(time.sleep, delay, timeout=timeout)
+        outcome = "ok"
+    except CPUPoolTimeout:
+        outcome = "timeout"
+    return outcome, time.monotonic() - started
+
+
+def test_restart_kills_only_the_pool_workers():
+    other = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(30,))
+    other.start()
+
+    async def main():
+        await CPUPool.startup()
+        try:
+            # La prima chiamata scade e uccide il pool; la seconda, interrotta a metà,
+            # viene ripetuta sul nuovo pool solo per il tempo che le resta
+            stuck, retried = await asyncio.gather(timed(10, 0.5), timed(0.8, 1.0))
+            after = await timed(0.01, 2)
+        finally:
+            await CPUPool.shutdown()
+        return stuck, retried, after
+
+    try:
+        stuck, retried, after = asyncio.run(main())
+        assert stuck[0] == "timeout" and stuck[1] < 1
+        assert retried[0] == "timeout" and retried[1] < 1.4
+        assert after[0] == "ok"
+        assert other.is_alive()
+    finally:
+        other.kill()
+        other.join()
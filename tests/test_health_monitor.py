@@ -0,0 +1,67 @@
+"""
+Test di SampleRing (storia dei probe) e delle statistiche di HealthMonitor.status dopo il giro del buffer
+"""
+import math
+import time
+
+import pytest
+
+from modules.health_monitor import HealthMonitor, MonitorTarget
+from modules.system_status import SampleRing
+
+FIELDS = ("elapsed", "status_code", "healthy")
+
+
+def probe(elapsed, healthy=True, status_code=200):
+    return {"elapsed": elapsed, "status_code": status_code, "healthy": 1.0 if healthy else 0.0}
+
+
+def test_ring_wraps_around_in_chronological_order():
+    ring = SampleRing(FIELDS, 4)
+    for n in range(10):
+        ring.append(float(n), probe(n / 10))
+    assert ring.count == 4
+    assert ring.latest()["timestamp"] == 9.0
+    tail = ring.tail(10)
+    assert tail["timestamp"] == [6.0, 7.0, 8.0, 9.0]
+    assert tail["elapsed"] == [0.6, 0.7, 0.8, 0.9]
+    assert ring.tail(2)["timestamp"] == [8.0, 9.0]
+
+
+def test_dump_and_load_keep_the_newest_samples():
+    source = SampleRing(FIELDS, 6)
+    for n in range(9):
+        source.append(float(n), {"elapsed": n / 10} if n % 2 else probe(n / 10))
+    smaller = SampleRing(FIELDS, 3)
+    smaller.load(source.dump())
+    tail = smaller.tail(3)
+    assert tail["timestamp"] == [6.0, 7.0, 8.0]
+    assert tail["elapsed"] == [0.6, 0.7, 0.8]
+    # I campi mancanti in un campione restano NaN anche dopo il ripristino
+    assert math.isnan(tail["status_code"][1]) and tail["status_code"][2] == 200
+
+
+@pytest.fixture
+def target(monkeypatch):
+    target = MonitorTarget("https://example.com", 60, 0, history=SampleRing(FIELDS, 5))
+    monkeypatch.setattr(HealthMonitor, "targets", {"example": target})
+    return target
+
+
+def test_status_over_a_wrapped_history(target):
+    now = time.time()
+    outcomes = [(0.5, False), (0.1, True), (0.2, True), (0.3, False), (0.4, True), (0.1, True), (0.3, True)]
+    for age, (elapsed, healthy) in zip(range(len(outcomes), 0, -1), outcomes):
+        target.history.append(now - age, probe(elapsed, healthy, 200 if healthy else 503))
+    target.history.append(now, {"elapsed": math.nan, "status_code": math.nan, "healthy": 0.0})
+
+    status = HealthMonitor.status("example", window=3600, samples=2)
+    # Restano gli ultimi 5 probe: 0.3 (503), 0.4, 0.1, 0.3 e un errore di rete
+    assert status["probes"] == 5
+    assert status["uptime_percent"] == 60.0
+    assert status["errors"] == 1
+    assert status["latency_ms"]["min"] == 100.0 and status["latency_ms"]["max"] == 400.0
+    assert [s["elapsed_ms"] for s in status["samples"]] == [300.0, None]
+
+    recent = HealthMonitor.status("example", window=2.5)
+    assert recent["probes"] == 3
@@ -0,0 +1,72 @@
+"""
+Test di Idempotency: duplicati in corso, conflitti di argomenti e risultati troppo grandi per la memoria condivisa
+"""
+import asyncio
+
+import pytest
+
+from modules.codec import MCPError, IDEMPOTENCY_CONFLICT
+from modules.idempotency import Idempotency
+from modules.shared_memory import SharedTable
+from modules.ttl_cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_results(monkeypatch, tmp_path):
+    table = SharedTable(str(tmp_path / "idempotency.table"), slots=16, slot_size=256)
+    monkeypatch.setattr(Idempotency, "results", TTLCache(10, 60, 0.0, table))
+    monkeypatch.setattr(Idempotency, "_running", {})
+    monkeypatch.setattr(Idempotency.unshared_total, "_values", {})
+    return table
+
+
+def test_inflight_duplicate_joins_the_first_call():
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        return await asyncio.gather(
+            Idempotency.run("k", "tool", {"a": 1}, execute),
+            Idempotency.run("k", "tool", {"a": 1}, execute),
+        )
+
+    first, second = asyncio.run(main())
+    assert first == ("done", False)
+    assert second == ("done", True)
+    assert calls == [1]
+
+
+def test_conflicting_duplicate_fails_without_waiting():
+    async def execute():
+        await asyncio.sleep(1)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(Idempotency.run("k", "tool", {"a": 1}, execute))
+        await asyncio.sleep(0)
+        try:
+            async with asyncio.timeout(0.2):
+                with pytest.raises(MCPError) as conflict:
+                    await Idempotency.run("k", "tool", {"a": 2}, execute)
+        finally:
+            first.cancel()
+        return conflict.value
+
+    assert asyncio.run(main()).code == IDEMPOTENCY_CONFLICT
+    assert Idempotency._running == {}
+
+
+def test_large_result_is_kept_locally_and_counted(fresh_results):
+    async def main():
+        await Idempotency.run("small", "tool", {}, lambda: asyncio.sleep(0, "ok"))
+        await Idempotency.run("large", "tool", {}, lambda: asyncio.sleep(0, "x" * 1000))
+        return await Idempotency.run("large", "tool", {}, lambda: asyncio.sleep(0, "again"))
+
+    assert asyncio.run(main()) == ("x" * 1000, True)
+    assert fresh_results.get("small")[0]["result"] == "ok"
+    assert fresh_results.get("large") is None
+    assert Idempotency.unshared_total._values == {("tool",): 1.0}
@@ -0,0 +1,64 @@
+"""
+Test del formato testo Prometheus 0.0.4 esposto da Metrics.render e /metrics
+"""
+import re
+import asyncio
+
+import httpx
+
+from main import app
+from modules.metrics import Counter, Histogram
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? -?[0-9.e+-]+$')
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter("test_total", "test counter", ("tool",))
+    counter.inc('say "hi"\\\n')
+    counter.inc("plain", amount=2.5)
+    assert counter.samples() == [
+        'test_total{tool="plain"} 2.5',
+        'test_total{tool="say \\"hi\\"\\\\\\n"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "test histogram", ("method",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "get")
+    assert histogram.samples() == [
+        'test_seconds_bucket{method="get",le="0.1"} 2',
+        'test_seconds_bucket{method="get",le="1.0"} 3',
+        'test_seconds_bucket{method="get",le="+Inf"} 4',
+        'test_seconds_sum{method="get"} 3.65',
+        'test_seconds_count{method="get"} 4',
+    ]
+
+
+def test_metrics_endpoint_exposition():
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+            return await client.get("/metrics")
+
+    response = asyncio.run(main())
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert response.text.endswith("\n")
+
+    declared = {}
+    for index, line in enumerate(lines):
+        if line.startswith("# HELP "):
+            name = line.split()[2]
+            kind = lines[index + 1].split()
+            assert kind[:3] == ["#", "TYPE", name] and kind[3] in ("counter", "gauge", "histogram")
+            assert name not in declared
+            declared[name] = kind[3]
+        elif not line.startswith("#"):
+            assert SAMPLE.match(line), line
+            name = line.split("{")[0].split(" ")[0]
+            base = re.sub(r"_(bucket|sum|count)$", "", name) if name not in declared else name
+            assert base in declared, line
+    assert declared["mcp_requests_total"] == "counter"
+    assert 'mcp_requests_total{method="tools/list"}' in response.text
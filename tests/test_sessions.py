@@ -0,0 +1,101 @@
+"""
+Test di SessionStore e della gestione di Mcp-Session-Id sull'endpoint /mcp
+"""
+import asyncio
+from collections import OrderedDict
+
+import httpx
+import pytest
+
+from main import app
+from modules import sessions
+from modules.sessions import SessionStore, SESSION_HEADER
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(SessionStore, "_sessions", OrderedDict())
+    monkeypatch.setattr(SessionStore, "_shared", None)
+
+
+def test_create_and_lookup():
+    async def main():
+        session = await SessionStore.create({"protocolVersion": "2025-03-26", "clientInfo": {"name": "t"}})
+        return session, await SessionStore.get(session.session_id), await SessionStore.get("unknown")
+
+    session, found, unknown = asyncio.run(main())
+    assert found is session
+    assert session.protocol_version == "2025-03-26"
+    assert session.client_info == {"name": "t"}
+    assert unknown is None
+
+
+def test_idle_session_expires(monkeypatch):
+    monkeypatch.setattr(sessions, "MCP_SESSION_IDLE_TIMEOUT", 10)
+
+    async def main():
+        idle = await SessionStore.create({})
+        idle.last_seen -= 11
+        return idle, SessionStore.peek(idle.session_id), await SessionStore.get(idle.session_id)
+
+    idle, peeked, found = asyncio.run(main())
+    assert peeked is None and found is None
+    assert idle.session_id not in SessionStore._sessions
+
+
+def test_purge_stops_at_the_first_active_session(monkeypatch):
+    monkeypatch.setattr(sessions, "MCP_SESSION_IDLE_TIMEOUT", 10)
+
+    async def main():
+        created = [await SessionStore.create({}) for _ in range(4)]
+        for session in created[:2]:
+            session.last_seen -= 11
+        # Una sessione recente in testa: quelle scadute dopo di lei restano fino al prossimo giro
+        await SessionStore.get(created[2].session_id)
+        return created, SessionStore.purge()
+
+    created, removed = asyncio.run(main())
+    assert removed == 2
+    assert list(SessionStore._sessions) == [created[3].session_id, created[2].session_id]
+
+
+def test_store_is_bounded(monkeypatch):
+    monkeypatch.setattr(sessions, "MCP_SESSION_MAX", 2)
+
+    async def main():
+        return [await SessionStore.create({}) for _ in range(3)]
+
+    created = asyncio.run(main())
+    assert list(SessionStore._sessions) == [created[1].session_id, created[2].session_id]
+
+
+def post(payload, headers=None):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/mcp", json=payload, headers=headers or {})
+
+    return asyncio.run(main())
+
+
+def test_unknown_session_is_rejected():
+    response = post({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, {SESSION_HEADER: "unknown"})
+    assert response.status_code == 404
+    assert "initialize" in response.json()["error"]["message"]
+
+
+def test_only_a_valid_initialize_opens_a_session():
+    initialize = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    invalid = [
+        {**initialize, "jsonrpc": "1.0"},
+        {**initialize, "params": ["not", "an", "object"]},
+        [{**initialize, "id": None}],
+    ]
+    for payload in invalid:
+        response = post(payload)
+        assert SESSION_HEADER.lower() not in response.headers
+    assert len(SessionStore._sessions) == 0
+
+    response = post(initialize)
+    assert response.status_code == 200
+    assert response.headers[SESSION_HEADER] in SessionStore._sessions
@@ -0,0 +1,89 @@
+"""
+Test di SharedMemory: letture consistenti degli slot, valori troppo grandi e aggregazione delle metriche dei worker
+"""
+import os
+import threading
+
+import pytest
+
+from modules import shared_memory
+from modules.metrics import Metrics, Counter, Gauge, _series_key
+from modules.shared_memory import SharedMemory, SharedTable, MetricSegment
+
+
+@pytest.fixture
+def table(tmp_path):
+    return SharedTable(str(tmp_path / "test.table"), slots=8, slot_size=256)
+
+
+def test_read_during_write_is_retried(table):
+    values = ["a" * 150, "b" * 20]
+    table.put("key", values[0], 60)
+    stop = threading.Event()
+
+    def writer():
+        index = 0
+        while not stop.is_set():
+            index ^= 1
+            table.put("key", values[index], 60)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        seen = [table.get("key") for _ in range(20000)]
+    finally:
+        stop.set()
+        thread.join()
+    # Una lettura sovrapposta a una scrittura viene scartata, mai restituita a metà
+    read = {hit[0] for hit in seen if hit is not None}
+    assert read and read <= set(values)
+
+
+def test_slot_being_written_is_not_read(table):
+    table.put("key", "value", 60)
+    index = next(i for i in table._candidates(table._hash("key")) if table._read_slot(i) is not None)
+    base = (index % table.slots) * table.slot_size
+    version = int.from_bytes(table.buffer[base:base + 4], "little")
+    table.buffer[base:base + 4] = (version + 1).to_bytes(4, "little")
+    assert table.get("key") is None
+    table.buffer[base:base + 4] = (version + 2).to_bytes(4, "little")
+    assert table.get("key")[0] == "value"
+
+
+def test_oversize_value_is_rejected_and_replaces_the_old_one(table):
+    assert table.put("key", "small", 60)
+    assert not table.fits("key", "x" * 300)
+    assert table.put("key", "x" * 300, 60) is False
+    assert table.get("key") is None
+
+
+def segment(directory, name, series):
+    owned = MetricSegment(os.path.join(directory, name), size=4096)
+    for key, value in series.items():
+        owned.set(owned.allocate(key, 1), value)
+    return owned
+
+
+def test_metrics_aggregate_live_and_dead_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_memory, "MCP_SHARED_DIR", str(tmp_path))
+    calls = _series_key("test_calls_total", ())
+    busy = _series_key("test_busy", ())
+    live = segment(tmp_path, "metrics-100-1.bin", {calls: 2, busy: 3})
+    dead = segment(tmp_path, "metrics-200-1.bin", {calls: 5, busy: 7})
+    # Stesso PID del worker morto, riassegnato a un nuovo worker
+    reused = segment(tmp_path, "metrics-200-2.bin", {calls: 1, busy: 4})
+    os.close(dead._owner_fd)
+
+    alive = {name: is_alive for name, (_, is_alive, _) in zip(
+        sorted(os.listdir(tmp_path)), SharedMemory.metric_segments()
+    )}
+    assert alive == {"metrics-100-1.bin": True, "metrics-200-1.bin": False, "metrics-200-2.bin": True}
+
+    shared = Metrics._collect_shared()
+    counter = Counter("test_calls_total", "calls")
+    gauge = Gauge("test_busy", "busy")
+    # I contatori dei worker terminati restano nel totale, i gauge contano solo i processi vivi
+    assert counter.samples(shared["test_calls_total"]) == ["test_calls_total 8"]
+    assert gauge.samples(shared["test_busy"]) == ["test_busy 7"]
+    os.close(live._owner_fd)
+    os.close(reused._owner_fd)
@@ -0,0 +1,75 @@
+"""
+Test di StateStore: apertura pigra del database, letture fuori dall'event loop e lotti non ancora scritti
+"""
+import asyncio
+import threading
+
+import pytest
+
+from modules import state_store
+from modules.state_store import StateStore, StateTable, SQLiteBackend
+
+
+@pytest.fixture
+def sqlite_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_BACKEND", "sqlite")
+    monkeypatch.setattr(state_store, "STATE_SQLITE_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(StateStore, "_backend", None)
+    yield tmp_path / "state.db"
+    if StateStore._backend is not None:
+        StateStore._backend.flush()
+
+
+def test_state_table_is_abstract():
+    with pytest.raises(TypeError):
+        StateTable()
+
+
+def test_database_opened_on_first_use(sqlite_store):
+    table = StateStore.table("things")
+    assert not sqlite_store.exists()
+    table.put("a", {"n": 1})
+    assert sqlite_store.exists()
+    assert table.get("a")[0] == {"n": 1}
+
+
+def test_reads_run_in_the_reader_thread(sqlite_store, monkeypatch):
+    table = StateStore.table("things")
+    table.put("a", 1)
+    table.put("b", 2)
+    StateStore.backend().flush()
+    threads = []
+    select = SQLiteBackend._select
+
+    def spy(self, namespace, key):
+        threads.append(threading.get_ident())
+        return select(self, namespace, key)
+
+    monkeypatch.setattr(SQLiteBackend, "_select", spy)
+
+    async def main():
+        return await table.aget("a"), await table.aitems()
+
+    value, items = asyncio.run(main())
+    assert value[0] == 1
+    assert sorted(items) == [("a", 1), ("b", 2)]
+    assert threads and threading.get_ident() not in threads
+
+
+def test_pending_batch_overrides_the_database(sqlite_store):
+    table = StateStore.table("things")
+    table.put("a", "old")
+    table.put("gone", 1)
+    StateStore.backend().flush()
+    # Scritture ancora in coda: le letture devono già vederle
+    table.put("a", "new")
+    table.delete("gone")
+
+    async def main():
+        return await table.aget("a"), await table.aget("gone"), await table.aitems()
+
+    value, gone, items = asyncio.run(main())
+    assert value[0] == "new"
+    assert gone is None
+    assert items == [("a", "new")]
+    assert list(table.items()) == [("a", "new")]
@@ -0,0 +1,84 @@
+"""
+Test di MCPStreaming: framing SSE, notifiche di progresso e chiusura degli stream
+"""
+import json
+import asyncio
+
+from modules import streaming
+from modules.streaming import MCPStreaming
+
+
+def events(data: bytes) -> list:
+    """Messaggi JSON degli eventi SSE, verificando il framing di ciascuno"""
+    messages = []
+    for block in data.decode().split("\n\n")[:-1]:
+        lines = block.split("\n")
+        assert lines[0] == "event: message" and lines[1].startswith("data: ") and len(lines) == 2
+        messages.append(json.loads(lines[1][len("data: "):]))
+    assert data.endswith(b"\n\n")
+    return messages
+
+
+def test_progress_then_final_response():
+    async def handler():
+        MCPStreaming.report_progress(1, 2, "half")
+        await asyncio.sleep(0)
+        MCPStreaming.report_progress(2, 2)
+        return [{"jsonrpc": "2.0", "id": 1, "result": {}}, {"jsonrpc": "2.0", "id": 2, "result": {}}]
+
+    async def main():
+        MCPStreaming.bind_progress_token({"_meta": {"progressToken": "tok"}})
+        return b"".join([part async for part in MCPStreaming.stream_response(handler())])
+
+    messages = events(asyncio.run(main()))
+    assert [m.get("method") for m in messages] == ["notifications/progress"] * 2 + [None, None]
+    assert messages[0]["params"] == {"progressToken": "tok", "progress": 1, "total": 2, "message": "half"}
+    assert [m.get("id") for m in messages[2:]] == [1, 2]
+
+
+def test_closing_the_stream_cancels_the_handler():
+    async def main():
+        stopped = asyncio.Event()
+
+        async def handler():
+            MCPStreaming.report_progress(1)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        MCPStreaming.bind_progress_token({"_meta": {"progressToken": 1}})
+        stream = MCPStreaming.stream_response(handler())
+        first = await stream.__anext__()
+        # Client disconnesso: il server chiude il generatore
+        await stream.aclose()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return first
+
+    assert events(asyncio.run(main()))[0]["method"] == "notifications/progress"
+
+
+def test_subscription_keepalive_and_unsubscribe(monkeypatch):
+    monkeypatch.setattr(streaming, "MCP_SSE_KEEPALIVE", 0.01)
+
+    async def main():
+        stream = MCPStreaming.subscribe()
+        ping = await stream.__anext__()
+        MCPStreaming.publish({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+        message = await stream.__anext__()
+        await stream.aclose()
+        return ping, message
+
+    ping, message = asyncio.run(main())
+    assert ping == b": ping\n\n"
+    assert events(message) == [{"jsonrpc": "2.0", "method": "notifications/tools/list_changed"}]
+    assert MCPStreaming._subscribers == set()
+
+
+def test_slow_subscriber_drops_the_oldest_message(monkeypatch):
+    queue = asyncio.Queue(maxsize=2)
+    monkeypatch.setattr(MCPStreaming, "_subscribers", {queue})
+    for n in range(3):
+        MCPStreaming.publish({"n": n})
+    assert [queue.get_nowait()["n"] for _ in range(queue.qsize())] == [1, 2]
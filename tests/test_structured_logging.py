@@ -0,0 +1,63 @@
+"""
+Test di StructuredLogging: request id per richiesta, campi JSON, troncamento e coda piena
+"""
+import json
+import queue
+import asyncio
+import logging
+
+import pytest
+
+from modules import structured_logging
+from modules.structured_logging import StructuredLogging, StructuredLogger
+from routes.mcp_routes import MCPRoutes
+
+
+@pytest.fixture
+def records(monkeypatch):
+    captured = queue.Queue(maxsize=100)
+    monkeypatch.setattr(StructuredLogging, "_queue", captured)
+    monkeypatch.setattr(StructuredLogging, "level", logging.INFO)
+    monkeypatch.setattr(StructuredLogging, "sample_rates", {})
+
+    def lines():
+        return [json.loads(StructuredLogging.format(captured.get_nowait())) for _ in range(captured.qsize())]
+    return lines
+
+
+def test_json_line_fields(records, monkeypatch):
+    monkeypatch.setattr(structured_logging, "LOG_MAX_FIELD_LENGTH", 8)
+    logger = StructuredLogger("mcp.test")
+    logger.debug("hidden")
+    logger.info("visible", count=3, text="abcdefghijkl", obj={"a": 1})
+
+    [line] = records()
+    assert set(line) == {"ts", "level", "logger", "event", "count", "text", "obj"}
+    assert (line["level"], line["logger"], line["event"], line["count"]) == ("INFO", "mcp.test", "visible", 3)
+    assert line["text"] == "abcdefgh...(+4 chars)"
+    assert line["obj"] == "{'a': 1}"
+
+
+def test_each_request_gets_its_own_id(records):
+    async def main():
+        await asyncio.gather(*(
+            MCPRoutes.handle_mcp_request({"jsonrpc": "2.0", "id": n, "method": "tools/list"}) for n in range(3)
+        ))
+
+    asyncio.run(main())
+    responses = [line for line in records() if line["event"] == "mcp_response"]
+    assert sorted(line["id"] for line in responses) == [0, 1, 2]
+    ids = {line["request_id"] for line in responses}
+    assert len(ids) == 3
+    assert all(request_id.startswith(structured_logging._request_prefix + "-") for request_id in ids)
+
+
+def test_full_queue_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(StructuredLogging, "_queue", queue.Queue(maxsize=1))
+    monkeypatch.setattr(StructuredLogging, "_dropped", 0)
+    monkeypatch.setattr(StructuredLogging, "level", logging.INFO)
+    monkeypatch.setattr(StructuredLogging, "sample_rates", {})
+    logger = StructuredLogger("mcp.test")
+    for _ in range(3):
+        logger.warning("burst")
+    assert StructuredLogging.dropped() == 2
@@ -0,0 +1,69 @@
+"""
+Test di SystemStatus: finestre aggregate, snapshot e valori non disponibili
+"""
+import json
+import math
+import asyncio
+
+import pytest
+
+from modules import system_status
+from modules.mcp_methods import MCPMethods
+from modules.system_status import SystemStatus, SampleRing, FIELDS, _WindowAccumulator
+
+
+@pytest.fixture(autouse=True)
+def fresh_status(monkeypatch):
+    monkeypatch.setattr(system_status, "SYSTEM_STATUS_WINDOW", 10)
+    monkeypatch.setattr(SystemStatus, "samples", SampleRing(FIELDS, 8))
+    monkeypatch.setattr(SystemStatus, "windows", SampleRing(SystemStatus.windows.fields, 3))
+    monkeypatch.setattr(SystemStatus, "_current", _WindowAccumulator())
+
+
+def test_windows_aggregate_min_avg_max():
+    for second in range(0, 25, 5):
+        SystemStatus.record(1000.0 + second, {"cpu_percent": float(second), "load_1m": math.nan})
+
+    snapshot = SystemStatus.snapshot(windows=5, samples=3)
+    history = snapshot["history"]
+    # Finestre chiuse [0, 5] e [10, 15], più quella in corso con il solo campione a 20s
+    assert history["window_start"] == [1000.0, 1010.0, 1020.0]
+    assert history["cpu_percent"] == {"min": [0.0, 10.0, 20.0], "avg": [2.5, 12.5, 20.0], "max": [5.0, 15.0, 20.0]}
+    # Metrica mai disponibile: null nel JSON invece di NaN
+    assert history["load_1m"]["avg"] == [None, None, None]
+    assert snapshot["latest"]["cpu_percent"] == 20.0 and snapshot["latest"]["load_1m"] is None
+    assert snapshot["sampled_at"] == 1020.0
+    assert snapshot["samples"]["cpu_percent"] == [10.0, 15.0, 20.0]
+
+
+def test_history_is_limited_to_the_requested_windows():
+    for second in range(0, 45, 5):
+        SystemStatus.record(1000.0 + second, {"cpu_percent": float(second)})
+
+    history = SystemStatus.snapshot(windows=2)["history"]
+    assert history["window_start"] == [1030.0, 1040.0]
+    assert history["cpu_percent"]["max"] == [35.0, 40.0]
+
+
+def test_empty_snapshot():
+    snapshot = SystemStatus.snapshot()
+    assert snapshot["sampled_at"] is None and snapshot["age_s"] is None
+    assert snapshot["latest"] == {}
+    assert snapshot["history"]["window_start"] == []
+
+
+def test_tool_reads_the_background_sampler():
+    async def main():
+        before = MCPMethods._get_system_status({})
+        await SystemStatus.start()
+        try:
+            await asyncio.sleep(0)
+            return before, MCPMethods._get_system_status({"samples": 1}), MCPMethods._get_system_status({"windows": "x"})
+        finally:
+            await SystemStatus.stop()
+
+    before, status, invalid = asyncio.run(main())
+    assert before.startswith("Error")
+    latest = json.loads(status)["latest"]
+    assert latest["process_rss_mb"] > 0 and latest["process_threads"] >= 1
+    assert invalid.startswith("Error")
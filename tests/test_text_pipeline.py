@@ -0,0 +1,43 @@
+"""
+Test di TextPipeline: il risultato a pezzi deve coincidere con quello sul testo intero
+"""
+import re
+import random
+
+import pytest
+
+from modules.text_pipeline import TextPipeline, TextStage
+
+WHOLE = {
+    "uppercase": str.upper,
+    "lowercase": str.lower,
+    "title": str.title,
+    "capitalize": str.capitalize,
+    "trim": str.strip,
+    "normalize_whitespace": lambda text: re.sub(r"\s+", " ", text),
+}
+
+
+def test_text_stage_is_abstract():
+    with pytest.raises(TypeError):
+        TextStage()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_chunked_matches_whole_text(seed):
+    rng = random.Random(seed)
+    alphabet = "ab CD\t\n'ß1"
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        names = rng.sample(sorted(WHOLE), rng.randint(1, 3))
+        operations = list(names)
+        expected = text
+        for name in names:
+            expected = WHOLE[name](expected)
+        if rng.random() < 0.3:
+            length = rng.randint(0, 20)
+            operations.append({"op": "truncate", "length": length})
+            expected = expected[:length]
+        size = rng.randint(1, 7)
+        pipeline = TextPipeline.parse(operations)
+        assert "".join(pipeline.run(TextPipeline.chunks(text, size))) == expected, (text, operations, size)
@@ -0,0 +1,37 @@
+"""
+Test della revalidation di tools/list: ETag e If-None-Match
+"""
+import asyncio
+
+import httpx
+
+from main import app
+
+TOOLS_LIST = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+
+
+def post(headers=None):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/mcp", json=TOOLS_LIST, headers=headers or {})
+
+    return asyncio.run(main())
+
+
+def test_matching_etag_returns_304_without_body():
+    first = post()
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.json()["result"]["tools"]
+
+    for if_none_match in (etag, f'"other", {etag}', "*"):
+        cached = post({"If-None-Match": if_none_match})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+
+
+def test_stale_etag_returns_the_list():
+    response = post({"If-None-Match": '"not-the-current-version"'})
+    assert response.status_code == 200
+    assert response.json()["result"]["tools"]
@@ -0,0 +1,117 @@
+"""
+Test di TTLCache: scadenza, stale-while-revalidate, singleflight ed eviction LRU
+"""
+import asyncio
+
+from modules import ttl_cache
+from modules.ttl_cache import TTLCache
+
+
+class Clock:
+    """time.monotonic controllato dal test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+def fake_clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache, "time", clock)
+    return clock
+
+
+def counting_loader(calls):
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+    return load
+
+
+def test_fresh_value_then_expiry(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    cache = TTLCache(10, ttl=5)
+    calls = []
+
+    async def main():
+        first = await cache.get_or_load("k", counting_loader(calls))
+        clock.now += 4
+        fresh = await cache.get_or_load("k", counting_loader(calls))
+        clock.now += 2
+        expired = await cache.get_or_load("k", counting_loader(calls))
+        return first, fresh, expired
+
+    first, fresh, expired = asyncio.run(main())
+    assert first == (1, {"cached": False, "age": 0.0, "stale": False, "coalesced": False})
+    assert fresh[0] == 1 and fresh[1]["cached"] and fresh[1]["age"] == 4
+    assert expired[0] == 2 and not expired[1]["cached"]
+
+
+def test_stale_value_is_served_while_refreshing(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    cache = TTLCache(10, ttl=5, stale_ttl=10)
+    calls = []
+
+    async def main():
+        await cache.get_or_load("k", counting_loader(calls))
+        clock.now += 7
+        stale = await cache.get_or_load("k", counting_loader(calls))
+        # Il refresh parte in background una sola volta
+        again = await cache.get_or_load("k", counting_loader(calls))
+        await asyncio.sleep(0.05)
+        return stale, again, cache.get("k")
+
+    stale, again, refreshed = asyncio.run(main())
+    assert stale[0] == 1 and stale[1]["stale"]
+    assert again[0] == 1
+    assert calls == [1, 1]
+    assert refreshed == (2, 0.0)
+
+
+def test_concurrent_loads_share_one_execution():
+    cache = TTLCache(10, ttl=5)
+    calls = []
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("k", counting_loader(calls)) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert [value for value, _ in results] == [1] * 5
+    assert [info["coalesced"] for _, info in results] == [False, True, True, True, True]
+
+
+def test_failed_and_rejected_loads_are_not_cached():
+    cache = TTLCache(10, ttl=5)
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def error_text():
+        return "Error: nope"
+
+    async def main():
+        try:
+            await cache.get_or_load("failed", fail)
+        except RuntimeError:
+            pass
+        await cache.get_or_load("rejected", error_text, lambda value: not value.startswith("Error"))
+
+    asyncio.run(main())
+    assert cache.get("failed") is None and cache.get("rejected") is None
+
+
+def test_lru_eviction():
+    cache = TTLCache(2, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3